@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Pack project sessions untouched for a number of days into compressed bundles
+(see session_archive.py). Archived sessions stay listed and readable; one is
+unpacked again the next time something writes to it.
+Safe to run while the server is up and safe to interrupt and rerun.
+
+Usage: python archive_sessions.py [days] [--project PROJECT_ID] [--dry-run]
+"""
+import sys
+
+from db import archive_cold_sessions, SESSION_ARCHIVE_AFTER_DAYS
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    dry_run = "--dry-run" in args
+    project_id = args[args.index("--project") + 1] if "--project" in args else None
+    positional = [arg for i, arg in enumerate(args) if not arg.startswith("--") and (i == 0 or args[i - 1] != "--project")]
+    days = float(positional[0]) if positional else SESSION_ARCHIVE_AFTER_DAYS
+
+    stats = archive_cold_sessions(days, project_id=project_id, dry_run=dry_run)
+    if dry_run:
+        print(f"📊 {stats['archived']} session(s) untouched for {days:g} day(s), {stats['bytes_before'] / 1e6:.1f} MB")
+    else:
+        print(f"✅ Archived {stats['archived']} session(s) untouched for {days:g} day(s)")
+        if stats["bytes_before"]:
+            print(f"📊 {stats['bytes_before'] / 1e6:.1f} MB in folders -> {stats['bytes_after'] / 1e6:.1f} MB in bundles")
+    if stats["failed"]:
+        print(f"❌ {stats['failed']} session(s) could not be archived; see the log")
@@ -0,0 +1,125 @@
+"""
+In-process caches for request authentication.
+
+get_current_user decodes the bearer token and loads the user on every request.
+This module memoizes both steps. Decoded token payloads are kept until the token
+expires. User records are kept by token subject for USER_CACHE_TTL seconds.
+
+Code that deletes or changes users calls invalidate_users(). That drops the
+entries in this process and touches a marker file. Every other process (other
+workers, or the app when a maintenance script changed users) clears its user
+cache within USER_CACHE_MARKER_CHECK seconds of seeing the marker change.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+TOKEN_MEMO_SIZE = int(os.getenv("TOKEN_MEMO_SIZE", "1024"))
+USER_CACHE_MARKER = os.getenv(
+    "USER_CACHE_MARKER", os.path.join(os.path.dirname(__file__), ".user_cache_invalidated")
+)
+USER_CACHE_MARKER_CHECK = float(os.getenv("USER_CACHE_MARKER_CHECK", "1"))
+
+_lock = threading.Lock()
+_tokens = OrderedDict()  # token -> decoded payload
+_users = OrderedDict()   # username -> (user, cached_at)
+_generation = 0          # Bumped on every invalidation, so a lookup racing one is not cached
+_marker_checked_at = 0.0
+_marker_mtime = None
+
+def _read_marker_mtime():
+    try:
+        return os.stat(USER_CACHE_MARKER).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def _check_marker(now):
+    """Clear the user cache if another process touched the marker. Caller holds _lock."""
+    global _marker_checked_at, _marker_mtime, _generation
+    if now - _marker_checked_at < USER_CACHE_MARKER_CHECK:
+        return
+    _marker_checked_at = now
+    mtime = _read_marker_mtime()
+    if mtime != _marker_mtime:
+        _marker_mtime = mtime
+        _users.clear()
+        _generation += 1
+
+def get_token_payload(token):
+    """Decoded payload of a token seen before, or None if unknown or expired"""
+    with _lock:
+        payload = _tokens.get(token)
+        if payload is None:
+            return None
+        exp = payload.get("exp")
+        if exp is not None and exp <= time.time():
+            # Let the caller decode it again so it reports the expiry
+            del _tokens[token]
+            return None
+        _tokens.move_to_end(token)
+        return payload
+
+def cache_token_payload(token, payload):
+    with _lock:
+        _tokens[token] = payload
+        _tokens.move_to_end(token)
+        while len(_tokens) > TOKEN_MEMO_SIZE:
+            _tokens.popitem(last=False)
+
+def user_cache_generation():
+    """Take this before loading a user from the database and pass it to cache_user()"""
+    with _lock:
+        _check_marker(time.monotonic())
+        return _generation
+
+def get_cached_user(username):
+    """A copy of the cached user record, or None on a miss"""
+    now = time.monotonic()
+    with _lock:
+        _check_marker(now)
+        entry = _users.get(username)
+        if entry is None:
+            return None
+        user, cached_at = entry
+        if now - cached_at >= USER_CACHE_TTL:
+            del _users[username]
+            return None
+        _users.move_to_end(username)
+        return dict(user)
+
+def cache_user(username, user, generation):
+    """Cache a user loaded from the database, unless users were invalidated since generation"""
+    with _lock:
+        if generation != _generation:
+            return
+        _users[username] = (dict(user), time.monotonic())
+        _users.move_to_end(username)
+        while len(_users) > USER_CACHE_SIZE:
+            _users.popitem(last=False)
+
+def invalidate_users(usernames=None):
+    """
+    Forget cached users (all of them if usernames is None) in this process and
+    touch the marker so other processes clear theirs.
+    """
+    global _generation, _marker_mtime
+    with _lock:
+        if usernames is None:
+            _users.clear()
+        else:
+            for username in usernames:
+                _users.pop(username, None)
+        _generation += 1
+        try:
+            with open(USER_CACHE_MARKER, "a"):
+                pass
+            os.utime(USER_CACHE_MARKER)
+            _marker_mtime = _read_marker_mtime()  # Already handled here
+        except OSError as e:
+            logger.warning("Could not touch user cache invalidation marker: %s", e)
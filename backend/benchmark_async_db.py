@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark /projects latency while shot writes are in flight, with the db.py
+calls made directly inside async endpoints (blocking the event loop) and
+awaited through db_async. A separate connection holds the write lock for 20 ms
+at a time, standing in for a slow writer such as another worker process.
+Runs in-process on a scratch database; main.py is not imported, so the model
+stack is not needed.
+"""
+import asyncio
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+
+import httpx
+from fastapi import FastAPI
+
+import db
+import db_async
+
+DURATION = 3.0
+READERS = 8
+WRITERS = 4
+LOCK_HOLD = 0.02
+READ_INTERVAL = 0.02  # Per reader, so READERS / READ_INTERVAL requests per second
+
+def use_scratch_database(directory):
+    db.close_db_connection()
+    db.DB_FILE = os.path.join(directory, "benchmark.db")
+    db.init_db()
+    user_id = db.create_user(f"bench_{uuid.uuid4().hex[:8]}", "benchmark")
+    project_ids = [db.create_project(user_id, f"Project {i}") for i in range(20)]
+    return user_id, project_ids[0]
+
+def build_app(user_id, project_id):
+    app = FastAPI()
+
+    @app.get("/blocking/projects")
+    async def blocking_projects():
+        return db.get_user_projects_page(user_id)[0]
+
+    @app.post("/blocking/shots")
+    async def blocking_shot():
+        return {"id": db.save_shot(project_id, 1, "scene", "shot", "benchmark")}
+
+    @app.get("/async/projects")
+    async def async_projects():
+        return (await db_async.get_user_projects_page(user_id))[0]
+
+    @app.post("/async/shots")
+    async def async_shot():
+        return {"id": await db_async.save_shot(project_id, 1, "scene", "shot", "benchmark")}
+
+    return app
+
+def hold_write_lock(stop):
+    """Repeatedly take the write lock from outside the app's connection pool"""
+    conn = sqlite3.connect(db.DB_FILE, timeout=60.0, isolation_level=None)
+    while not stop.is_set():
+        conn.execute("BEGIN IMMEDIATE")
+        time.sleep(LOCK_HOLD)
+        conn.execute("COMMIT")
+        time.sleep(LOCK_HOLD / 2)
+    conn.close()
+
+async def run_mode(client, mode):
+    latencies = []
+    writes = 0
+    deadline = time.perf_counter() + DURATION
+
+    # Readers send on a fixed schedule and measure from the scheduled time, so time
+    # spent waiting for a blocked event loop counts against the request
+    async def reader(offset):
+        scheduled = time.perf_counter() + offset
+        while scheduled < deadline:
+            await asyncio.sleep(max(0, scheduled - time.perf_counter()))
+            response = await client.get(f"/{mode}/projects")
+            latencies.append((time.perf_counter() - scheduled) * 1000)
+            response.raise_for_status()
+            scheduled += READ_INTERVAL
+
+    # ASGITransport never suspends on its own, so each write yields to let the others run
+    async def writer():
+        nonlocal writes
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(0)
+            (await client.post(f"/{mode}/shots")).raise_for_status()
+            writes += 1
+
+    await asyncio.gather(*[reader(i * READ_INTERVAL / READERS) for i in range(READERS)], *[writer() for _ in range(WRITERS)])
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return statistics.median(latencies), p99, latencies[-1], len(latencies), writes
+
+async def run_benchmark():
+    print("📊 /projects LATENCY WITH WRITES IN FLIGHT")
+    print("=" * 60)
+    with tempfile.TemporaryDirectory() as directory:
+        user_id, project_id = use_scratch_database(directory)
+        stop = threading.Event()
+        lock_holder = threading.Thread(target=hold_write_lock, args=(stop,), daemon=True)
+        lock_holder.start()
+        try:
+            transport = httpx.ASGITransport(app=build_app(user_id, project_id))
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+                print(f"{'mode':>10} {'p50 (ms)':>9} {'p99 (ms)':>9} {'max (ms)':>9} {'reads':>7} {'writes':>7}")
+                for mode in ("blocking", "async"):
+                    p50, p99, worst, reads, writes = await run_mode(client, mode)
+                    print(f"{mode:>10} {p50:>9.1f} {p99:>9.1f} {worst:>9.1f} {reads:>7} {writes:>7}")
+        finally:
+            stop.set()
+            lock_holder.join()
+            db_async.shutdown()
+            db.close_db_connection()
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark())
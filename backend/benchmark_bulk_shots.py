@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark saving a suggestion set shot by shot (one save_shot commit per shot)
+against save_shots_bulk (one transaction for the session, shots and versions).
+Runs on a scratch copy of the schema in a temporary directory, so the app
+database is not touched beyond the usual init on import.
+"""
+import os
+import json
+import tempfile
+import time
+import uuid
+
+import db
+
+def use_scratch_database(directory):
+    db.close_db_connection()
+    db.DB_FILE = os.path.join(directory, "benchmark.db")
+    db.init_db()
+    user_id = db.create_user(f"bench_{uuid.uuid4().hex[:8]}", "benchmark")
+    return user_id, db.create_project(user_id, "Bulk insert benchmark")
+
+def make_shots(count):
+    return [
+        {
+            "shot_number": i,
+            "scene_description": "A car chase through a rainy city at night",
+            "shot_description": f"Shot {i}: tracking shot of the lead car",
+            "model_name": "benchmark",
+            "metadata": {"enhanced": True, "shot_metadata": {"lens": "35mm", "index": i}},
+            "user_input": "A car chase through a rainy city at night"
+        }
+        for i in range(1, count + 1)
+    ]
+
+def make_session(user_id):
+    session_id = str(uuid.uuid4())
+    return {"id": session_id, "user_id": user_id, "name": f"session_{session_id}", "data": {"type": "enhanced"}}
+
+def save_per_shot(user_id, project_id, shots):
+    """The previous path: a session insert, then one save_shot commit per shot"""
+    session = make_session(user_id)
+    with db.get_db_connection() as conn:
+        conn.execute(
+            "INSERT INTO sessions (id, user_id, name, data, project_id) VALUES (?, ?, ?, ?, ?)",
+            (session["id"], user_id, session["name"], json.dumps(session["data"]), project_id)
+        )
+        conn.commit()
+    for shot in shots:
+        db.save_shot(project_id=project_id, **shot)
+
+def save_bulk(user_id, project_id, shots):
+    db.save_shots_bulk(project_id, shots, session=make_session(user_id))
+
+def best_of(func, repeats=5):
+    """Return the best wall time of func() in milliseconds"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def run_benchmark():
+    print("📊 BULK SHOT INSERT BENCHMARK")
+    print("=" * 60)
+    with tempfile.TemporaryDirectory() as directory:
+        user_id, project_id = use_scratch_database(directory)
+
+        print(f"{'shots':>6} {'per-shot (ms)':>14} {'bulk (ms)':>10} {'speedup':>9}")
+        for count in (5, 20, 100):
+            shots = make_shots(count)
+            per_shot_ms = best_of(lambda: save_per_shot(user_id, project_id, shots))
+            bulk_ms = best_of(lambda: save_bulk(user_id, project_id, shots))
+            print(f"{count:>6} {per_shot_ms:>14.1f} {bulk_ms:>10.1f} {per_shot_ms / bulk_ms:>8.1f}x")
+
+        saved = db.save_shots_bulk(project_id, make_shots(3), session=make_session(user_id))
+        stored = {shot["id"] for shot in db.get_project_shots(project_id)}
+        if all(shot_id in stored for shot_id in saved["shot_ids"]) and len(saved["version_ids"]) == 3:
+            print("✅ Bulk insert returned the ids of every stored shot and version")
+        else:
+            print("❌ Bulk insert ids do not match the stored shots")
+        db.close_db_connection()
+
+if __name__ == "__main__":
+    run_benchmark()
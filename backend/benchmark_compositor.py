@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark the shared reference compositor for 2-10 references at 512px.
+Each mode is compared with the per-iteration PIL/float32 loop it replaced.
+"""
+import time
+import numpy as np
+import cv2
+from PIL import Image
+
+from model import composite_references, _stack_images, COMPOSITE_RESOLUTION
+
+def create_reference_images(count, size=COMPOSITE_RESOLUTION):
+    """Create noisy variations of one scene so the edge and similarity checks pass"""
+    rng = np.random.default_rng(0)
+    coarse = rng.integers(0, 256, (size // 16, size // 16, 3), dtype=np.uint8)
+    base = np.array(Image.fromarray(coarse).resize((size, size), Image.Resampling.BICUBIC), dtype=np.int16)
+    return [
+        Image.fromarray(np.clip(base + rng.integers(-30, 30, base.shape), 0, 255).astype(np.uint8))
+        for _ in range(count)
+    ]
+
+def legacy_edge_gated(images):
+    """The blending loop previously inlined in generate_fusion_image"""
+    primary = images[0]
+    for i, img in enumerate(images[1:], 1):
+        weight = 0.3 / i
+        primary_array = np.array(primary, dtype=np.float32)
+        blend_array = np.array(img, dtype=np.float32)
+        primary_edges = cv2.Canny(np.array(primary.convert('L'), dtype=np.uint8), 50, 150) > 0
+        blend_edges = cv2.Canny(np.array(img.convert('L'), dtype=np.uint8), 50, 150) > 0
+        iou = np.sum(primary_edges & blend_edges) / (np.sum(primary_edges | blend_edges) + 1e-6)
+        if iou > 0.1:
+            primary = Image.fromarray(np.clip(primary_array * (1 - weight) + blend_array * weight, 0, 255).astype(np.uint8))
+    return primary
+
+def legacy_similarity(images):
+    """The loop previously in create_optimal_composite"""
+    primary_array = np.array(images[0], dtype=np.float32)
+    for i, img in enumerate(images[1:], 1):
+        img_array = np.array(img, dtype=np.float32)
+        primary_gray = cv2.cvtColor(primary_array.astype(np.uint8), cv2.COLOR_RGB2GRAY)
+        img_gray = cv2.cvtColor(img_array.astype(np.uint8), cv2.COLOR_RGB2GRAY)
+        mask = np.stack([(cv2.absdiff(primary_gray, img_gray) < 50).astype(np.float32)] * 3, axis=-1)
+        blend_mask = mask * (0.3 / (i + 1))
+        primary_array = primary_array * (1 - blend_mask) + img_array * blend_mask
+    return Image.fromarray(np.clip(primary_array, 0, 255).astype(np.uint8))
+
+def legacy_weighted_mean(images):
+    """The weighted blend previously in generate_reference_style_image"""
+    blended = np.zeros(np.array(images[0]).shape, dtype=np.float32)
+    total_weight = 0
+    for i, img in enumerate(images):
+        weight = 1.0 / (i + 1)
+        blended += np.array(img, dtype=np.float32) * weight
+        total_weight += weight
+    return Image.fromarray(np.clip(blended / total_weight, 0, 255).astype(np.uint8))
+
+def best_of(func, repeats=5):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def run_benchmark():
+    print("📊 REFERENCE COMPOSITOR BENCHMARK (512px)")
+    print("=" * 60)
+    images = create_reference_images(10)
+    legacy = {
+        "edge_gated": legacy_edge_gated,
+        "similarity": legacy_similarity,
+        "weighted_mean": legacy_weighted_mean,
+    }
+
+    for mode, legacy_func in legacy.items():
+        print(f"\n🔧 Mode: {mode}")
+        print(f"{'refs':>6} {'legacy (ms)':>12} {'compositor (ms)':>16} {'max px diff':>12}")
+        for count in range(2, 11, 2):
+            refs = images[:count]
+            legacy_ms = best_of(lambda: legacy_func(refs))
+            compositor_ms = best_of(lambda: composite_references(_stack_images(refs, COMPOSITE_RESOLUTION), mode=mode))
+            composite, _ = composite_references(_stack_images(refs, COMPOSITE_RESOLUTION), mode=mode)
+            max_diff = np.abs(np.array(composite, dtype=np.int16) - np.array(legacy_func(refs), dtype=np.int16)).max()
+            print(f"{count:>6} {legacy_ms:>12.1f} {compositor_ms:>16.1f} {max_diff:>12}")
+
+if __name__ == "__main__":
+    run_benchmark()
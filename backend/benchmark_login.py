@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark login throughput and event loop responsiveness with bcrypt run
+inline in the event loop (the previous behaviour) and on the bounded
+password pool. A 10 ms ticker measures how late the loop gets to run other
+work. Also checks that a login upgrades a hash made with a lower work factor.
+Runs on a scratch database. Set BCRYPT_ROUNDS to benchmark another work factor
+(default here 10, to keep the run short).
+"""
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+import uuid
+
+os.environ.setdefault("BCRYPT_ROUNDS", "10")
+
+import bcrypt
+
+import db
+import db_async
+import password_pool
+
+DURATION = 2.0
+PASSWORD = "benchmark-password"
+
+def use_scratch_database(directory):
+    db.close_db_connection()
+    db.DB_FILE = os.path.join(directory, "benchmark.db")
+    db.init_db()
+    username = f"bench_{uuid.uuid4().hex[:8]}"
+    db.create_user(username, PASSWORD)
+    return username
+
+async def blocking_login(username):
+    return db.authenticate_user(username, PASSWORD)
+
+async def pooled_login(username):
+    return await db_async.authenticate_user(username, PASSWORD)
+
+async def measure(login, username, concurrency):
+    latencies = []
+    rejected = 0
+    lags = []
+    deadline = time.perf_counter() + DURATION
+
+    async def client():
+        nonlocal rejected
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                if not await login(username):
+                    raise RuntimeError("Login failed")
+                latencies.append((time.perf_counter() - start) * 1000)
+            except password_pool.PasswordPoolBusy:
+                rejected += 1
+                await asyncio.sleep(0.01)  # A client backing off after a 503
+
+    async def ticker():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lags.append((time.perf_counter() - start - 0.01) * 1000)
+
+    await asyncio.gather(ticker(), *[client() for _ in range(concurrency)])
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else 0.0
+    median = statistics.median(latencies) if latencies else 0.0
+    return len(latencies) / DURATION, median, p99, rejected, max(lags) if lags else 0.0
+
+async def run_benchmark():
+    print(f"📊 LOGIN THROUGHPUT (bcrypt work factor {db.BCRYPT_ROUNDS})")
+    print("=" * 60)
+    print(f"🔧 Password pool: {password_pool.PASSWORD_POOL_WORKERS} worker(s), queue limit {password_pool.PASSWORD_POOL_MAX_QUEUE}")
+    with tempfile.TemporaryDirectory() as directory:
+        username = use_scratch_database(directory)
+
+        print(f"{'mode':>9} {'clients':>8} {'logins/s':>9} {'p50 (ms)':>9} {'p99 (ms)':>9} {'503s':>6} {'loop lag (ms)':>14}")
+        for mode, login in (("blocking", blocking_login), ("pool", pooled_login)):
+            for concurrency in (1, 8, 64):
+                rate, p50, p99, rejected, lag = await measure(login, username, concurrency)
+                print(f"{mode:>9} {concurrency:>8} {rate:>9.1f} {p50:>9.1f} {p99:>9.1f} {rejected:>6} {lag:>14.1f}")
+
+        # A hash from before a work factor increase is upgraded on login
+        old_hash = bcrypt.hashpw(PASSWORD.encode("utf-8"), bcrypt.gensalt(rounds=db.BCRYPT_ROUNDS - 1)).decode("utf-8")
+        db.update_password_hash(username, old_hash)
+        await db_async.authenticate_user(username, PASSWORD)
+        if not db.password_needs_rehash(db.get_user_by_username(username)["password_hash"]):
+            print(f"✅ Login rehashed a work factor {db.BCRYPT_ROUNDS - 1} hash to {db.BCRYPT_ROUNDS}")
+        else:
+            print("❌ Login did not rehash the outdated password hash")
+
+        db_async.shutdown()
+        password_pool.shutdown()
+        db.close_db_connection()
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark())
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Benchmark the per-image reference analysis against the batched implementation.
+Runs both on 1, 4 and 10 synthetic 2048x2048 reference images and checks that
+they return the same result keys.
+"""
+import time
+import numpy as np
+from PIL import Image
+
+from model import analyze_reference_images, analyze_reference_images_batch
+
+def create_reference_image(seed, size=2048):
+    """Create a textured test image with gradients and hard edges"""
+    rng = np.random.default_rng(seed)
+    coarse = rng.integers(0, 256, (size // 32, size // 32, 3), dtype=np.uint8)
+    image = np.array(Image.fromarray(coarse).resize((size, size), Image.Resampling.BICUBIC))
+    image[::128, :] = 255  # Grid lines so Canny has something to find
+    image[:, ::128] = 0
+    return Image.fromarray(image)
+
+def time_call(func, images, repeats=3):
+    """Return the best wall time of func(images) in milliseconds"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(images)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def run_benchmark():
+    print("📊 REFERENCE IMAGE ANALYSIS BENCHMARK")
+    print("=" * 60)
+    images = [create_reference_image(seed) for seed in range(10)]
+
+    print(f"{'images':>8} {'per-image (ms)':>16} {'batched (ms)':>14} {'speedup':>9}")
+    for count in (1, 4, 10):
+        batch = images[:count]
+        legacy_ms = time_call(analyze_reference_images, batch)
+        batched_ms = time_call(analyze_reference_images_batch, batch)
+        print(f"{count:>8} {legacy_ms:>16.1f} {batched_ms:>14.1f} {legacy_ms / batched_ms:>8.1f}x")
+
+    legacy = analyze_reference_images(images[:4])
+    batched = analyze_reference_images_batch(images[:4])
+    if legacy.keys() == batched.keys():
+        print("\n✅ Both implementations return the same result keys")
+    else:
+        print(f"\n❌ Result keys differ: {sorted(legacy.keys() ^ batched.keys())}")
+
+if __name__ == "__main__":
+    run_benchmark()
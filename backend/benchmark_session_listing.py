@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark listing a project's sessions with the previous directory scan
+(listdir, a stat per file and an output.json parse per session) against the
+session catalog (one indexed query after a stat of the project folder).
+Also checks that the reconciler picks up sessions added and removed outside
+the app. Runs on a scratch database and a temporary PROJECT_IMAGES_ROOT.
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import db
+
+PAGE_SIZE = 50
+
+def use_scratch_storage(directory):
+    db.close_db_connection()
+    db.DB_FILE = os.path.join(directory, "benchmark.db")
+    db.PROJECT_IMAGES_ROOT = os.path.join(directory, "project_images")
+    db.init_db()
+
+def make_session(project_folder, created, fusion=False):
+    prefix = "fusion_session" if fusion else "session"
+    name = f"{prefix}_{created.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    session_dir = os.path.join(project_folder, name)
+    os.makedirs(os.path.join(session_dir, "images"))
+    with open(os.path.join(session_dir, "input.json"), "w") as f:
+        json.dump({"scene_description": "A car chase through a rainy city at night"}, f)
+    if fusion:
+        with open(os.path.join(session_dir, "output.json"), "w") as f:
+            json.dump({"type": "image_fusion", "final_prompt": "benchmark"}, f)
+    else:
+        with open(os.path.join(session_dir, "shots.json"), "w") as f:
+            json.dump({"shots": [{"shot_description": "Tracking shot"}] * 5}, f)
+    return name
+
+def make_project(count):
+    project_id = str(uuid.uuid4())
+    project_folder = os.path.join(db.PROJECT_IMAGES_ROOT, project_id)
+    os.makedirs(project_folder)
+    start = datetime(2025, 1, 1)
+    for i in range(count):
+        make_session(project_folder, start + timedelta(minutes=i), fusion=(i % 4 == 0))
+    return project_id
+
+def scan_listing(project_id):
+    """The previous listing: every session folder is stat'ed and classified on each call"""
+    project_folder = os.path.join(db.PROJECT_IMAGES_ROOT, project_id)
+    sessions = []
+    for folder in os.listdir(project_folder):
+        session_path = os.path.join(project_folder, folder)
+        if not db._is_session_folder(folder) or not os.path.isdir(session_path):
+            continue
+        output_path = os.path.join(session_path, "output.json")
+        sessions.append({
+            "id": folder,
+            "created_at": db._session_created_at(folder, session_path),
+            "type": db._session_type(folder, output_path),
+            "has_input": os.path.exists(os.path.join(session_path, "input.json")),
+            "has_shots": os.path.exists(os.path.join(session_path, "shots.json")),
+            "has_output": os.path.exists(output_path),
+        })
+    sessions.sort(key=lambda s: s["id"])
+    sessions.sort(key=lambda s: s["created_at"], reverse=True)
+    return sessions
+
+def best_of(func, repeats=5):
+    """Return the best wall time of func() in milliseconds"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def run_benchmark():
+    print("📊 PROJECT SESSION LISTING BENCHMARK")
+    print("=" * 60)
+    with tempfile.TemporaryDirectory() as directory:
+        use_scratch_storage(directory)
+
+        print(f"{'sessions':>9} {'scan (ms)':>10} {'first sync (ms)':>16} {'catalog (ms)':>13} {'page of {0} (ms)'.format(PAGE_SIZE):>16}")
+        for count in (100, 1000, 3000):
+            project_id = make_project(count)
+            start = time.perf_counter()
+            db.reconcile_project_sessions(project_id)
+            sync_ms = (time.perf_counter() - start) * 1000
+            scan_ms = best_of(lambda: scan_listing(project_id))
+            catalog_ms = best_of(lambda: db.list_project_sessions(None, project_id))
+            page_ms = best_of(lambda: db.list_project_sessions_page(None, project_id, limit=PAGE_SIZE))
+            print(f"{count:>9} {scan_ms:>10.1f} {sync_ms:>16.1f} {catalog_ms:>13.1f} {page_ms:>16.2f}")
+
+        listed = db.list_project_sessions(None, project_id)
+        scanned = scan_listing(project_id)
+        if [(s["id"], s["type"], s["has_output"]) for s in listed] == [(s["id"], s["type"], s["has_output"]) for s in scanned]:
+            print("✅ Catalog listing matches the directory scan")
+        else:
+            print("❌ Catalog listing differs from the directory scan")
+
+        # Out-of-band changes: a session copied in and one deleted by hand
+        project_folder = os.path.join(db.PROJECT_IMAGES_ROOT, project_id)
+        added = make_session(project_folder, datetime(2030, 1, 1))
+        removed = listed[-1]["id"]
+        shutil.rmtree(os.path.join(project_folder, removed))
+        ids = {s["id"] for s in db.list_project_sessions(None, project_id)}
+        if added in ids and removed not in ids:
+            print("✅ Reconciler picked up a session added and one removed outside the app")
+        else:
+            print("❌ Reconciler missed an out-of-band change")
+        db.close_db_connection()
+
+if __name__ == "__main__":
+    run_benchmark()
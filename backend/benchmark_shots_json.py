@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark recording generated images in a session's shots.json. The previous
+path read, modified and rewrote the whole file for every image without a lock.
+It is compared with session_files.record_shot_update, which appends to a change
+log that read_shots() compacts. Several threads record images for different
+shots of the same session at once; the run reports the time per update and how
+many updates failed (a torn read of shots.json) or are missing from the final
+file. Runs in a temporary directory.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+
+import session_files
+
+THREADS = 8
+
+def make_session(directory, shot_count):
+    session_folder = tempfile.mkdtemp(dir=directory)
+    shots = [{"shot_description": f"Shot {i}: tracking shot of the lead car " * 4} for i in range(shot_count)]
+    with open(os.path.join(session_folder, "shots.json"), "w") as f:
+        json.dump({"shots": shots, "scene_description": "A car chase"}, f, indent=2)
+    return session_folder
+
+def rewrite_update(session_folder, shot_index, fields):
+    """The previous path: read, modify and rewrite the whole file"""
+    shots_file = os.path.join(session_folder, "shots.json")
+    with open(shots_file, "r") as f:
+        shots_data = json.load(f)
+    shots_data["shots"][shot_index].update(fields)
+    with open(shots_file, "w") as f:
+        json.dump(shots_data, f, indent=2)
+
+def run_updates(update, session_folder, shot_count):
+    """
+    Each thread records an image for its own share of the shots.
+    Returns (ms per update, failed updates).
+    """
+    failed = []
+    def worker(offset):
+        for shot_index in range(offset, shot_count, THREADS):
+            try:
+                update(session_folder, shot_index, {"image_url": f"/images/shot_{shot_index}.png"})
+            except (json.JSONDecodeError, OSError):
+                failed.append(shot_index)
+    threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(THREADS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return (time.perf_counter() - start) * 1000 / shot_count, len(failed)
+
+def count_missing(shots_data, shot_count):
+    if shots_data is None:
+        return shot_count
+    return sum(1 for shot in shots_data["shots"] if "image_url" not in shot)
+
+def read_plain(session_folder):
+    try:
+        with open(os.path.join(session_folder, "shots.json")) as f:
+            return json.load(f)
+    except (json.JSONDecodeError, FileNotFoundError):
+        return None  # Left truncated by a racing writer
+
+def run_benchmark():
+    print("📊 SHOTS.JSON UPDATE BENCHMARK")
+    print("=" * 60)
+    print(f"🔧 {THREADS} threads recording images in the same session")
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'':>6} {'rewrite':>26} {'change log':>26}")
+        print(f"{'shots':>6} {'ms/update':>10} {'failed':>7} {'lost':>7} {'ms/update':>10} {'failed':>7} {'lost':>7}")
+        for shot_count in (20, 200, 1000):
+            session_folder = make_session(directory, shot_count)
+            rewrite_ms, rewrite_failed = run_updates(rewrite_update, session_folder, shot_count)
+            rewrite_lost = count_missing(read_plain(session_folder), shot_count)
+
+            session_folder = make_session(directory, shot_count)
+            log_ms, log_failed = run_updates(session_files.record_shot_update, session_folder, shot_count)
+            log_lost = count_missing(session_files.read_shots(session_folder), shot_count)
+            print(f"{shot_count:>6} {rewrite_ms:>10.2f} {rewrite_failed:>7} {rewrite_lost:>7} "
+                  f"{log_ms:>10.2f} {log_failed:>7} {log_lost:>7}")
+
+        if log_failed == 0 and log_lost == 0 and not os.path.exists(os.path.join(session_folder, session_files.SHOTS_LOG_FILE)):
+            print("✅ Every update reached shots.json and the change log was compacted")
+        else:
+            print("❌ Updates were lost or the change log was not compacted")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark auditing a storage tree serially (nested os.listdir, each file read,
+hashed and checked in turn) against storage_audit: a parallel scandir walk on a
+thread pool, then a second run that reuses the manifest for unchanged files.
+Also checks that a corrupted JSON file and a truncated image are reported.
+Runs in a temporary directory.
+"""
+import hashlib
+import io
+import json
+import os
+import tempfile
+import time
+
+from PIL import Image
+
+import storage_audit
+
+SESSIONS = 300
+IMAGES_PER_SESSION = 4
+
+def make_tree(root):
+    buffer = io.BytesIO()
+    Image.new("RGB", (256, 256), "steelblue").save(buffer, format="PNG")
+    png = buffer.getvalue()
+    for project in range(10):
+        for session in range(SESSIONS // 10):
+            session_dir = os.path.join(root, f"project_{project}", f"session_20250101_000000_{project:02d}{session:04d}")
+            os.makedirs(os.path.join(session_dir, "images"))
+            with open(os.path.join(session_dir, "input.json"), "w") as f:
+                json.dump({"scene_description": "A car chase through a rainy city at night"}, f)
+            with open(os.path.join(session_dir, "shots.json"), "w") as f:
+                json.dump({"shots": [{"shot_description": "Tracking shot"}] * IMAGES_PER_SESSION}, f)
+            for image in range(IMAGES_PER_SESSION):
+                with open(os.path.join(session_dir, "images", f"shot_{image}.png"), "wb") as f:
+                    f.write(png)
+
+def serial_audit(root):
+    """The previous approach: nested listdir, everything read and checked one file at a time"""
+    problems = 0
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if os.path.isdir(path):
+                pending.append(path)
+                continue
+            with open(path, "rb") as f:
+                data = f.read()
+            hashlib.sha256(data).hexdigest()
+            if name.endswith(".json") and storage_audit._check_json(data, name):
+                problems += 1
+            elif name.endswith(".png") and storage_audit._check_image(data):
+                problems += 1
+    return problems
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return (time.perf_counter() - start) * 1000, result
+
+def run_benchmark():
+    print("📊 STORAGE AUDIT BENCHMARK")
+    print("=" * 60)
+    with tempfile.TemporaryDirectory() as directory:
+        root = os.path.join(directory, "project_images")
+        make_tree(root)
+        manifest = os.path.join(directory, "manifest.db")
+        roots = {"project_images": root}
+        print(f"🔧 {SESSIONS} sessions, {SESSIONS * (IMAGES_PER_SESSION + 2)} files")
+
+        serial_ms, _ = timed(lambda: serial_audit(root))
+        first_ms, first = timed(lambda: storage_audit.audit_storage(roots, manifest_path=manifest))
+        repeat_ms, repeat = timed(lambda: storage_audit.audit_storage(roots, manifest_path=manifest))
+        print(f"{'serial (ms)':>12} {'parallel (ms)':>14} {'manifest rerun (ms)':>20}")
+        print(f"{serial_ms:>12.0f} {first_ms:>14.0f} {repeat_ms:>20.0f}")
+        print(f"📊 Rerun read {repeat['hashed']} file(s) and reused {repeat['reused']} checksum(s)")
+        # The tree was just written, so it is in the page cache and reading it is CPU bound;
+        # the thread pool pays off on cold disks and network mounts, where each read waits on I/O
+        print("🔧 Freshly written tree (page cache): the parallel walk only wins when reads wait on the disk")
+
+        # Damage one JSON file and one image; only those two are read again
+        session_dir = os.path.join(root, "project_0", "session_20250101_000000_000000")
+        with open(os.path.join(session_dir, "shots.json"), "a") as f:
+            f.write("{")
+        image_path = os.path.join(session_dir, "images", "shot_0.png")
+        with open(image_path, "r+b") as f:
+            f.truncate(os.path.getsize(image_path) // 2)
+        damaged = storage_audit.audit_storage(roots, manifest_path=manifest)
+        found = {issue["problem"] for issue in damaged["issues"]}
+        if first["ok"] and damaged["hashed"] == 2 and found == {"invalid_json", "invalid_image"}:
+            print("✅ Damaged JSON and image reported; unchanged files were not read again")
+        else:
+            print(f"❌ Unexpected audit result: read {damaged['hashed']}, issues {damaged['issues']}")
+
+if __name__ == "__main__":
+    run_benchmark()
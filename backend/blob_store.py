@@ -0,0 +1,90 @@
+"""
+Content-addressed blob store for image bytes kept out of SQLite.
+
+Blobs are stored under blob_store/<aa>/<bb>/<sha256>, where aa and bb are the
+first two byte pairs of the hash. Tables keep only the hash, byte size and
+dimensions. Identical images are stored once, and writes are atomic, so a crash
+never leaves a partial blob under its final name.
+"""
+import hashlib
+import io
+import os
+import threading
+
+from PIL import Image
+
+BLOB_STORE_ROOT = os.getenv("BLOB_STORE_ROOT", os.path.join(os.path.dirname(__file__), "blob_store"))
+
+def blob_path(digest, root=None):
+    root = root or BLOB_STORE_ROOT
+    return os.path.join(root, digest[:2], digest[2:4], digest)
+
+def put_blob(data, root=None):
+    """Store bytes and return their SHA-256 hex digest"""
+    digest = hashlib.sha256(data).hexdigest()
+    path = blob_path(digest, root)
+    try:
+        # Touch a blob that is already stored, so the garbage collector
+        # (storage_gc) sees it as in use until the new reference is committed
+        os.utime(path)
+        return digest
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return digest
+
+def read_blob(digest, root=None):
+    with open(blob_path(digest, root), "rb") as f:
+        return f.read()
+
+def image_dimensions(data):
+    """Width and height from the image header, without decoding the pixels"""
+    with Image.open(io.BytesIO(data)) as image:
+        return image.size
+
+class BlobImage:
+    """
+    An image in the blob store. Metadata is available right away. The file is
+    read and decoded only when pixels are needed. Unknown attributes are forwarded
+    to the decoded PIL image, so it can stand in where a PIL image was returned.
+    """
+
+    def __init__(self, digest=None, byte_size=None, width=None, height=None, data=None, root=None):
+        self.digest = digest
+        self.byte_size = byte_size
+        self.width = width
+        self.height = height
+        self._data = data
+        self._root = root
+        self._image = None
+
+    @property
+    def size(self):
+        if self.width is None or self.height is None:
+            return self.image.size
+        return (self.width, self.height)
+
+    @property
+    def data(self):
+        """Encoded image bytes, read from the store on first access"""
+        if self._data is None:
+            self._data = read_blob(self.digest, self._root)
+        return self._data
+
+    @property
+    def image(self):
+        """Decoded PIL image, created on first access"""
+        if self._image is None:
+            self._image = Image.open(io.BytesIO(self.data))
+            self._image.load()
+        return self._image
+
+    def __getattr__(self, name):
+        # Only reached for attributes not defined above, e.g. convert(), mode, save()
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.image, name)
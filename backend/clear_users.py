@@ -1,6 +1,8 @@
 import sqlite3
 import os
 
+from auth_cache import invalidate_users
+
 # Database setup
 DATABASE_PATH = os.path.join(os.path.dirname(__file__), 'shots_app.db')
 
@@ -17,6 +19,9 @@ def clear_all_users():
         deleted_count = cursor.rowcount
         print(f"Successfully deleted {deleted_count} user(s) from the database.")
         
+        # Running servers drop every user from their authentication cache
+        invalidate_users()
+        
     except sqlite3.Error as e:
         print(f"Error clearing users: {e}")
     finally:
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Find, and with --reclaim remove, storage nothing owns any more: project and
+session folders of deleted projects, shots and users, rows whose files are gone
+and unreferenced blobs (see storage_gc.py). Without --reclaim it only reports.
+A reclaiming run resumes from the checkpoint the last one saved.
+Safe to run while the server is up and safe to interrupt and rerun.
+
+Usage: python collect_garbage.py [--reclaim] [--batches N] [--pause SECONDS] [--status]
+"""
+import sys
+
+from storage_gc import GC_PAUSE, collect_garbage, get_gc_status
+
+def print_orphan(kind, target, size):
+    print(f"  {kind[:-1].replace('_', ' ')}: {target}" + (f" ({size / 1e6:.1f} MB)" if size else ""))
+
+def print_totals(stats):
+    print(f"📊 {stats['project_folders']} project folder(s), {stats['session_folders']} session folder(s), "
+          f"{stats['rows']} row(s), {stats['blobs']} blob(s), {stats['bytes'] / 1e6:.1f} MB")
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if "--status" in args:
+        status = get_gc_status()
+        if status is None:
+            print("📊 The collector has not run yet")
+        else:
+            print(f"📊 In phase {status['phase']}, after {status['cursor'] or 'the start'}")
+            print_totals(status["stats"])
+            if status["last_pass_stats"]:
+                print("📊 Last complete pass:")
+                print_totals(status["last_pass_stats"])
+        sys.exit(0)
+
+    reclaim = "--reclaim" in args
+    max_batches = int(args[args.index("--batches") + 1]) if "--batches" in args else None
+    pause = float(args[args.index("--pause") + 1]) if "--pause" in args else GC_PAUSE
+
+    stats = collect_garbage(reclaim=reclaim, max_batches=max_batches, pause=pause, report=print_orphan)
+    if reclaim:
+        print("✅ Reclaimed:")
+    else:
+        print("📊 Would reclaim (run with --reclaim to remove):")
+    print_totals(stats)
+    if not stats["pass_complete"]:
+        print("🔧 Stopped before the end of the pass; rerun to continue")
+    if stats["failed"]:
+        print(f"❌ {stats['failed']} item(s) could not be removed; see the log")
@@ -11,19 +11,48 @@ import shutil
 import time
 import threading
 import contextlib
+import logging
+import queue
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from collections import OrderedDict
 import bcrypt
+from image_result import ImageResult, image_result_bytes
+from thumbnails import generate_thumbnails
+from blob_store import BlobImage, put_blob, image_dimensions
+from auth_cache import invalidate_users
+from session_files import read_shots
+from session_archive import (
+    ARCHIVE_SUFFIX, RESTORING_SUFFIX, SESSION_ARCHIVE_AFTER_DAYS, archive_session, bundle_path, cold_sessions,
+    list_members, read_member
+)
+
+logger = logging.getLogger(__name__)
 
 # Get the absolute path to the database file
 DB_FILE = os.path.join(os.path.dirname(__file__), "shots_app.db")
 SESSIONS_ROOT = os.path.join(os.path.dirname(__file__), 'user_sessions')
 PROJECT_IMAGES_ROOT = os.path.join(os.path.dirname(__file__), 'project_images')
 
-# Global connection pool
-_connection_pool = None
-_connection_lock = threading.Lock()
-_connection_count = 0
+# Connection pool: one writer connection plus a pool of read-only connections (WAL mode)
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "4"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+_writer_connection = None
+_writer_lock = threading.RLock()  # Re-entrant so nested db.py calls in one thread share the writer
+_reader_pool = queue.Queue()
+_reader_count = 0
+_pool_lock = threading.Lock()
+_local = threading.local()
+_pool_stats = {
+    "write_acquisitions": 0, "write_wait_seconds": 0.0, "write_max_wait_seconds": 0.0,
+    "read_acquisitions": 0, "read_wait_seconds": 0.0, "read_max_wait_seconds": 0.0,
+    "timeouts": 0, "group_commits": 0, "queued_writes": 0, "max_group_size": 0
+}
+
+# Password hashing functions using bcrypt. Each +1 to the work factor doubles the
+# cost; existing hashes are upgraded to the configured factor on the next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
 
-# Password hashing functions using bcrypt
 def verify_password(plain_password, hashed_password):
     """Verify a plain password against a hashed one."""
     try:
@@ -33,7 +62,7 @@ def verify_password(plain_password, hashed_password):
         # checkpw returns True if they match
         return bcrypt.checkpw(password_bytes, hashed_password_bytes)
     except (ValueError, TypeError) as e:
-        print(f"Error verifying password: {e}")
+        logger.warning("Error verifying password: %s", e)
         return False
 
 def get_password_hash(password):
@@ -41,50 +70,255 @@ def get_password_hash(password):
     # bcrypt requires bytes, so encode the password
     password_bytes = password.encode('utf-8')
     # Generate a salt and hash the password
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     hashed_password = bcrypt.hashpw(password_bytes, salt)
     # Return the hash as a string to store in the DB
     return hashed_password.decode('utf-8')
 
+def password_needs_rehash(hashed_password):
+    """True if a stored hash was made with a work factor other than BCRYPT_ROUNDS"""
+    try:
+        # Hashes look like $2b$12$<salt+hash>
+        return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+def _configure_connection(conn):
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA busy_timeout = 60000")  # 60 second timeout
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA mmap_size = 30000000000")
+    return conn
+
+def _open_writer():
+    conn = sqlite3.connect(DB_FILE, timeout=60.0, check_same_thread=False)
+    # WAL lets readers run while the writer holds its lock; the setting persists in the file
+    conn.execute("PRAGMA journal_mode = WAL")
+    return _configure_connection(conn)
+
+def _open_reader():
+    # Make sure the database (and WAL mode) exists before opening read-only
+    if _writer_connection is None:
+        with _writer_lock:
+            _get_writer()
+    conn = sqlite3.connect(f"file:{DB_FILE}?mode=ro", uri=True, timeout=60.0, check_same_thread=False)
+    _configure_connection(conn)
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+def _get_writer():
+    global _writer_connection
+    if _writer_connection is None:
+        _writer_connection = _open_writer()
+    return _writer_connection
+
+def _record_wait(kind, waited):
+    with _pool_lock:
+        _pool_stats[f"{kind}_acquisitions"] += 1
+        _pool_stats[f"{kind}_wait_seconds"] += waited
+        _pool_stats[f"{kind}_max_wait_seconds"] = max(_pool_stats[f"{kind}_max_wait_seconds"], waited)
+
+def _acquire_reader():
+    global _reader_count
+    start = time.perf_counter()
+    try:
+        conn = _reader_pool.get_nowait()
+    except queue.Empty:
+        conn = None
+        with _pool_lock:
+            if _reader_count < DB_READ_POOL_SIZE:
+                _reader_count += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                conn = _open_reader()
+            except Exception:
+                with _pool_lock:
+                    _reader_count -= 1
+                raise
+        else:
+            try:
+                conn = _reader_pool.get(timeout=DB_POOL_TIMEOUT)
+            except queue.Empty:
+                with _pool_lock:
+                    _pool_stats["timeouts"] += 1
+                raise sqlite3.OperationalError(f"Timed out after {DB_POOL_TIMEOUT}s waiting for a read connection")
+    _record_wait("read", time.perf_counter() - start)
+    return conn
+
 @contextlib.contextmanager
-def get_db_connection():
-    """Get a database connection from the pool with proper cleanup"""
-    global _connection_pool, _connection_count
-    
-    with _connection_lock:
-        if _connection_pool is None:
-            # Initialize the connection pool
-            _connection_pool = sqlite3.connect(DB_FILE, timeout=60.0)
-            _connection_pool.row_factory = sqlite3.Row            # Set pragmas for better concurrency
-            _connection_pool.execute("PRAGMA busy_timeout = 60000")  # 60 second timeout
-            _connection_pool.execute("PRAGMA journal_mode = DELETE")  # Use DELETE journal mode
-            _connection_pool.execute("PRAGMA synchronous = NORMAL")
-            _connection_pool.execute("PRAGMA foreign_keys = ON")
-            _connection_pool.execute("PRAGMA temp_store = MEMORY")
-            _connection_pool.execute("PRAGMA mmap_size = 30000000000")
-            
-            print("Database: Initialized connection pool")
-        
-        _connection_count += 1
-        print(f"Database: Active connections: {_connection_count}")
+def get_db_connection(readonly=False):
+    """
+    Get a database connection with proper cleanup.
     
+    The default is the single writer connection, held exclusively for the block.
+    readonly=True borrows a read-only connection from the pool instead, and these
+    run concurrently with each other and with the writer. Nested use in one
+    thread reuses the connection already held.
+    """
+    if readonly:
+        held = getattr(_local, "reader", None)
+        if held is not None or getattr(_local, "writer_depth", 0):
+            # Already inside a block on this thread: reuse it. Inside a writer block this
+            # also means the read sees that block's uncommitted changes
+            yield held if held is not None else _writer_connection
+            return
+        conn = _acquire_reader()
+        _local.reader = conn
+        try:
+            yield conn
+        finally:
+            _local.reader = None
+            if conn.in_transaction:
+                conn.rollback()
+            _reader_pool.put(conn)
+        return
+
+    start = time.perf_counter()
+    if not _writer_lock.acquire(timeout=DB_POOL_TIMEOUT):
+        with _pool_lock:
+            _pool_stats["timeouts"] += 1
+        raise sqlite3.OperationalError(f"Timed out after {DB_POOL_TIMEOUT}s waiting for the write connection")
+    _local.writer_depth = getattr(_local, "writer_depth", 0) + 1
     try:
-        yield _connection_pool
+        if _local.writer_depth == 1:
+            _record_wait("write", time.perf_counter() - start)
+        yield _get_writer()
     finally:
-        with _connection_lock:
-            _connection_count -= 1
-            print(f"Database: Active connections: {_connection_count}")
+        _local.writer_depth -= 1
+        if _local.writer_depth == 0 and _writer_connection is not None and _writer_connection.in_transaction:
+            # Work the block did not commit (e.g. after a failed INSERT) must not leak into the next caller's transaction
+            _writer_connection.rollback()
+        _writer_lock.release()
+
+def get_pool_stats():
+    """Connection acquisition counts and wait times since startup"""
+    with _pool_lock:
+        stats = dict(_pool_stats)
+        stats["read_pool_size"] = DB_READ_POOL_SIZE
+        stats["read_connections_open"] = _reader_count
+        stats["read_connections_idle"] = _reader_pool.qsize()
+    return stats
+
+# Write queue: one writer thread applies queued write jobs and commits them in groups
+DB_GROUP_COMMIT_MAX = int(os.getenv("DB_GROUP_COMMIT_MAX", "64"))
+DB_GROUP_COMMIT_WINDOW = float(os.getenv("DB_GROUP_COMMIT_WINDOW_MS", "0")) / 1000
+DB_WRITE_TIMEOUT = float(os.getenv("DB_WRITE_TIMEOUT", "120"))  # Seconds run_write waits; above busy_timeout
+
+_write_queue = queue.Queue()
+_writer_thread = None
+_writer_thread_lock = threading.Lock()
+
+def _run_job(conn, job, args, kwargs):
+    """Run one job inside a savepoint so a failing job does not undo the rest of its group"""
+    conn.execute("SAVEPOINT write_job")
+    try:
+        result = job(conn, *args, **kwargs)
+    except BaseException:
+        conn.execute("ROLLBACK TO write_job")
+        conn.execute("RELEASE write_job")
+        raise
+    conn.execute("RELEASE write_job")
+    return result
+
+def _writer_loop():
+    while True:
+        batch = [_write_queue.get()]
+        deadline = time.perf_counter() + DB_GROUP_COMMIT_WINDOW
+        while len(batch) < DB_GROUP_COMMIT_MAX:
+            try:
+                remaining = deadline - time.perf_counter()
+                batch.append(_write_queue.get(timeout=remaining) if remaining > 0 else _write_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        outcomes = []
+        try:
+            with get_db_connection() as conn:
+                # busy_timeout makes SQLite wait for other processes' locks here; nothing sleeps in Python
+                conn.execute("BEGIN IMMEDIATE")
+                for future, job, args, kwargs in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        outcomes.append((future, True, _run_job(conn, job, args, kwargs)))
+                    except Exception as e:
+                        outcomes.append((future, False, e))
+                conn.commit()
+        except Exception as e:
+            # The group commit itself failed: nothing in the batch was written. If the
+            # connection or BEGIN failed, no future was set running yet, so fail them all
+            for future, _, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            continue
+
+        with _pool_lock:
+            _pool_stats["group_commits"] += 1
+            _pool_stats["queued_writes"] += len(batch)
+            _pool_stats["max_group_size"] = max(_pool_stats["max_group_size"], len(batch))
+        # Futures resolve only after COMMIT, so a caller that waited sees its write from any connection
+        for future, ok, value in outcomes:
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+def _ensure_writer_thread():
+    global _writer_thread
+    with _writer_thread_lock:
+        if _writer_thread is None or not _writer_thread.is_alive():
+            _writer_thread = threading.Thread(target=_writer_loop, name="db-writer", daemon=True)
+            _writer_thread.start()
+
+def submit_write(job, *args, **kwargs):
+    """
+    Queue job(conn, *args, **kwargs) for the writer thread and return a Future
+    with its return value. The job must not commit; the writer commits the group.
+    """
+    future = Future()
+    _ensure_writer_thread()
+    _write_queue.put((future, job, args, kwargs))
+    return future
+
+def run_write(job, *args, **kwargs):
+    """
+    Run a write job through the queue and wait until it is committed, at most
+    DB_WRITE_TIMEOUT seconds (then sqlite3.OperationalError is raised). A thread
+    that already holds the writer connection runs the job inline instead, inside
+    its own transaction, because queueing it would deadlock.
+    """
+    if getattr(_local, "writer_depth", 0):
+        with get_db_connection() as conn:
+            return _run_job(conn, job, args, kwargs)
+    future = submit_write(job, *args, **kwargs)
+    try:
+        return future.result(timeout=DB_WRITE_TIMEOUT)
+    except FutureTimeoutError:
+        # Still queued: make sure it never runs. Already running: it commits or fails on its own
+        future.cancel()
+        raise sqlite3.OperationalError(f"Timed out after {DB_WRITE_TIMEOUT:g}s waiting for the database writer")
 
 def close_db_connection():
-    """Close the database connection pool"""
-    global _connection_pool, _connection_count
+    """Close the writer and all idle reader connections"""
+    global _writer_connection, _reader_count
     
-    with _connection_lock:
-        if _connection_pool is not None:
-            _connection_pool.close()
-            _connection_pool = None
-            _connection_count = 0
-            print("Database: Closed connection pool")
+    with _writer_lock:
+        if _writer_connection is not None:
+            _writer_connection.close()
+            _writer_connection = None
+    while True:
+        try:
+            _reader_pool.get_nowait().close()
+        except queue.Empty:
+            break
+    with _pool_lock:
+        _reader_count = 0
+    logger.info("Closed connection pool")
 
 # Add this function to convert PIL Image to base64 string for storage
 def image_to_base64(image):
@@ -101,150 +335,445 @@ def base64_to_image(base64_str):
     image_data = base64.b64decode(base64_str)
     return Image.open(io.BytesIO(image_data))
 
-def migrate_add_project_type():
-    """Add project_type column to projects table if it doesn't exist"""
+# Keyset pagination helpers shared by the list functions
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(values):
+    """Opaque cursor holding the sort-key values of the last row on a page"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor, expected_length):
     try:
-        with get_db_connection() as conn:
-            # Check if project_type column exists
-            cursor = conn.execute("PRAGMA table_info(projects)")
-            columns = [column[1] for column in cursor.fetchall()]
-            
-            if 'project_type' not in columns:
-                print("Adding project_type column to projects table...")
-                conn.execute('''
-                    ALTER TABLE projects 
-                    ADD COLUMN project_type TEXT DEFAULT 'shot-suggestion'
-                ''')
-                conn.commit()
-                print("Successfully added project_type column")
-            else:
-                print("project_type column already exists")
-    except sqlite3.Error as e:
-        print(f"Error adding project_type column: {e}")
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if not isinstance(values, list) or len(values) != expected_length:
+        raise ValueError("Invalid cursor")
+    return values
+
+def parse_fields(fields, allowed):
+    """Turn a comma-separated fields= parameter into a list of allowed column names"""
+    if not fields:
+        return list(allowed)
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(allowed)}")
+    return requested
+
+def _keyset_condition(order, cursor_values):
+    """
+    WHERE fragment selecting rows after the cursor for a mixed-direction ORDER BY,
+    e.g. (a > ?) OR (a = ? AND b < ?) OR (a = ? AND b = ? AND c > ?)
+    """
+    clauses = []
+    params = []
+    for i, (expression, direction) in enumerate(order):
+        parts = [f"{order[j][0]} = ?" for j in range(i)]
+        parts.append(f"{expression} {'>' if direction == 'ASC' else '<'} ?")
+        clauses.append("(" + " AND ".join(parts) + ")")
+        params.extend(cursor_values[:i + 1])
+    return "(" + " OR ".join(clauses) + ")", params
+
+def _decode_json_columns(row_dict, json_columns):
+    # Only columns that were selected are decoded
+    for column in json_columns:
+        if row_dict.get(column):
+            try:
+                row_dict[column] = json.loads(row_dict[column])
+            except json.JSONDecodeError:
+                row_dict[column] = None
+    return row_dict
+
+def _select_page(conn, columns, from_sql, where_sql, params, order, fields=None, limit=None,
+                 cursor=None, group_by=None, json_columns=()):
+    """
+    Run a projected, keyset-paginated SELECT. columns maps field name -> SQL
+    expression; order is a list of (field, "ASC"|"DESC") ending in a unique key.
+    Returns (rows, next_cursor). next_cursor is None on the last page.
+    """
+    selected = parse_fields(fields, list(columns))
+    sort_fields = [field for field, _ in order]
+    query_fields = selected + [field for field in sort_fields if field not in selected]
+    order_sql = [(columns[field], direction) for field, direction in order]
+
+    where = [where_sql]
+    query_params = list(params)
+    if cursor:
+        condition, condition_params = _keyset_condition(order_sql, decode_cursor(cursor, len(order)))
+        where.append(condition)
+        query_params.extend(condition_params)
+
+    sql = f"SELECT {', '.join(f'{columns[field]} AS {field}' for field in query_fields)} FROM {from_sql} WHERE {' AND '.join(where)}"
+    if group_by:
+        sql += f" GROUP BY {group_by}"
+    sql += " ORDER BY " + ", ".join(f"{expression} {direction}" for expression, direction in order_sql)
+    if limit is not None:
+        sql += " LIMIT ?"
+        query_params.append(min(limit, MAX_PAGE_SIZE) + 1)
+
+    rows = conn.execute(sql, query_params).fetchall()
+    next_cursor = None
+    if limit is not None and len(rows) > min(limit, MAX_PAGE_SIZE):
+        rows = rows[:min(limit, MAX_PAGE_SIZE)]
+        next_cursor = encode_cursor([rows[-1][field] for field in sort_fields])
+    result = []
+    for row in rows:
+        row_dict = {field: row[field] for field in selected}
+        result.append(_decode_json_columns(row_dict, [column for column in json_columns if column in row_dict]))
+    return result, next_cursor
+
+# Schema migrations. Each one runs once, in its own transaction, and
+# PRAGMA user_version records the last one applied.
+def _migration_base_schema(conn):
+    """Tables and columns as they were before versioned migrations; safe on older databases"""
+    # Create users table with simplified schema
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS users (
+        id TEXT PRIMARY KEY,
+        username TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    
+    # Create projects table
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS projects (
+        id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        name TEXT NOT NULL,
+        description TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+    )
+    ''')
+    
+    # Create shots table with all required columns
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS shots (
+        id TEXT PRIMARY KEY,
+        project_id TEXT NOT NULL,
+        shot_number INTEGER NOT NULL,
+        scene_description TEXT NOT NULL,
+        shot_description TEXT NOT NULL,
+        model_name TEXT NOT NULL,
+        image_url TEXT,
+        metadata TEXT,
+        version_number INTEGER DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (project_id) REFERENCES projects (id) ON DELETE CASCADE
+    )
+    ''')
+    
+    # Verify all required columns exist
+    try:
+        # Check if version_number column exists
+        conn.execute("SELECT version_number FROM shots LIMIT 1")
+    except sqlite3.OperationalError:
+        logger.info("Adding version_number column to shots table")
+        conn.execute('ALTER TABLE shots ADD COLUMN version_number INTEGER DEFAULT 1')
+    
+    try:
+        # Check if metadata column exists
+        conn.execute("SELECT metadata FROM shots LIMIT 1")
+    except sqlite3.OperationalError:
+        logger.info("Adding metadata column to shots table")
+        conn.execute('ALTER TABLE shots ADD COLUMN metadata TEXT')
+    
+    # Create shot_images table; image bytes live in the blob store, keyed by blob_hash.
+    # image_data only holds base64 for rows not yet moved by migrate_shot_images_to_blob_store
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS shot_images (
+        id TEXT PRIMARY KEY,
+        shot_id TEXT NOT NULL,
+        shot_number INTEGER NOT NULL,
+        image_data TEXT NOT NULL DEFAULT '',
+        blob_hash TEXT,
+        byte_size INTEGER,
+        width INTEGER,
+        height INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (shot_id) REFERENCES shots (id) ON DELETE CASCADE
+    )
+    ''')
+    
+    shot_image_columns = [column[1] for column in conn.execute("PRAGMA table_info(shot_images)").fetchall()]
+    for column, column_type in (("blob_hash", "TEXT"), ("byte_size", "INTEGER"), ("width", "INTEGER"), ("height", "INTEGER")):
+        if column not in shot_image_columns:
+            logger.info("Adding %s column to shot_images table", column)
+            conn.execute(f"ALTER TABLE shot_images ADD COLUMN {column} {column_type}")
+    
+    # Create sessions table
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS sessions (
+        id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        name TEXT NOT NULL,
+        data TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        project_id TEXT,
+        FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
+        UNIQUE(user_id, name)
+    )
+    ''')
+
+    # Project sessions record the project they were saved to
+    session_columns = [row[1] for row in conn.execute("PRAGMA table_info(sessions)").fetchall()]
+    if "project_id" not in session_columns:
+        logger.info("Adding project_id column to sessions table")
+        conn.execute("ALTER TABLE sessions ADD COLUMN project_id TEXT")
+
+    # Create shot_versions table to track different versions of shots
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS shot_versions (
+        id TEXT PRIMARY KEY,
+        shot_id TEXT NOT NULL,
+        version_number INTEGER NOT NULL,
+        scene_description TEXT NOT NULL,
+        shot_description TEXT NOT NULL,
+        model_name TEXT NOT NULL,
+        image_url TEXT,
+        metadata TEXT,
+        user_input TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (shot_id) REFERENCES shots (id) ON DELETE CASCADE
+    )
+    ''')
+    
+    # Add triggers for updated_at timestamps
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS update_project_timestamp 
+    AFTER UPDATE ON projects
+    BEGIN
+        UPDATE projects SET updated_at = CURRENT_TIMESTAMP
+        WHERE id = NEW.id;
+    END        ''')
+
+    # Add project_type column to projects table if it doesn't exist
+    project_columns = [column[1] for column in conn.execute("PRAGMA table_info(projects)").fetchall()]
+    if 'project_type' not in project_columns:
+        logger.info("Adding project_type column to projects table...")
+        conn.execute("ALTER TABLE projects ADD COLUMN project_type TEXT DEFAULT 'shot-suggestion'")
+
+def _migration_indexes(conn):
+    """Indexes for the foreign keys and list orderings used by every request"""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_projects_user_id ON projects (user_id, updated_at DESC)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_shots_project_id ON shots (project_id, shot_number)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_shot_versions_shot_id ON shot_versions (shot_id, version_number DESC)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_shot_images_shot_id ON shot_images (shot_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions (user_id, updated_at DESC)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_project_id ON sessions (project_id)")
+
+def _migration_project_counters(conn):
+    """
+    Keep shot_count and last_shot_date on projects, maintained by triggers on
+    shots, so project reads do not join and aggregate the shots table.
+    """
+    conn.execute("ALTER TABLE projects ADD COLUMN shot_count INTEGER NOT NULL DEFAULT 0")
+    conn.execute("ALTER TABLE projects ADD COLUMN last_shot_date TIMESTAMP")
+    # Counter updates must not bump updated_at, which orders the project list.
+    # Replace the trigger before the backfill, or it would reset every project's updated_at
+    conn.execute("DROP TRIGGER IF EXISTS update_project_timestamp")
+    conn.execute('''
+    CREATE TRIGGER update_project_timestamp
+    AFTER UPDATE OF user_id, name, description, project_type ON projects
+    BEGIN
+        UPDATE projects SET updated_at = CURRENT_TIMESTAMP
+        WHERE id = NEW.id;
+    END''')
+    conn.execute('''
+    UPDATE projects SET
+        shot_count = (SELECT COUNT(*) FROM shots WHERE shots.project_id = projects.id),
+        last_shot_date = (SELECT MAX(created_at) FROM shots WHERE shots.project_id = projects.id)
+    ''')
+
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS shots_counter_insert
+    AFTER INSERT ON shots
+    BEGIN
+        UPDATE projects SET
+            shot_count = shot_count + 1,
+            last_shot_date = CASE
+                WHEN last_shot_date IS NULL OR NEW.created_at > last_shot_date THEN NEW.created_at
+                ELSE last_shot_date
+            END
+        WHERE id = NEW.project_id;
+    END''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS shots_counter_delete
+    AFTER DELETE ON shots
+    BEGIN
+        UPDATE projects SET
+            shot_count = shot_count - 1,
+            last_shot_date = (SELECT MAX(created_at) FROM shots WHERE project_id = OLD.project_id)
+        WHERE id = OLD.project_id;
+    END''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS shots_counter_update
+    AFTER UPDATE OF project_id, created_at ON shots
+    BEGIN
+        UPDATE projects SET
+            shot_count = (SELECT COUNT(*) FROM shots WHERE shots.project_id = projects.id),
+            last_shot_date = (SELECT MAX(created_at) FROM shots WHERE shots.project_id = projects.id)
+        WHERE id IN (OLD.project_id, NEW.project_id);
+    END''')
+
+def _migration_session_catalog(conn):
+    """
+    Catalog of the session folders under PROJECT_IMAGES_ROOT, so listing a
+    project's sessions is one indexed query instead of a directory scan.
+    Filled lazily by reconcile_project_sessions.
+    """
+    conn.execute('''
+    CREATE TABLE project_sessions (
+        project_id TEXT NOT NULL,
+        name TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        type TEXT NOT NULL,
+        has_input INTEGER NOT NULL DEFAULT 0,
+        has_shots INTEGER NOT NULL DEFAULT 0,
+        has_output INTEGER NOT NULL DEFAULT 0,
+        dir_mtime_ns INTEGER NOT NULL,
+        PRIMARY KEY (project_id, name)
+    )''')
+    conn.execute("CREATE INDEX idx_project_sessions_created ON project_sessions (project_id, created_at DESC, name)")
+    # Project folder mtime as of the last full reconcile of that project
+    conn.execute('''
+    CREATE TABLE project_session_scans (
+        project_id TEXT PRIMARY KEY,
+        dir_mtime_ns INTEGER NOT NULL,
+        scanned_at REAL NOT NULL
+    )''')
+
+def _migration_filesystem_session_index(conn):
+    """Where each SESSIONS_ROOT session folder lives, so lookups by id need no directory walk"""
+    conn.execute('''
+    CREATE TABLE filesystem_sessions (
+        user_id TEXT NOT NULL,
+        session_id TEXT NOT NULL,
+        project_dir TEXT NOT NULL,
+        PRIMARY KEY (user_id, session_id)
+    )''')
+
+def _migration_session_archive(conn):
+    """Mark catalog entries whose session is packed into a bundle (see session_archive)"""
+    conn.execute("ALTER TABLE project_sessions ADD COLUMN archived INTEGER NOT NULL DEFAULT 0")
+
+def _migration_storage_gc_checkpoint(conn):
+    """Position and running totals of the storage garbage collector (see storage_gc)"""
+    conn.execute('''
+    CREATE TABLE storage_gc_checkpoint (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        phase TEXT NOT NULL,
+        cursor TEXT,
+        pass_started_at REAL NOT NULL,
+        stats TEXT NOT NULL,
+        updated_at REAL NOT NULL,
+        last_pass_finished_at REAL,
+        last_pass_stats TEXT
+    )''')
+
+def _migration_storage_usage(conn):
+    """
+    Bytes and files per stored folder, rolled up by triggers into per-user and
+    per-project totals in storage_usage, so usage is read without a tree walk
+    """
+    conn.execute('''
+    CREATE TABLE storage_folders (
+        folder TEXT PRIMARY KEY,
+        user_id TEXT,
+        project_id TEXT,
+        bytes INTEGER NOT NULL,
+        files INTEGER NOT NULL,
+        measured_at REAL NOT NULL
+    )''')
+    conn.execute("CREATE INDEX idx_storage_folders_project ON storage_folders (project_id)")
+    conn.execute('''
+    CREATE TABLE storage_usage (
+        owner_type TEXT NOT NULL,
+        owner_id TEXT NOT NULL,
+        bytes INTEGER NOT NULL DEFAULT 0,
+        files INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (owner_type, owner_id)
+    )''')
+    # When the last reconciliation pass (see storage_usage) finished
+    conn.execute('''
+    CREATE TABLE storage_usage_scans (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        finished_at REAL NOT NULL
+    )''')
+
+    # OR IGNORE would be overridden by the conflict handling of the UPSERT that fires the trigger
+    add_new = '''
+        INSERT INTO storage_usage (owner_type, owner_id)
+        SELECT 'user', NEW.user_id WHERE NEW.user_id IS NOT NULL AND NOT EXISTS (
+            SELECT 1 FROM storage_usage WHERE owner_type = 'user' AND owner_id = NEW.user_id)
+        UNION ALL
+        SELECT 'project', NEW.project_id WHERE NEW.project_id IS NOT NULL AND NOT EXISTS (
+            SELECT 1 FROM storage_usage WHERE owner_type = 'project' AND owner_id = NEW.project_id);
+        UPDATE storage_usage SET bytes = bytes + NEW.bytes, files = files + NEW.files
+        WHERE (owner_type = 'user' AND owner_id = NEW.user_id)
+           OR (owner_type = 'project' AND owner_id = NEW.project_id);'''
+    subtract_old = '''
+        UPDATE storage_usage SET bytes = bytes - OLD.bytes, files = files - OLD.files
+        WHERE (owner_type = 'user' AND owner_id = OLD.user_id)
+           OR (owner_type = 'project' AND owner_id = OLD.project_id);'''
+    conn.execute(f"CREATE TRIGGER storage_folders_insert AFTER INSERT ON storage_folders BEGIN {add_new} END")
+    conn.execute(f"CREATE TRIGGER storage_folders_delete AFTER DELETE ON storage_folders BEGIN {subtract_old} END")
+    conn.execute(f'''
+    CREATE TRIGGER storage_folders_update
+    AFTER UPDATE OF user_id, project_id, bytes, files ON storage_folders
+    BEGIN {subtract_old} {add_new} END''')
+
+SCHEMA_MIGRATIONS = [
+    (1, "base schema", _migration_base_schema),
+    (2, "indexes", _migration_indexes),
+    (3, "project shot counters", _migration_project_counters),
+    (4, "session catalog", _migration_session_catalog),
+    (5, "filesystem session index", _migration_filesystem_session_index),
+    (6, "archived sessions", _migration_session_archive),
+    (7, "storage gc checkpoint", _migration_storage_gc_checkpoint),
+    (8, "storage usage counters", _migration_storage_usage),
+]
+SCHEMA_VERSION = SCHEMA_MIGRATIONS[-1][0]
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
 
 def init_db():
-    """Initialize the database with required tables if they don't exist"""
+    """Apply pending schema migrations. Does nothing once the schema is current."""
     with get_db_connection() as conn:
-        # Create users table with simplified schema
-        conn.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id TEXT PRIMARY KEY,
-            username TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-        
-        # Create projects table
-        conn.execute('''
-        CREATE TABLE IF NOT EXISTS projects (
-            id TEXT PRIMARY KEY,
-            user_id TEXT NOT NULL,
-            name TEXT NOT NULL,
-            description TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
-        )
-        ''')
-        
-        # Create shots table with all required columns
-        conn.execute('''
-        CREATE TABLE IF NOT EXISTS shots (
-            id TEXT PRIMARY KEY,
-            project_id TEXT NOT NULL,
-            shot_number INTEGER NOT NULL,
-            scene_description TEXT NOT NULL,
-            shot_description TEXT NOT NULL,
-            model_name TEXT NOT NULL,
-            image_url TEXT,
-            metadata TEXT,
-            version_number INTEGER DEFAULT 1,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (project_id) REFERENCES projects (id) ON DELETE CASCADE
-        )
-        ''')
-        
-        # Verify all required columns exist
-        try:
-            # Check if version_number column exists
-            conn.execute("SELECT version_number FROM shots LIMIT 1")
-        except sqlite3.OperationalError:
-            print("Database: Adding version_number column to shots table")
-            conn.execute('ALTER TABLE shots ADD COLUMN version_number INTEGER DEFAULT 1')
-        
-        try:
-            # Check if metadata column exists
-            conn.execute("SELECT metadata FROM shots LIMIT 1")
-        except sqlite3.OperationalError:
-            print("Database: Adding metadata column to shots table")
-            conn.execute('ALTER TABLE shots ADD COLUMN metadata TEXT')
-        
-        # Create shot_images table
-        conn.execute('''
-        CREATE TABLE IF NOT EXISTS shot_images (
-            id TEXT PRIMARY KEY,
-            shot_id TEXT NOT NULL,
-            shot_number INTEGER NOT NULL,
-            image_data TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (shot_id) REFERENCES shots (id) ON DELETE CASCADE
-        )
-        ''')
-        
-        # Create sessions table
-        conn.execute('''
-        CREATE TABLE IF NOT EXISTS sessions (
-            id TEXT PRIMARY KEY,
-            user_id TEXT NOT NULL,
-            name TEXT NOT NULL,
-            data TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
-            UNIQUE(user_id, name)
-        )
-        ''')
-        
-        # Create shot_versions table to track different versions of shots
-        conn.execute('''
-        CREATE TABLE IF NOT EXISTS shot_versions (
-            id TEXT PRIMARY KEY,
-            shot_id TEXT NOT NULL,
-            version_number INTEGER NOT NULL,
-            scene_description TEXT NOT NULL,
-            shot_description TEXT NOT NULL,
-            model_name TEXT NOT NULL,
-            image_url TEXT,
-            metadata TEXT,
-            user_input TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (shot_id) REFERENCES shots (id) ON DELETE CASCADE
-        )
-        ''')
-        
-        # Add triggers for updated_at timestamps
-        conn.execute('''
-        CREATE TRIGGER IF NOT EXISTS update_project_timestamp 
-        AFTER UPDATE ON projects
-        BEGIN
-            UPDATE projects SET updated_at = CURRENT_TIMESTAMP
-            WHERE id = NEW.id;
-        END        ''')
-        
-        # Run migration to add project_type column
-        migrate_add_project_type()
-        
-        # Commit all changes
-        conn.commit()
-        print("Database: Initialized successfully")
+        if get_schema_version(conn) >= SCHEMA_VERSION:
+            return
+        for version, description, migrate in SCHEMA_MIGRATIONS:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Checked again under the write lock: another process may have migrated meanwhile
+                if get_schema_version(conn) >= version:
+                    conn.rollback()
+                    continue
+                logger.info("Applying migration %s (%s)", version, description)
+                migrate(conn)
+                conn.execute(f"PRAGMA user_version = {version}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        logger.info("Schema is at version %s", SCHEMA_VERSION)
 
 # User management functions
 def create_user(username, password):
     """Create a new user account with a securely hashed password"""
+    return create_user_with_hash(username, get_password_hash(password))
+
+def create_user_with_hash(username, password_hash):
+    """Create a user from an already computed password hash"""
     user_id = str(uuid.uuid4())
-    password_hash = get_password_hash(password)
-    print(f"DEBUG: Registering user '{username}' with hash starting with: {password_hash[:10]}")
+    logger.debug("Registering user '%s' with hash starting with: %s", username, password_hash[:10])
     try:
         with get_db_connection() as conn:
             conn.execute(
@@ -257,39 +786,52 @@ def create_user(username, password):
             conn.commit()
             return user_id
     except sqlite3.IntegrityError as e:
-        print(f"Error creating user: {e}")
+        logger.error("Error creating user: %s", e)
         return None
     except Exception as e:
-        print(f"Unexpected error creating user: {e}")
+        logger.error("Unexpected error creating user: %s", e)
         return None
 
+def update_password_hash(username, password_hash):
+    """Replace a user's stored hash, e.g. after a work factor upgrade"""
+    with get_db_connection() as conn:
+        conn.execute("UPDATE users SET password_hash = ? WHERE username = ?", (password_hash, username))
+        conn.commit()
+    # Cached user records carry the old hash
+    invalidate_users([username])
+
 def authenticate_user(username, password):
     """Authenticate a user by username and password"""
     user = get_user_by_username(username)
     if not user:
-        print(f"DEBUG: Authentication failed: User '{username}' not found.")
+        logger.debug("Authentication failed: User '%s' not found.", username)
         return None
     
-    print(f"DEBUG: Authenticating user '{username}'. Retrieved hash starts with: {user['password_hash'][:10]}")
+    logger.debug("Authenticating user '%s'. Retrieved hash starts with: %s", username, user['password_hash'][:10])
     
     is_verified = verify_password(password, user["password_hash"])
     
     if not is_verified:
-        print(f"DEBUG: Password verification failed for user '{username}'.")
+        logger.debug("Password verification failed for user '%s'.", username)
         return None
+    
+    if password_needs_rehash(user["password_hash"]):
+        user["password_hash"] = get_password_hash(password)
+        update_password_hash(username, user["password_hash"])
+        logger.debug("Rehashed password for user '%s' with work factor %s.", username, BCRYPT_ROUNDS)
         
-    print(f"DEBUG: Authentication successful for user '{username}'.")
+    logger.debug("Authentication successful for user '%s'.", username)
     return user
 
 def get_user_by_id(user_id):
     """Get user by ID"""
-    with get_db_connection() as conn:
+    with get_db_connection(readonly=True) as conn:
         user = conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
         return dict(user) if user else None
 
 def get_user_by_username(username):
     """Get user by username"""
-    with get_db_connection() as conn:
+    with get_db_connection(readonly=True) as conn:
         user = conn.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
         return dict(user) if user else None
 
@@ -306,56 +848,61 @@ def create_project(user_id, name, description="", project_type="shot-suggestion"
             conn.commit()
             return project_id
     except sqlite3.Error as e:
-        print(f"Error creating project: {e}")
+        logger.error("Error creating project: %s", e)
         return None
 
-def get_user_projects(user_id):
-    """Get all projects for a user"""
+PROJECT_COLUMNS = (
+    "id", "user_id", "name", "description", "project_type", "created_at", "updated_at",
+    "shot_count", "last_shot_date"
+)
+# Storage totals are kept in storage_usage; projects with nothing stored have no row
+PROJECT_USAGE_JOIN = (
+    "projects LEFT JOIN storage_usage"
+    " ON storage_usage.owner_type = 'project' AND storage_usage.owner_id = projects.id"
+)
+PROJECT_USAGE_COLUMNS = {
+    "storage_bytes": "COALESCE(storage_usage.bytes, 0)",
+    "storage_files": "COALESCE(storage_usage.files, 0)",
+}
+PROJECT_USAGE_SELECT = ", ".join(f"{expression} AS {field}" for field, expression in PROJECT_USAGE_COLUMNS.items())
+
+def get_user_projects_page(user_id, fields=None, limit=None, cursor=None):
+    """Get one page of a user's projects, newest update first. Returns (projects, next_cursor)."""
     try:
-        with get_db_connection() as conn:
-            projects = conn.execute(
-                """
-                SELECT p.*, 
-                       COUNT(s.id) as shot_count,
-                       MAX(s.created_at) as last_shot_date
-                FROM projects p
-                LEFT JOIN shots s ON p.id = s.project_id
-                WHERE p.user_id = ?
-                GROUP BY p.id
-                ORDER BY p.updated_at DESC
-                """,
-                (user_id,)
-            ).fetchall()
-            return [dict(project) for project in projects]
+        with get_db_connection(readonly=True) as conn:
+            return _select_page(
+                conn, {**{column: f"projects.{column}" for column in PROJECT_COLUMNS}, **PROJECT_USAGE_COLUMNS},
+                PROJECT_USAGE_JOIN, "projects.user_id = ?", (user_id,),
+                [("updated_at", "DESC"), ("id", "ASC")],
+                fields=fields, limit=limit, cursor=cursor
+            )
     except sqlite3.Error as e:
-        print(f"Error getting user projects: {e}")
-        return []
+        logger.error("Error getting user projects: %s", e)
+        return [], None
+
+def get_user_projects(user_id):
+    """Get all projects for a user"""
+    return get_user_projects_page(user_id)[0]
+
 
 def get_project(project_id):
     """Get project by ID"""
     try:
-        print(f"Database: Fetching project {project_id}")  # Debug log
-        with get_db_connection() as conn:
+        logger.debug("Fetching project %s", project_id)
+        with get_db_connection(readonly=True) as conn:
+            # shot_count and last_shot_date are kept current by triggers on shots
             project = conn.execute(
-                """
-                SELECT p.*, 
-                       COUNT(s.id) as shot_count,
-                       MAX(s.created_at) as last_shot_date
-                FROM projects p
-                LEFT JOIN shots s ON p.id = s.project_id
-                WHERE p.id = ?
-                GROUP BY p.id
-                """,
+                f"SELECT projects.*, {PROJECT_USAGE_SELECT} FROM {PROJECT_USAGE_JOIN} WHERE projects.id = ?",
                 (project_id,)
             ).fetchone()
             if project:
-                print(f"Database: Found project {project_id}")  # Debug log
+                logger.debug("Found project %s", project_id)
                 return dict(project)
             else:
-                print(f"Database: Project {project_id} not found")  # Debug log
+                logger.debug("Project %s not found", project_id)
                 return None
     except Exception as e:
-        print(f"Database error fetching project {project_id}: {str(e)}")  # Debug log
+        logger.error("Database error fetching project %s: %s", project_id, e)
         raise
 
 def delete_project(project_id):
@@ -365,126 +912,324 @@ def delete_project(project_id):
         conn.execute("DELETE FROM shots WHERE project_id = ?", (project_id,))
         # Then delete the project
         conn.execute("DELETE FROM projects WHERE id = ?", (project_id,))
+        # Its files wait for storage_gc but no longer count towards the owner's usage
+        conn.execute("DELETE FROM storage_folders WHERE project_id = ?", (project_id,))
+        conn.execute("DELETE FROM storage_usage WHERE owner_type = 'project' AND owner_id = ?", (project_id,))
         conn.commit()
+    invalidate_project_owner(project_id)
+
+# Project ownership cache: project_id -> (user_id, cached_at). A project never
+# changes owner, so entries only go stale when it is deleted. delete_project
+# drops them here, and the TTL bounds how long another worker process can
+# still see a deleted project.
+PROJECT_OWNER_CACHE_TTL = float(os.getenv("PROJECT_OWNER_CACHE_TTL", "300"))
+PROJECT_OWNER_CACHE_SIZE = int(os.getenv("PROJECT_OWNER_CACHE_SIZE", "4096"))
+
+_project_owners = OrderedDict()
+_project_owners_lock = threading.Lock()
+_project_owners_generation = 0
+
+def cached_project_owner(project_id):
+    """Owner from the cache without touching the database, or None on a miss"""
+    with _project_owners_lock:
+        entry = _project_owners.get(project_id)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[1] >= PROJECT_OWNER_CACHE_TTL:
+            del _project_owners[project_id]
+            return None
+        _project_owners.move_to_end(project_id)
+        return entry[0]
+
+def get_project_owner(project_id):
+    """user_id of a project, or None if it does not exist"""
+    owner = cached_project_owner(project_id)
+    if owner is not None:
+        return owner
+    with _project_owners_lock:
+        generation = _project_owners_generation
+    with get_db_connection(readonly=True) as conn:
+        row = conn.execute("SELECT user_id FROM projects WHERE id = ?", (project_id,)).fetchone()
+    if row is None:
+        return None
+    with _project_owners_lock:
+        # Skip caching if a project was deleted while this lookup ran
+        if generation == _project_owners_generation:
+            _project_owners[project_id] = (row["user_id"], time.monotonic())
+            while len(_project_owners) > PROJECT_OWNER_CACHE_SIZE:
+                _project_owners.popitem(last=False)
+    return row["user_id"]
+
+def invalidate_project_owner(project_id):
+    global _project_owners_generation
+    with _project_owners_lock:
+        _project_owners.pop(project_id, None)
+        _project_owners_generation += 1
+
+# Storage usage. Every folder the app writes into (a project session, a session
+# under SESSIONS_ROOT, a save_shot_image folder) has a storage_folders row with
+# its bytes and files, and triggers keep the per-user and per-project totals in
+# storage_usage in step. A writer re-measures only the folder it changed; the
+# periodic pass in storage_usage.py re-measures everything and corrects drift.
+# Blobs are shared between owners and are not counted.
+def _usage_key(path):
+    """Folder key relative to the storage roots, e.g. project_images/<project>/<session>"""
+    path = os.path.abspath(path)
+    for label, root in (("project_images", PROJECT_IMAGES_ROOT), ("user_sessions", SESSIONS_ROOT)):
+        relative = os.path.relpath(path, os.path.abspath(root))
+        if relative != os.curdir and not relative.startswith(os.pardir):
+            return f"{label}/{relative.replace(os.sep, '/')}"
+    return None
+
+def _folder_usage(path):
+    """(bytes, files) stored in a folder, or in its session bundle; None if neither exists"""
+    if not os.path.isdir(path):
+        try:
+            return os.path.getsize(bundle_path(path)), 1
+        except FileNotFoundError:
+            return None
+    total_bytes = files = 0
+    pending = [path]
+    while pending:
+        try:
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        try:
+                            total_bytes += entry.stat().st_size
+                            files += 1
+                        except FileNotFoundError:
+                            pass
+        except FileNotFoundError:
+            continue
+    return total_bytes, files
+
+def _write_folder_usage(conn, entries):
+    """entries: (key, user_id, project_id, (bytes, files) or None for a folder that is gone)"""
+    now = time.time()
+    conn.executemany(
+        """
+        INSERT INTO storage_folders (folder, user_id, project_id, bytes, files, measured_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(folder) DO UPDATE SET
+            user_id = excluded.user_id, project_id = excluded.project_id,
+            bytes = excluded.bytes, files = excluded.files, measured_at = excluded.measured_at
+        """,
+        [(key, user_id, project_id, usage[0], usage[1], now) for key, user_id, project_id, usage in entries if usage]
+    )
+    conn.executemany(
+        "DELETE FROM storage_folders WHERE folder = ?",
+        [(key,) for key, _, _, usage in entries if not usage]
+    )
+
+def _delete_folder_usage(conn, key):
+    # Keys sort so that everything under key/ lies between "key/" and "key0"
+    conn.execute(
+        "DELETE FROM storage_folders WHERE folder = ? OR (folder > ? AND folder < ?)",
+        (key, key + "/", key + "0")
+    )
+
+def record_folder_usage(path, user_id, project_id=None):
+    """Re-measure one folder after files in it were written or deleted"""
+    key = _usage_key(path)
+    if key is None:
+        return
+    try:
+        run_write(_write_folder_usage, [(key, user_id, project_id, _folder_usage(path))])
+    except (sqlite3.Error, OSError) as e:
+        # The next reconciliation pass measures it
+        logger.warning("Could not update storage usage for %s: %s", key, e)
+
+def record_session_usage(project_id, session_name):
+    """record_folder_usage for a session folder of a project"""
+    record_folder_usage(os.path.join(PROJECT_IMAGES_ROOT, project_id, session_name), get_project_owner(project_id), project_id)
+
+def forget_folder_usage(path):
+    """Stop counting a folder, and everything under it, that was removed"""
+    key = _usage_key(path)
+    if key is not None:
+        run_write(_delete_folder_usage, key)
+
+def get_storage_usage(user_id):
+    """A user's stored bytes and files, in total and per project"""
+    with get_db_connection(readonly=True) as conn:
+        total = conn.execute(
+            "SELECT bytes, files FROM storage_usage WHERE owner_type = 'user' AND owner_id = ?",
+            (user_id,)
+        ).fetchone()
+        projects = conn.execute(
+            f"""
+            SELECT projects.id AS project_id, projects.name, {PROJECT_USAGE_SELECT}
+            FROM {PROJECT_USAGE_JOIN} WHERE projects.user_id = ?
+            ORDER BY storage_bytes DESC, projects.id
+            """,
+            (user_id,)
+        ).fetchall()
+        scan = conn.execute("SELECT finished_at FROM storage_usage_scans WHERE id = 1").fetchone()
+    return {
+        "bytes": total["bytes"] if total else 0,
+        "files": total["files"] if total else 0,
+        "projects": [dict(row) for row in projects],
+        "reconciled_at": datetime.fromtimestamp(scan["finished_at"]).isoformat() if scan else None,
+    }
 
 # Shot management functions
+def _insert_shot(conn, shot_id, project_id, shot_number, scene_description, shot_description,
+                 model_name, image_url, metadata_json, version_id, user_input_json):
+    conn.execute(
+        """
+        INSERT INTO shots (
+            id, project_id, shot_number, scene_description,
+            shot_description, model_name, image_url, metadata, version_number
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (shot_id, project_id, shot_number, scene_description,
+         shot_description, model_name, image_url, metadata_json, 1)
+    )
+    _insert_shot_version(conn, version_id, shot_id, 1, scene_description, shot_description,
+                         model_name, image_url, metadata_json, user_input_json)
+    return shot_id
+
 def save_shot(project_id, shot_number, scene_description, shot_description, model_name, image_url=None, metadata=None, user_input=None):
-    """Save a shot to the database and create initial version"""
+    """Save a shot to the database and create initial version, committed together"""
     shot_id = str(uuid.uuid4())
     
     try:
-        print(f"Database: Starting to save shot {shot_id} for project {project_id}")
-        print(f"Database: Shot details - number={shot_number}, model={model_name}")
+        logger.debug("Saving shot %s for project %s (number=%s, model=%s)", shot_id, project_id, shot_number, model_name)
         
-        # Ensure metadata is a dictionary and convert to JSON string
-        try:
-            metadata_json = json.dumps(metadata) if isinstance(metadata, dict) else None
-            print(f"Database: Prepared metadata JSON: {metadata_json}")
-        except Exception as e:
-            print(f"Database: Error preparing metadata JSON: {str(e)}")
-            raise
+        # Keep image bytes out of the row
+        image_url = externalize_image_url(image_url)
+        metadata_json = json.dumps(metadata) if isinstance(metadata, dict) else None
+        user_input_json = json.dumps(user_input) if isinstance(user_input, dict) else None
         
-        # Use context manager for connection
-        with get_db_connection() as conn:
-            # Start transaction with retry logic
-            max_retries = 5
-            retry_delay = 0.5
-            
-            for attempt in range(max_retries):
-                try:
-                    print(f"Database: Starting transaction (attempt {attempt + 1}/{max_retries})")
-                    conn.execute("BEGIN IMMEDIATE TRANSACTION")
-                    
-                    try:
-                        # Insert the shot
-                        print("Database: Inserting shot record")
-                        conn.execute(
-                            """
-                            INSERT INTO shots (
-                                id, project_id, shot_number, scene_description,
-                                shot_description, model_name, image_url, metadata, version_number
-                            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                            """,
-                            (shot_id, project_id, shot_number, scene_description,
-                             shot_description, model_name, image_url, metadata_json, 1)
-                        )
-                        print("Database: Shot record inserted successfully")
-                        
-                        # Save initial version
-                        print("Database: Saving initial shot version")
-                        version_id = save_shot_version(
-                            shot_id, 1, scene_description, shot_description,
-                            model_name, image_url, metadata, user_input
-                        )
-                        
-                        if not version_id:
-                            print("Database: Failed to save shot version")
-                            raise sqlite3.Error("Failed to save shot version")
-                        
-                        print(f"Database: Successfully saved shot version {version_id}")
-                        
-                        # Commit transaction
-                        print("Database: Committing transaction")
-                        conn.commit()
-                        print(f"Database: Successfully saved shot {shot_id}")
-                        return shot_id
-                        
-                    except sqlite3.Error as e:
-                        print(f"Database: SQLite error during shot save: {str(e)}")
-                        conn.rollback()
-                        if "database is locked" in str(e) and attempt < max_retries - 1:
-                            print(f"Database: Locked, retrying in {retry_delay} seconds...")
-                            time.sleep(retry_delay)
-                            retry_delay *= 1.5  # Slower backoff
-                            continue
-                        raise
-                        
-                except Exception as e:
-                    print(f"Database: Unexpected error (attempt {attempt + 1}): {str(e)}")
-                    conn.rollback()
-                    if attempt == max_retries - 1:
-                        raise
-                    time.sleep(retry_delay)
-                    retry_delay *= 1.5
-                    
+        # The shot and its first version go through the write queue as one job
+        return run_write(
+            _insert_shot, shot_id, project_id, shot_number, scene_description, shot_description,
+            model_name, image_url, metadata_json, str(uuid.uuid4()), user_input_json
+        )
     except Exception as e:
-        print(f"Database: Fatal error saving shot: {str(e)}")
+        logger.error("Fatal error saving shot: %s", e)
         raise
 
-def get_project_shots(project_id):
-    """Get all shots for a project"""
+def _insert_shots_bulk(conn, session_row, shot_rows, version_rows):
+    if session_row is not None:
+        conn.execute(
+            """
+            INSERT INTO sessions (id, user_id, name, data, created_at, project_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            session_row
+        )
+    conn.executemany(
+        """
+        INSERT INTO shots (
+            id, project_id, shot_number, scene_description,
+            shot_description, model_name, image_url, metadata, version_number
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1)
+        """,
+        shot_rows
+    )
+    conn.executemany(
+        """
+        INSERT INTO shot_versions (
+            id, shot_id, version_number, scene_description,
+            shot_description, model_name, image_url, metadata, user_input
+        ) VALUES (?, ?, 1, ?, ?, ?, ?, ?, ?)
+        """,
+        version_rows
+    )
+
+def save_shots_bulk(project_id, shots, session=None):
+    """
+    Save a list of shots and their initial versions in one transaction, optionally
+    together with the session row they came from. Each shot is a dict with the
+    save_shot arguments (shot_number, scene_description, shot_description,
+    model_name, image_url, metadata, user_input). session is a dict with id,
+    user_id, name, data and created_at.
+    Returns {"session_id", "shot_ids", "version_ids"}, ids in the order of shots.
+    """
+    shot_rows = []
+    version_rows = []
+    for shot in shots:
+        shot_id = str(uuid.uuid4())
+        version_id = str(uuid.uuid4())
+        image_url = externalize_image_url(shot.get("image_url"))
+        metadata = shot.get("metadata")
+        user_input = shot.get("user_input")
+        metadata_json = json.dumps(metadata) if isinstance(metadata, dict) else None
+        user_input_json = json.dumps(user_input) if isinstance(user_input, dict) else None
+        common = (shot["scene_description"], shot["shot_description"], shot["model_name"], image_url, metadata_json)
+        shot_rows.append((shot_id, project_id, shot["shot_number"]) + common)
+        version_rows.append((version_id, shot_id) + common + (user_input_json,))
+
+    session_row = None
+    if session is not None:
+        data = session["data"]
+        session_row = (
+            session["id"], session["user_id"], session["name"],
+            data if isinstance(data, str) else json.dumps(data),
+            session.get("created_at") or datetime.now().isoformat(), project_id
+        )
+
+    logger.debug("Saving %s shot(s) for project %s in one transaction", len(shot_rows), project_id)
+    run_write(_insert_shots_bulk, session_row, shot_rows, version_rows)
+    return {
+        "session_id": session["id"] if session is not None else None,
+        "shot_ids": [row[0] for row in shot_rows],
+        "version_ids": [row[0] for row in version_rows]
+    }
+
+def _update_shot_image(conn, shot_id, image_url, version_number, project_id):
+    sql = "UPDATE shots SET image_url = ?"
+    params = [image_url]
+    if version_number is not None:
+        sql += ", version_number = ?"
+        params.append(version_number)
+    sql += " WHERE id = ?"
+    params.append(shot_id)
+    if project_id is not None:
+        sql += " AND project_id = ?"
+        params.append(project_id)
+    return conn.execute(sql, params).rowcount > 0
+
+def update_shot_image(shot_id, image_url, version_number=None, project_id=None):
+    """
+    Point a shot at a new image, and at a new current version if version_number
+    is given. With project_id, only a shot in that project is updated.
+    Returns True if a row was updated.
+    """
+    return run_write(_update_shot_image, shot_id, externalize_image_url(image_url), version_number, project_id)
+
+SHOT_COLUMNS = (
+    "id", "project_id", "shot_number", "scene_description", "shot_description",
+    "model_name", "image_url", "metadata", "version_number", "created_at"
+)
+
+def get_project_shots_page(project_id, fields=None, limit=None, cursor=None):
+    """Get one page of a project's shots in shot order. Returns (shots, next_cursor)."""
     try:
-        with get_db_connection() as conn:
-            shots = conn.execute(
-                """
-                SELECT * FROM shots 
-                WHERE project_id = ? 
-                ORDER BY shot_number ASC, created_at DESC
-                """,
-                (project_id,)
-            ).fetchall()
-            
-            # Convert shots to dictionaries and parse metadata
-            shot_list = []
-            for shot in shots:
-                shot_dict = dict(shot)
-                # Parse metadata JSON string back to dictionary
-                if shot_dict.get('metadata'):
-                    try:
-                        shot_dict['metadata'] = json.loads(shot_dict['metadata'])
-                    except json.JSONDecodeError:
-                        shot_dict['metadata'] = None
-                shot_list.append(shot_dict)
-            
-            return shot_list
+        with get_db_connection(readonly=True) as conn:
+            return _select_page(
+                conn, {column: column for column in SHOT_COLUMNS}, "shots",
+                "project_id = ?", (project_id,),
+                [("shot_number", "ASC"), ("created_at", "DESC"), ("id", "ASC")],
+                fields=fields, limit=limit, cursor=cursor, json_columns=("metadata",)
+            )
     except sqlite3.Error as e:
-        print(f"Error getting project shots: {e}")
-        return []
+        logger.error("Error getting project shots: %s", e)
+        return [], None
+
+def get_project_shots(project_id):
+    """Get all shots for a project"""
+    return get_project_shots_page(project_id)[0]
+
 
 def get_shot(shot_id):
     """Get shot by ID"""
     try:
-        with get_db_connection() as conn:
+        with get_db_connection(readonly=True) as conn:
             shot = conn.execute("SELECT * FROM shots WHERE id = ?", (shot_id,)).fetchone()
             if shot:
                 shot_dict = dict(shot)
@@ -497,34 +1242,55 @@ def get_shot(shot_id):
                 return shot_dict
             return None
     except Exception as e:
-        print(f"Error getting shot: {e}")
+        logger.error("Error getting shot: %s", e)
         return None
 
 # Add function to save an image for a specific shot
 def save_shot_image(shot_id, shot_number, image):
-    """Save a generated image for a shot and also save to a project folder on disk"""
+    """Save a generated image for a shot to the blob store and also save to a project folder on disk"""
     image_id = str(uuid.uuid4())
-    # Convert PIL Image to base64 string
-    image_data = image_to_base64(image)
+    # Encode once; the blob store and the project folder copy get the same bytes
+    buffered = io.BytesIO()
+    image.save(buffered, format="PNG")
+    image_bytes = buffered.getvalue()
+    blob_hash = put_blob(image_bytes)
+    width, height = image.size
     with get_db_connection() as conn:
         conn.execute(
-            "INSERT INTO shot_images (id, shot_id, shot_number, image_data) VALUES (?, ?, ?, ?)",
-            (image_id, shot_id, shot_number, image_data)
+            """
+            INSERT INTO shot_images (id, shot_id, shot_number, image_data, blob_hash, byte_size, width, height)
+            VALUES (?, ?, ?, '', ?, ?, ?, ?)
+            """,
+            (image_id, shot_id, shot_number, blob_hash, len(image_bytes), width, height)
         )
         conn.commit()
+        owner = conn.execute(
+            "SELECT projects.id, projects.user_id FROM shots JOIN projects ON projects.id = shots.project_id WHERE shots.id = ?",
+            (shot_id,)
+        ).fetchone()
     # Save image to disk in project folder
-    project_folder = os.path.join("project_images", shot_id)
+    project_folder = os.path.join(PROJECT_IMAGES_ROOT, shot_id)
     os.makedirs(project_folder, exist_ok=True)
     image_path = os.path.join(project_folder, f"shot_{shot_number}.png")
-    image.save(image_path)
+    with open(image_path, "wb") as f:
+        f.write(image_bytes)
+    if owner is not None:
+        record_folder_usage(project_folder, owner["user_id"], owner["id"])
     return image_id
 
 # Add function to get images for a shot
 def get_shot_images(shot_id):
-    """Get all images for a specific shot"""
-    with get_db_connection() as conn:
+    """
+    Get all images for a specific shot as BlobImage objects. Pixels are decoded
+    only when a caller uses them.
+    """
+    with get_db_connection(readonly=True) as conn:
         images = conn.execute(
-            "SELECT * FROM shot_images WHERE shot_id = ? ORDER BY shot_number, created_at",
+            """
+            SELECT shot_number, blob_hash, byte_size, width, height,
+                   CASE WHEN blob_hash IS NULL THEN image_data END AS image_data
+            FROM shot_images WHERE shot_id = ? ORDER BY shot_number, created_at
+            """,
             (shot_id,)
         ).fetchall()
         result = {}
@@ -532,25 +1298,133 @@ def get_shot_images(shot_id):
             shot_num = img['shot_number']
             if shot_num not in result:
                 result[shot_num] = []
-            # Convert base64 string back to PIL Image
-            pil_img = base64_to_image(img['image_data'])
-            if pil_img:
-                result[shot_num].append(pil_img)
+            if img['blob_hash']:
+                result[shot_num].append(BlobImage(img['blob_hash'], img['byte_size'], img['width'], img['height']))
+            elif img['image_data']:
+                # Row not migrated yet
+                result[shot_num].append(BlobImage(data=base64.b64decode(img['image_data'])))
         return result
 
+def migrate_shot_images_to_blob_store(batch_size=50, max_batches=None):
+    """
+    Move base64 image_data out of shot_images into the blob store, one batch per
+    short transaction so the app keeps serving requests while this runs. Rows
+    are processed in rowid order and blob writes are idempotent, so the
+    migration can be stopped and rerun at any time. Returns the number of rows moved.
+    """
+    migrated = 0
+    batches = 0
+    last_rowid = 0
+    while max_batches is None or batches < max_batches:
+        with get_db_connection(readonly=True) as conn:
+            rows = conn.execute(
+                """
+                SELECT rowid, image_data FROM shot_images
+                WHERE blob_hash IS NULL AND rowid > ?
+                ORDER BY rowid LIMIT ?
+                """,
+                (last_rowid, batch_size)
+            ).fetchall()
+        if not rows:
+            break
+        # Decode and write blobs outside the transaction
+        updates = []
+        for row in rows:
+            last_rowid = row['rowid']
+            try:
+                image_bytes = base64.b64decode(row['image_data'])
+                width, height = image_dimensions(image_bytes)
+            except Exception as e:
+                logger.warning("Skipping unreadable shot image row %s: %s", row['rowid'], e)
+                continue
+            updates.append((put_blob(image_bytes), len(image_bytes), width, height, row['rowid']))
+        with get_db_connection() as conn:
+            conn.executemany(
+                """
+                UPDATE shot_images
+                SET blob_hash = ?, byte_size = ?, width = ?, height = ?, image_data = ''
+                WHERE rowid = ? AND blob_hash IS NULL
+                """,
+                updates
+            )
+            conn.commit()
+        migrated += len(updates)
+        batches += 1
+        logger.info("Moved %s shot images to the blob store", migrated)
+    return migrated
+
+# Shot image URLs reference the blob store instead of embedding data URLs in the row
+BLOB_URL_PREFIX = "/blobs/"
+_DATA_URL_EXTENSIONS = {"image/png": "png", "image/webp": "webp", "image/jpeg": "jpg"}
+
+def blob_url(digest, extension="png"):
+    """Relative URL of a blob, served by the /blobs route"""
+    return f"{BLOB_URL_PREFIX}{digest}.{extension}"
+
+def externalize_image_url(image_url):
+    """
+    Move a data:image/...;base64 URL into the blob store and return its relative
+    /blobs/ URL. Anything else (None, paths, http URLs) is returned unchanged.
+    """
+    if not image_url or not image_url.startswith("data:image"):
+        return image_url
+    header, _, encoded = image_url.partition(",")
+    mime_type = header[len("data:"):].split(";")[0]
+    digest = put_blob(base64.b64decode(encoded))
+    return blob_url(digest, _DATA_URL_EXTENSIONS.get(mime_type, "png"))
+
+def migrate_inline_image_urls(batch_size=50, max_batches=None):
+    """
+    Move data-URL images in shots.image_url and shot_versions.image_url to the
+    blob store in batches. Each batch is a short transaction and finished rows no
+    longer match the query, so an interrupted run resumes where it stopped.
+    Returns the number of rows rewritten per table.
+    """
+    migrated = {"shots": 0, "shot_versions": 0}
+    for table in migrated:
+        batches = 0
+        last_rowid = 0
+        while max_batches is None or batches < max_batches:
+            with get_db_connection(readonly=True) as conn:
+                rows = conn.execute(
+                    f"""
+                    SELECT rowid, image_url FROM {table}
+                    WHERE image_url LIKE 'data:image%' AND rowid > ?
+                    ORDER BY rowid LIMIT ?
+                    """,
+                    (last_rowid, batch_size)
+                ).fetchall()
+            if not rows:
+                break
+            updates = []
+            for row in rows:
+                last_rowid = row['rowid']
+                try:
+                    updates.append((externalize_image_url(row['image_url']), row['rowid'], row['image_url']))
+                except Exception as e:
+                    logger.warning("Skipping unreadable image in %s row %s: %s", table, row['rowid'], e)
+            with get_db_connection() as conn:
+                # The image_url check skips rows that were regenerated since they were read
+                conn.executemany(f"UPDATE {table} SET image_url = ? WHERE rowid = ? AND image_url = ?", updates)
+                conn.commit()
+            migrated[table] += len(updates)
+            batches += 1
+            logger.info("Moved %s inline images out of %s", migrated[table], table)
+    return migrated
+
 # Add function to delete a shot and all its images from the database, given the shot ID
 def delete_shot(shot_id):
     """Delete a shot and its images (and shot_versions) by shot ID"""
     try:
         with get_db_connection() as conn:
-            print(f"Database: Starting deletion of shot {shot_id}")  # Debug log
+            logger.debug("Starting deletion of shot %s", shot_id)
             conn.execute("BEGIN TRANSACTION")
             shot = conn.execute("SELECT id FROM shots WHERE id = ?", (shot_id,)).fetchone()
             if not shot:
-                print(f"Database: Shot {shot_id} not found")  # Debug log
+                logger.debug("Shot %s not found", shot_id)
                 conn.rollback()
                 return False
-            print(f"Database: Found shot {shot_id}, proceeding with deletion")  # Debug log
+            logger.debug("Found shot %s, proceeding with deletion", shot_id)
             # Delete related images (if table exists)
             try:
                 table_exists = conn.execute("""
@@ -559,36 +1433,38 @@ def delete_shot(shot_id):
                 """).fetchone()
                 if table_exists:
                     conn.execute("DELETE FROM shot_images WHERE shot_id = ?", (shot_id,))
-                    print(f"Database: Deleted images for shot {shot_id}")  # Debug log
+                    logger.debug("Deleted images for shot %s", shot_id)
                 else:
-                    print(f"Database: shot_images table does not exist, skipping image deletion")  # Debug log
+                    logger.debug("shot_images table does not exist, skipping image deletion")
             except sqlite3.Error as e:
-                print(f"Database: Error deleting images for shot {shot_id}: {e}")  # Debug log
+                logger.error("Error deleting images for shot %s: %s", shot_id, e)
                 # Continue with shot deletion even if image deletion fails
             # Delete shot_versions (cascade shot_versions deletion)
             try:
                 conn.execute("DELETE FROM shot_versions WHERE shot_id = ?", (shot_id,))
-                print(f"Database: Deleted shot_versions for shot {shot_id}")  # Debug log
+                logger.debug("Deleted shot_versions for shot %s", shot_id)
             except sqlite3.Error as e:
-                print(f"Database: Error deleting shot_versions for shot {shot_id}: {e}")  # Debug log
+                logger.error("Error deleting shot_versions for shot %s: %s", shot_id, e)
                 conn.rollback()
                 return False
             # Delete the shot
             try:
                 conn.execute("DELETE FROM shots WHERE id = ?", (shot_id,))
-                print(f"Database: Deleted shot {shot_id}")  # Debug log
+                # Its save_shot_image folder waits for storage_gc but no longer counts as usage
+                conn.execute("DELETE FROM storage_folders WHERE folder = ?", (_usage_key(os.path.join(PROJECT_IMAGES_ROOT, shot_id)),))
+                logger.debug("Deleted shot %s", shot_id)
             except sqlite3.Error as e:
-                print(f"Database: Error deleting shot {shot_id}: {e}")  # Debug log
+                logger.error("Error deleting shot %s: %s", shot_id, e)
                 conn.rollback()
                 return False
             conn.commit()
-            print(f"Database: Successfully committed deletion of shot {shot_id}")  # Debug log
+            logger.debug("Successfully committed deletion of shot %s", shot_id)
             return True
     except sqlite3.Error as e:
-        print(f"Database: Unexpected error deleting shot {shot_id}: {e}")  # Debug log
+        logger.error("Unexpected error deleting shot %s: %s", shot_id, e)
         return False
     except Exception as e:
-        print(f"Database: Unexpected non-SQLite error deleting shot {shot_id}: {e}")  # Debug log
+        logger.error("Unexpected non-SQLite error deleting shot %s: %s", shot_id, e)
         return False
 
 # Session management functions
@@ -627,31 +1503,34 @@ def save_session(user_id, name, data):
             conn.commit()
             return session_id
     except sqlite3.Error as e:
-        print(f"Error saving session: {e}")
+        logger.error("Error saving session: %s", e)
         return None
 
-def list_user_sessions(user_id):
-    """Get all sessions for a user"""
+SESSION_COLUMNS = ("id", "name", "created_at", "updated_at")
+
+def list_user_sessions_page(user_id, fields=None, limit=None, cursor=None):
+    """Get one page of a user's sessions, most recently updated first. Returns (sessions, next_cursor)."""
     try:
-        with get_db_connection() as conn:
-            sessions = conn.execute(
-                """
-                SELECT id, name, created_at, updated_at
-                FROM sessions
-                WHERE user_id = ?
-                ORDER BY updated_at DESC
-                """,
-                (user_id,)
-            ).fetchall()
-            return [dict(session) for session in sessions]
+        with get_db_connection(readonly=True) as conn:
+            return _select_page(
+                conn, {column: column for column in SESSION_COLUMNS}, "sessions",
+                "user_id = ?", (user_id,),
+                [("updated_at", "DESC"), ("id", "ASC")],
+                fields=fields, limit=limit, cursor=cursor
+            )
     except sqlite3.Error as e:
-        print(f"Error listing sessions: {e}")
-        return []
+        logger.error("Error listing sessions: %s", e)
+        return [], None
+
+def list_user_sessions(user_id):
+    """Get all sessions for a user"""
+    return list_user_sessions_page(user_id)[0]
+
 
 def get_session_data(user_id, session_name):
     """Get session data by name"""
     try:
-        with get_db_connection() as conn:
+        with get_db_connection(readonly=True) as conn:
             session = conn.execute(
                 "SELECT * FROM sessions WHERE user_id = ? AND name = ?",
                 (user_id, session_name)
@@ -662,7 +1541,7 @@ def get_session_data(user_id, session_name):
                 return session_dict
             return None
     except sqlite3.Error as e:
-        print(f"Error getting session data: {e}")
+        logger.error("Error getting session data: %s", e)
         return None
 
 def rename_session(user_id, old_name, new_name):
@@ -680,7 +1559,7 @@ def rename_session(user_id, old_name, new_name):
             conn.commit()
             return True
     except sqlite3.Error as e:
-        print(f"Error renaming session: {e}")
+        logger.error("Error renaming session: %s", e)
         return False
 
 def delete_session(user_id, session_name):
@@ -694,212 +1573,241 @@ def delete_session(user_id, session_name):
             conn.commit()
             return True
     except sqlite3.Error as e:
-        print(f"Error deleting session: {e}")
+        logger.error("Error deleting session: %s", e)
         return False
 
+def _parse_session_date(session_id):
+    """Creation time from a session folder name such as session_20250612_165228_b967451b"""
+    try:
+        date_part = session_id.split('_')[1:3]
+        date_str = f"{date_part[0][:4]}-{date_part[0][4:6]}-{date_part[0][6:]} {date_part[1][:2]}:{date_part[1][2:4]}:{date_part[1][4:]}"
+        return datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S").isoformat()
+    except (IndexError, ValueError):
+        return datetime.now().isoformat()
+
+def _scan_user_session_folders(user_id):
+    """Yield (project_dir, session DirEntry) for every folder two levels below the user's folder"""
+    user_folder = os.path.join(SESSIONS_ROOT, str(user_id))
+    try:
+        with os.scandir(user_folder) as projects:
+            project_entries = [entry for entry in projects if entry.is_dir()]
+    except FileNotFoundError:
+        return
+    for project_entry in project_entries:
+        try:
+            with os.scandir(project_entry.path) as sessions:
+                for entry in sessions:
+                    if entry.is_dir():
+                        yield project_entry.name, entry
+        except FileNotFoundError:
+            continue
+
 def list_file_system_sessions(user_id):
     """Get all sessions for a user from the filesystem"""
     try:
-        user_folder = os.path.join(SESSIONS_ROOT, str(user_id))
-        if not os.path.exists(user_folder):
-            return []
-        
         sessions = []
-        # Get all session directories
-        for session_dir in os.listdir(user_folder):
-            session_path = os.path.join(user_folder, session_dir)
-            if os.path.isdir(session_path):
-                for folder in os.listdir(session_path):
-                    if folder.startswith('session_'):
-                        session_full_path = os.path.join(session_path, folder)
-                        # Get input.json and shots.json if they exist
-                        input_path = os.path.join(session_full_path, 'input.json')
-                        shots_path = os.path.join(session_full_path, 'shots.json')
-                        
-                        # Parse date from session folder name (e.g., session_20250612_165228_b967451b)
-                        try:
-                            date_part = folder.split('_')[1:3]  # Get date and time parts
-                            date_str = f"{date_part[0][:4]}-{date_part[0][4:6]}-{date_part[0][6:]} {date_part[1][:2]}:{date_part[1][2:4]}:{date_part[1][4:]}"
-                            created_at = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S").isoformat()
-                        except (IndexError, ValueError):
-                            created_at = datetime.now().isoformat()
-                            
-                        session = {
-                            "id": folder,
-                            "name": folder,
-                            "folder_path": session_full_path,
-                            "created_at": created_at,
-                            "updated_at": created_at,
-                            "type": "filesystem",
-                            "has_input": os.path.exists(input_path),
-                            "has_shots": os.path.exists(shots_path)
-                        }
-                        sessions.append(session)
+        for project_dir, entry in _scan_user_session_folders(user_id):
+            if not entry.name.startswith('session_'):
+                continue
+            _remember_session_location(user_id, entry.name, project_dir)
+            created_at = _parse_session_date(entry.name)
+            sessions.append({
+                "id": entry.name,
+                "name": entry.name,
+                "folder_path": entry.path,
+                "created_at": created_at,
+                "updated_at": created_at,
+                "type": "filesystem",
+                "has_input": os.path.exists(os.path.join(entry.path, 'input.json')),
+                "has_shots": os.path.exists(os.path.join(entry.path, 'shots.json'))
+            })
         
         # Sort by date (newest first)
         sessions.sort(key=lambda x: x['created_at'], reverse=True)
         return sessions
     except Exception as e:
-        print(f"Error listing filesystem sessions: {e}")
+        logger.error("Error listing filesystem sessions: %s", e)
         return []
 
+# Session location index: (user_id, session_id) -> project folder under
+# SESSIONS_ROOT/<user_id>. The filesystem_sessions table is the durable copy and
+# the dict in front of it serves repeat lookups without a query. A lookup that
+# misses both walks the user's folder once and indexes everything found, at most
+# every SESSION_INDEX_RESCAN seconds per user, so unknown ids cannot force a
+# walk per request. Every hit is checked with one stat before it is returned.
+SESSION_INDEX_RESCAN = float(os.getenv("SESSION_INDEX_RESCAN", "30"))
+SESSION_LOCATION_CACHE_SIZE = int(os.getenv("SESSION_LOCATION_CACHE_SIZE", "4096"))
+
+_session_locations = OrderedDict()
+_session_locations_lock = threading.Lock()
+_session_index_scanned = {}  # user_id -> monotonic time of the last walk
+
+def _remember_session_location(user_id, session_id, project_dir):
+    with _session_locations_lock:
+        _session_locations[(str(user_id), session_id)] = project_dir
+        _session_locations.move_to_end((str(user_id), session_id))
+        while len(_session_locations) > SESSION_LOCATION_CACHE_SIZE:
+            _session_locations.popitem(last=False)
+
+def _forget_session_location(user_id, session_id):
+    with _session_locations_lock:
+        _session_locations.pop((str(user_id), session_id), None)
+
+def _write_session_locations(conn, user_id, locations, removed=()):
+    conn.executemany(
+        "INSERT OR REPLACE INTO filesystem_sessions (user_id, session_id, project_dir) VALUES (?, ?, ?)",
+        [(str(user_id), session_id, project_dir) for session_id, project_dir in locations]
+    )
+    conn.executemany(
+        "DELETE FROM filesystem_sessions WHERE user_id = ? AND session_id = ?",
+        [(str(user_id), session_id) for session_id in removed]
+    )
+
+def index_filesystem_session(user_id, session_id, project_dir):
+    """Record where a session folder that was just written lives, and what it stores"""
+    _remember_session_location(user_id, session_id, project_dir)
+    try:
+        run_write(_write_session_locations, user_id, [(session_id, project_dir)])
+    except sqlite3.Error as e:
+        # A lookup that misses walks the user's folder and indexes it then
+        logger.warning("Could not index session %s: %s", session_id, e)
+    # Sessions filed under a project of the user's count towards that project too
+    project_id = project_dir if get_project_owner(project_dir) == str(user_id) else None
+    record_folder_usage(os.path.join(SESSIONS_ROOT, str(user_id), project_dir, session_id), str(user_id), project_id)
+
+def _index_user_sessions(user_id):
+    """Walk the user's folder and index every session folder in it"""
+    locations = [(entry.name, project_dir) for project_dir, entry in _scan_user_session_folders(user_id)]
+    run_write(_write_session_locations, user_id, locations)
+    for session_id, project_dir in locations:
+        _remember_session_location(user_id, session_id, project_dir)
+    return dict(locations)
+
+def find_filesystem_session(user_id, session_id):
+    """Path of a user's session folder under SESSIONS_ROOT, or None if it does not exist"""
+    user_folder = os.path.join(SESSIONS_ROOT, str(user_id))
+    key = (str(user_id), session_id)
+    with _session_locations_lock:
+        project_dir = _session_locations.get(key)
+    if project_dir is None:
+        with get_db_connection(readonly=True) as conn:
+            row = conn.execute(
+                "SELECT project_dir FROM filesystem_sessions WHERE user_id = ? AND session_id = ?",
+                key
+            ).fetchone()
+        project_dir = row["project_dir"] if row else None
+
+    if project_dir is not None:
+        session_path = os.path.join(user_folder, project_dir, session_id)
+        if os.path.isdir(session_path):
+            _remember_session_location(user_id, session_id, project_dir)
+            return session_path
+        # Moved or deleted outside the app
+        _forget_session_location(user_id, session_id)
+        run_write(_write_session_locations, user_id, [], [session_id])
+
+    now = time.monotonic()
+    with _session_locations_lock:
+        if now - _session_index_scanned.get(key[0], float("-inf")) < SESSION_INDEX_RESCAN:
+            return None
+        _session_index_scanned[key[0]] = now
+    project_dir = _index_user_sessions(user_id).get(session_id)
+    return os.path.join(user_folder, project_dir, session_id) if project_dir is not None else None
+
 def get_filesystem_session_data(user_id, session_id):
     """Get session data from filesystem by id"""
     try:
-        # Find the session folder
-        user_folder = os.path.join(SESSIONS_ROOT, str(user_id))
-        if not os.path.exists(user_folder):
+        session_path = find_filesystem_session(user_id, session_id)
+        if session_path is None:
             return None
-            
-        # Search in all project folders
-        for project_dir in os.listdir(user_folder):
-            project_path = os.path.join(user_folder, project_dir)
-            if os.path.isdir(project_path):
-                session_path = None
-                
-                # Check if this session exists in this project folder
-                for folder in os.listdir(project_path):
-                    if folder == session_id:
-                        session_path = os.path.join(project_path, folder)
-                        break
-                
-                if session_path:
-                    # Get input.json and shots.json if they exist
-                    input_path = os.path.join(session_path, 'input.json')
-                    shots_path = os.path.join(session_path, 'shots.json')
-                    
-                    data = {}
-                    if os.path.exists(input_path):
-                        with open(input_path, 'r') as f:
-                            data['input'] = json.load(f)
-                    
-                    if os.path.exists(shots_path):
-                        with open(shots_path, 'r') as f:
-                            data['shots'] = json.load(f)
-                      # Parse date from session folder name
-                    try:
-                        date_part = session_id.split('_')[1:3]
-                        date_str = f"{date_part[0][:4]}-{date_part[0][4:6]}-{date_part[0][6:]} {date_part[1][:2]}:{date_part[1][2:4]}:{date_part[1][4:]}"
-                        created_at = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S").isoformat()
-                    except (IndexError, ValueError):
-                        created_at = datetime.now().isoformat()
-                    
-                    return {
-                        "id": session_id,
-                        "name": session_id,
-                        "folder_path": session_path,
-                        "created_at": created_at,
-                        "updated_at": created_at,
-                        "type": "filesystem",
-                        "data": data
-                    }
-        
-        return None
+
+        # Get input.json and shots.json (with pending shot updates) if they exist
+        input_path = os.path.join(session_path, 'input.json')
+
+        data = {}
+        if os.path.exists(input_path):
+            with open(input_path, 'r') as f:
+                data['input'] = json.load(f)
+
+        shots = read_shots(session_path)
+        if shots is not None:
+            data['shots'] = shots
+
+        created_at = _parse_session_date(session_id)
+        return {
+            "id": session_id,
+            "name": session_id,
+            "folder_path": session_path,
+            "created_at": created_at,
+            "updated_at": created_at,
+            "type": "filesystem",
+            "data": data
+        }
     except Exception as e:
-        print(f"Error getting filesystem session data: {e}")
+        logger.error("Error getting filesystem session data: %s", e)
         return None
 
 # Initialize the database on import
 init_db()
 
+def _insert_shot_version(conn, version_id, shot_id, version_number, scene_description, shot_description,
+                         model_name, image_url, metadata_json, user_input_json):
+    conn.execute(
+        """
+        INSERT INTO shot_versions (
+            id, shot_id, version_number, scene_description,
+            shot_description, model_name, image_url, metadata, user_input
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (version_id, shot_id, version_number, scene_description,
+         shot_description, model_name, image_url, metadata_json, user_input_json)
+    )
+    return version_id
+
 def save_shot_version(shot_id, version_number, scene_description, shot_description, model_name, image_url=None, metadata=None, user_input=None):
     """Save a new version of a shot"""
     version_id = str(uuid.uuid4())
     
     try:
-        print(f"Database: Saving version {version_number} for shot {shot_id}")
-        
-        # Ensure metadata and user_input are dictionaries and convert to JSON strings
-        try:
-            metadata_json = json.dumps(metadata) if isinstance(metadata, dict) else None
-            user_input_json = json.dumps(user_input) if isinstance(user_input, dict) else None
-            print(f"Database: Prepared metadata JSON: {metadata_json}")
-            print(f"Database: Prepared user input JSON: {user_input_json}")
-        except Exception as e:
-            print(f"Database: Error preparing JSON data: {str(e)}")
-            raise
+        logger.debug("Saving version %s for shot %s", version_number, shot_id)
+        image_url = externalize_image_url(image_url)
+        metadata_json = json.dumps(metadata) if isinstance(metadata, dict) else None
+        user_input_json = json.dumps(user_input) if isinstance(user_input, dict) else None
         
-        # Use context manager for connection
-        with get_db_connection() as conn:
-            # Start transaction with retry logic
-            max_retries = 5
-            retry_delay = 0.5
-            
-            for attempt in range(max_retries):
-                try:
-                    print(f"Database: Starting version transaction (attempt {attempt + 1}/{max_retries})")
-                    conn.execute("BEGIN IMMEDIATE TRANSACTION")
-                    
-                    try:
-                        print("Database: Inserting version record")
-                        conn.execute(
-                            """
-                            INSERT INTO shot_versions (
-                                id, shot_id, version_number, scene_description,
-                                shot_description, model_name, image_url, metadata, user_input
-                            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                            """,
-                            (version_id, shot_id, version_number, scene_description,
-                             shot_description, model_name, image_url, metadata_json, user_input_json)
-                        )
-                        print("Database: Version record inserted successfully")
-                        conn.commit()
-                        return version_id
-                        
-                    except sqlite3.Error as e:
-                        print(f"Database: SQLite error saving version: {str(e)}")
-                        conn.rollback()
-                        if "database is locked" in str(e) and attempt < max_retries - 1:
-                            print(f"Database: Locked, retrying in {retry_delay} seconds...")
-                            time.sleep(retry_delay)
-                            retry_delay *= 1.5
-                            continue
-                        raise
-                        
-                except Exception as e:
-                    print(f"Database: Unexpected error saving version (attempt {attempt + 1}): {str(e)}")
-                    conn.rollback()
-                    if attempt == max_retries - 1:
-                        raise
-                    time.sleep(retry_delay)
-                    retry_delay *= 1.5
-                    
+        return run_write(
+            _insert_shot_version, version_id, shot_id, version_number, scene_description,
+            shot_description, model_name, image_url, metadata_json, user_input_json
+        )
     except Exception as e:
-        print(f"Database: Fatal error saving version: {str(e)}")
+        logger.error("Fatal error saving version: %s", e)
         raise
 
-def get_shot_versions(shot_id):
-    """Get all versions of a shot"""
+SHOT_VERSION_COLUMNS = (
+    "id", "shot_id", "version_number", "scene_description", "shot_description",
+    "model_name", "image_url", "metadata", "user_input", "created_at"
+)
+
+def get_shot_versions_page(shot_id, fields=None, limit=None, cursor=None):
+    """Get one page of a shot's versions, newest first. Returns (versions, next_cursor)."""
     try:
-        with get_db_connection() as conn:
-            versions = conn.execute(
-                """
-                SELECT * FROM shot_versions 
-                WHERE shot_id = ? 
-                ORDER BY version_number DESC, created_at DESC
-                """,
-                (shot_id,)
-            ).fetchall()
-            # Convert versions to dictionaries and parse metadata
-            version_list = []
-            for version in versions:
-                version_dict = dict(version)
-                # Parse metadata and user_input JSON strings back to dictionaries
-                if version_dict.get('metadata'):
-                    try:
-                        version_dict['metadata'] = json.loads(version_dict['metadata'])
-                    except json.JSONDecodeError:
-                        version_dict['metadata'] = None
-                if version_dict.get('user_input'):
-                    try:
-                        version_dict['user_input'] = json.loads(version_dict['user_input'])
-                    except json.JSONDecodeError:
-                        version_dict['user_input'] = None
-                version_list.append(version_dict)
-            return version_list
+        with get_db_connection(readonly=True) as conn:
+            return _select_page(
+                conn, {column: column for column in SHOT_VERSION_COLUMNS}, "shot_versions",
+                "shot_id = ?", (shot_id,),
+                [("version_number", "DESC"), ("created_at", "DESC"), ("id", "ASC")],
+                fields=fields, limit=limit, cursor=cursor, json_columns=("metadata", "user_input")
+            )
     except sqlite3.Error as e:
-        print(f"Error getting shot versions: {e}")
-        return []
+        logger.error("Error getting shot versions: %s", e)
+        return [], None
+
+def get_shot_versions(shot_id):
+    """Get all versions of a shot"""
+    return get_shot_versions_page(shot_id)[0]
+
+
+# Sessions saved without a project are filed under project_<date>
+DEFAULT_PROJECT_DIR_PREFIX = "project_"
 
 def save_shots_to_filesystem(user_id, session_data, shots_data, project_id=None):
     """
@@ -930,7 +1838,7 @@ def save_shots_to_filesystem(user_id, session_data, shots_data, project_id=None)
         # If still no project_id, create a default one based on timestamp
         if not project_id:
             # Find or create a project folder (using a timestamp to make it unique)
-            project_id = f"project_{timestamp[:8]}"  # Use date part only
+            project_id = f"{DEFAULT_PROJECT_DIR_PREFIX}{timestamp[:8]}"  # Use date part only
             
         # Create the project directory
         project_dir = os.path.join(user_dir, project_id)
@@ -959,7 +1867,8 @@ def save_shots_to_filesystem(user_id, session_data, shots_data, project_id=None)
         with open(os.path.join(session_dir, 'shots.json'), 'w') as f:
             json.dump(shots_data, f, indent=2)
             
-        print(f"Successfully saved session to {session_dir}")
+        logger.info("Successfully saved session to %s", session_dir)
+        index_filesystem_session(user_id, session_id, project_id)
         
         # Return success with path info
         return {
@@ -971,89 +1880,271 @@ def save_shots_to_filesystem(user_id, session_data, shots_data, project_id=None)
             "folder_path": session_dir
         }
     except Exception as e:
-        print(f"Error saving shots to filesystem: {e}")
+        logger.error("Error saving shots to filesystem: %s", e)
         import traceback
         traceback.print_exc()
         return None
 
+def _session_created_at(folder, folder_path):
+    """
+    Parse the creation time from a session folder name (e.g. session_20250612_165228_b967451b
+    or fusion_session_20250612_165228_b967451b). Falls back to the folder mtime so the
+    value stays stable between page requests.
+    """
+    try:
+        if folder.startswith('fusion_session_'):
+            date_part = folder.split('_')[2:4]
+        else:
+            date_part = folder.split('_')[1:3]
+        date_str = f"{date_part[0][:4]}-{date_part[0][4:6]}-{date_part[0][6:]} {date_part[1][:2]}:{date_part[1][2:4]}:{date_part[1][4:]}"
+        return datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S").isoformat()
+    except (IndexError, ValueError) as e:
+        logger.debug("Could not parse date from session name %s: %s", folder, e)
+        return datetime.fromtimestamp(os.path.getmtime(folder_path)).isoformat()
+
+def _session_type(folder, output_path, output_bytes=None):
+    """
+    Determine session type based on folder name and output.json contents.
+    Archived sessions pass the output.json bytes read from their bundle instead of a path.
+    """
+    if folder.startswith('fusion_session_'):
+        return "image_fusion_session"
+    try:
+        if output_bytes is not None:
+            output_data = json.loads(output_bytes)
+        elif output_path and os.path.exists(output_path):
+            with open(output_path, 'r') as f:
+                output_data = json.load(f)
+        else:
+            return "shot_session"
+        if output_data.get('type') == 'image_fusion':
+            return "image_fusion_session"
+    except (json.JSONDecodeError, IOError):
+        pass
+    return "shot_session"
+
+# Session catalog. save_enhanced_shots_to_project, save_fusion_session_to_project and
+# the endpoints that add files to a session call catalog_session() when they are
+# done. reconcile_project_sessions() picks up everything else (sessions copied in,
+# deleted or edited by hand): it is a single stat of the project folder while that
+# folder's mtime is unchanged, and a full pass over the session folders otherwise,
+# or every SESSION_CATALOG_RESCAN seconds. A full pass only re-reads sessions whose
+# folder mtime changed. Sessions packed by session_archive are catalogued from
+# their bundle and flagged archived.
+SESSION_CATALOG_RESCAN = float(os.getenv("SESSION_CATALOG_RESCAN", "300"))
+
+def _is_session_folder(name):
+    # A .restoring folder is a bundle being unpacked, or left over from a crash while it was
+    return (name.startswith('session_') or name.startswith('fusion_session_')) and not name.endswith(RESTORING_SUFFIX)
+
+def _scan_session(project_folder, name, dir_mtime_ns, archived=False):
+    """Catalog row for one session folder (or its bundle), read from the files in it"""
+    session_path = os.path.join(project_folder, name)
+    if archived:
+        files = {member.split('/', 1)[0] for member in list_members(session_path) or ()}
+        session_type = _session_type(name, None, read_member(session_path, 'output.json'))
+        created_at = _session_created_at(name, bundle_path(session_path))
+    else:
+        with os.scandir(session_path) as entries:
+            files = {entry.name for entry in entries}
+        session_type = _session_type(name, os.path.join(session_path, 'output.json'))
+        created_at = _session_created_at(name, session_path)
+    return (
+        name,
+        created_at,
+        session_type,
+        'input.json' in files,
+        'shots.json' in files,
+        'output.json' in files,
+        dir_mtime_ns,
+        archived
+    )
+
+def _session_mtime(project_folder, name):
+    """(mtime_ns, archived) of a session folder, or of its bundle if it was archived"""
+    session_path = os.path.join(project_folder, name)
+    try:
+        return os.stat(session_path).st_mtime_ns, False
+    except FileNotFoundError:
+        return os.stat(bundle_path(session_path)).st_mtime_ns, True
+
+def _write_session_catalog(conn, project_id, rows, removed, folder_mtime_ns=None, full_scan=False):
+    conn.executemany(
+        """
+        INSERT OR REPLACE INTO project_sessions (
+            project_id, name, created_at, type, has_input, has_shots, has_output, dir_mtime_ns, archived
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        [(project_id,) + row for row in rows]
+    )
+    conn.executemany(
+        "DELETE FROM project_sessions WHERE project_id = ? AND name = ?",
+        [(project_id, name) for name in removed]
+    )
+    if full_scan:
+        conn.execute(
+            "INSERT OR REPLACE INTO project_session_scans (project_id, dir_mtime_ns, scanned_at) VALUES (?, ?, ?)",
+            (project_id, folder_mtime_ns, time.time())
+        )
+    elif folder_mtime_ns is not None:
+        # Our own change moved the folder mtime; keep the catalog counted as current.
+        # A change made by someone else in the same instant waits for the periodic rescan
+        conn.execute(
+            "UPDATE project_session_scans SET dir_mtime_ns = ? WHERE project_id = ?",
+            (folder_mtime_ns, project_id)
+        )
+
+def catalog_session(project_id, session_name):
+    """Record a session folder that was just created or changed (or removed) in the catalog"""
+    project_folder = os.path.join(PROJECT_IMAGES_ROOT, project_id)
+    try:
+        folder_mtime_ns = os.stat(project_folder).st_mtime_ns
+        try:
+            dir_mtime_ns, archived = _session_mtime(project_folder, session_name)
+            rows, removed = [_scan_session(project_folder, session_name, dir_mtime_ns, archived)], []
+        except FileNotFoundError:
+            rows, removed = [], [session_name]
+        run_write(_write_session_catalog, project_id, rows, removed, folder_mtime_ns)
+    except Exception as e:
+        # The reconciler fixes the entry on a later listing
+        logger.warning("Could not update session catalog for %s/%s: %s", project_id, session_name, e)
+    record_session_usage(project_id, session_name)
+
+def reconcile_project_sessions(project_id, force=False):
+    """
+    Bring the catalog of one project in line with its folder.
+    Returns the number of sessions added, updated or removed.
+    """
+    project_folder = os.path.join(PROJECT_IMAGES_ROOT, project_id)
+    try:
+        folder_mtime_ns = os.stat(project_folder).st_mtime_ns
+    except FileNotFoundError:
+        folder_mtime_ns = 0
+
+    with get_db_connection(readonly=True) as conn:
+        scan = conn.execute(
+            "SELECT dir_mtime_ns, scanned_at FROM project_session_scans WHERE project_id = ?",
+            (project_id,)
+        ).fetchone()
+        if (not force and scan is not None and scan["dir_mtime_ns"] == folder_mtime_ns
+                and time.time() - scan["scanned_at"] < SESSION_CATALOG_RESCAN):
+            return 0
+        known = dict(conn.execute(
+            "SELECT name, dir_mtime_ns FROM project_sessions WHERE project_id = ?",
+            (project_id,)
+        ).fetchall())
+
+    # The mtimes are taken before reading, so a change made during the pass is seen by the next one
+    rows = []
+    seen = set()
+    if folder_mtime_ns:
+        with os.scandir(project_folder) as entries:
+            candidates = []
+            for entry in entries:
+                name = entry.name[:-len(ARCHIVE_SUFFIX)] if entry.name.endswith(ARCHIVE_SUFFIX) else entry.name
+                if _is_session_folder(name):
+                    candidates.append((name, entry, name != entry.name))
+        # Folders first: a session with both a folder and a bundle is served from the folder
+        candidates.sort(key=lambda candidate: candidate[2])
+        for name, entry, archived in candidates:
+            if name in seen:
+                continue
+            try:
+                if not (entry.is_file() if archived else entry.is_dir()):
+                    continue
+                dir_mtime_ns = entry.stat().st_mtime_ns
+                seen.add(name)
+                if known.get(name) != dir_mtime_ns:
+                    rows.append(_scan_session(project_folder, name, dir_mtime_ns, archived))
+            except FileNotFoundError:
+                seen.discard(name)  # Removed while we were scanning
+    removed = [name for name in known if name not in seen]
+
+    run_write(_write_session_catalog, project_id, rows, removed, folder_mtime_ns, full_scan=True)
+    if rows or removed:
+        logger.debug("Session catalog for project %s: %s updated, %s removed", project_id, len(rows), len(removed))
+    return len(rows) + len(removed)
+
+def archive_cold_sessions(older_than_days=SESSION_ARCHIVE_AFTER_DAYS, project_id=None, dry_run=False):
+    """
+    Pack session folders untouched for older_than_days into bundles, in one
+    project or all of them. Returns counts and the bytes before and after.
+    """
+    stats = {"archived": 0, "failed": 0, "bytes_before": 0, "bytes_after": 0}
+    if project_id is not None:
+        project_ids = [project_id]
+    else:
+        with os.scandir(PROJECT_IMAGES_ROOT) as entries:
+            project_ids = [entry.name for entry in entries if entry.is_dir()]
+    for project in project_ids:
+        project_folder = os.path.join(PROJECT_IMAGES_ROOT, project)
+        for session_folder in cold_sessions(project_folder, older_than_days, _is_session_folder):
+            size = sum(
+                os.path.getsize(os.path.join(directory, name))
+                for directory, _, files in os.walk(session_folder) for name in files
+            )
+            if dry_run:
+                stats["archived"] += 1
+                stats["bytes_before"] += size
+                continue
+            try:
+                stats["bytes_after"] += archive_session(session_folder)
+                stats["bytes_before"] += size
+                stats["archived"] += 1
+            except Exception as e:
+                logger.error("Could not archive %s: %s", session_folder, e)
+                stats["failed"] += 1
+                continue
+            catalog_session(project, os.path.basename(session_folder))
+    return stats
+
+PROJECT_SESSION_COLUMNS = {
+    "id": "name",
+    "name": "name",
+    "folder_path": "name",
+    "created_at": "created_at",
+    "updated_at": "created_at",
+    "project_id": "project_id",
+    "type": "type",
+    "has_input": "has_input",
+    "has_shots": "has_shots",
+    "has_output": "has_output",
+    "archived": "archived",
+}
+
+def list_project_sessions_page(user_id, project_id, fields=None, limit=None, cursor=None):
+    """
+    Get one page of a project's sessions from the session catalog, newest first.
+    Returns (sessions, next_cursor). Read-only: call reconcile_project_sessions
+    first for a listing that reflects the folder right now.
+    """
+    try:
+        with get_db_connection(readonly=True) as conn:
+            sessions, next_cursor = _select_page(
+                conn, PROJECT_SESSION_COLUMNS, "project_sessions",
+                "project_id = ?", (project_id,),
+                [("created_at", "DESC"), ("name", "ASC")],
+                fields=fields, limit=limit, cursor=cursor
+            )
+    except (sqlite3.Error, OSError) as e:
+        logger.error("Error listing project sessions: %s", e)
+        return [], None
+    project_folder = os.path.join(PROJECT_IMAGES_ROOT, project_id)
+    for session in sessions:
+        if "folder_path" in session:
+            session["folder_path"] = os.path.join(project_folder, session["folder_path"])
+        for flag in ("has_input", "has_shots", "has_output", "archived"):
+            if flag in session:
+                session[flag] = bool(session[flag])
+    return sessions, next_cursor
+
 def list_project_sessions(user_id, project_id):
     """Get all sessions for a specific project from the PROJECT_IMAGES_ROOT filesystem"""
     try:
-        import json  # Ensure json is imported
-        # Look in PROJECT_IMAGES_ROOT instead of SESSIONS_ROOT
-        project_folder = os.path.join(PROJECT_IMAGES_ROOT, project_id)
-        if not os.path.exists(project_folder):
-            print(f"Project folder does not exist: {project_folder}")
-            return []
-        
-        print(f"Looking for sessions in: {project_folder}")
-        sessions = []
-        # Get all session directories in this project folder (both session_ and fusion_session_)
-        for folder in os.listdir(project_folder):
-            if folder.startswith('session_') or folder.startswith('fusion_session_'):
-                session_full_path = os.path.join(project_folder, folder)
-                if os.path.isdir(session_full_path):
-                    print(f"Found session folder: {folder}")
-                    
-                    # Get input.json and shots.json if they exist
-                    input_path = os.path.join(session_full_path, 'input.json')
-                    shots_path = os.path.join(session_full_path, 'shots.json')
-                    output_path = os.path.join(session_full_path, 'output.json')
-                    
-                    # Parse date from session folder name (e.g., session_20250612_165228_b967451b or fusion_session_20250612_165228_b967451b)
-                    created_at = datetime.now().isoformat()
-                    
-                    # Try to extract date from session folder name
-                    try:
-                        if folder.startswith('fusion_session_'):
-                            date_part = folder.split('_')[2:4]  # fusion_session_20250612_165228_b967451b
-                        else:
-                            date_part = folder.split('_')[1:3]  # session_20250612_165228_b967451b
-                        date_str = f"{date_part[0][:4]}-{date_part[0][4:6]}-{date_part[0][6:]} {date_part[1][:2]}:{date_part[1][2:4]}:{date_part[1][4:]}"
-                        created_at = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S").isoformat()
-                    except (IndexError, ValueError) as e:
-                        print(f"Could not parse date from session name {folder}: {e}")
-                        # Keep using the default created_at
-                    
-                    # Determine session type based on folder name and contents
-                    if folder.startswith('fusion_session_'):
-                        session_type = "image_fusion_session"
-                    elif os.path.exists(output_path):
-                        # Check if it's a fusion session based on output.json content
-                        try:
-                            with open(output_path, 'r') as f:
-                                output_data = json.load(f)
-                                if output_data.get('type') == 'image_fusion':
-                                    session_type = "image_fusion_session"
-                                else:
-                                    session_type = "shot_session"
-                        except (json.JSONDecodeError, IOError):
-                            session_type = "shot_session"
-                    else:
-                        session_type = "shot_session"
-                    
-                    session = {
-                        "id": folder,
-                        "name": folder,
-                        "folder_path": session_full_path,
-                        "created_at": created_at,
-                        "updated_at": created_at,
-                        "project_id": project_id,
-                        "type": session_type,
-                        "has_input": os.path.exists(input_path),
-                        "has_shots": os.path.exists(shots_path),
-                        "has_output": os.path.exists(output_path)
-                    }
-                    sessions.append(session)
-        
-        print(f"Found {len(sessions)} sessions")
-        
-        # Sort by date (newest first)
-        sessions.sort(key=lambda x: x['created_at'], reverse=True)
-        return sessions
-    except Exception as e:
-        print(f"Error listing project sessions: {e}")
-        return []
+        reconcile_project_sessions(project_id)
+    except (sqlite3.Error, OSError) as e:
+        logger.error("Error reconciling project sessions: %s", e)
+    return list_project_sessions_page(user_id, project_id)[0]
 
 def save_enhanced_shots_to_project(user_id, project_id, session_data, shots_data):
     """
@@ -1107,46 +2198,41 @@ def save_enhanced_shots_to_project(user_id, project_id, session_data, shots_data
             "created_at": datetime.now().isoformat(),
             "type": "enhanced"
         }
-          # Save to database sessions table
-        with get_db_connection() as conn:
-            try:
-                # Insert session record
-                cursor = conn.cursor()
-                cursor.execute(
-                    """
-                    INSERT INTO sessions (id, user_id, name, data, created_at, project_id)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                    """,
-                    (session_id, user_id, session_name, json.dumps(session_record), 
-                     datetime.now().isoformat(), project_id)
-                )
-                
-                # Also save individual shots to the shots table if they don't exist
-                # shots_data can be either a list of shots or a dict with 'shots' key
-                shots_list = shots_data if isinstance(shots_data, list) else shots_data.get('shots', [])
-                for i, shot in enumerate(shots_list, 1):
-                    shot_id = save_shot(
-                        project_id=project_id,
-                        shot_number=i,
-                        scene_description=session_data.get('scene_description', ''),
-                        shot_description=shot.get('shot_description', ''),
-                        model_name=session_data.get('model_name', 'unknown'),
-                        metadata={
+        # Save the session, every shot and every initial version in one transaction
+        # shots_data can be either a list of shots or a dict with 'shots' key
+        shots_list = shots_data if isinstance(shots_data, list) else shots_data.get('shots', [])
+        try:
+            saved = save_shots_bulk(
+                project_id,
+                [
+                    {
+                        "shot_number": i,
+                        "scene_description": session_data.get('scene_description', ''),
+                        "shot_description": shot.get('shot_description', ''),
+                        "model_name": session_data.get('model_name', 'unknown'),
+                        "metadata": {
                             "session_id": session_id,
                             "enhanced": True,
                             "original_input": session_data,
                             "shot_metadata": shot.get('metadata', {})
                         },
-                        user_input=session_data.get('scene_description', '')
-                    )
-                
-                conn.commit()
-                print(f"Database: Enhanced session saved successfully: {session_id}")
-                
-            except sqlite3.Error as e:
-                print(f"Database: Error saving enhanced session: {str(e)}")
-                conn.rollback()
-                return None
+                        "user_input": session_data.get('scene_description', '')
+                    }
+                    for i, shot in enumerate(shots_list, 1)
+                ],
+                session={
+                    "id": session_id,
+                    "user_id": user_id,
+                    "name": session_name,
+                    "data": session_record,
+                    "created_at": session_record["created_at"]
+                }
+            )
+            logger.info("Enhanced session saved successfully: %s", session_id)
+        except sqlite3.Error as e:
+            logger.error("Error saving enhanced session: %s", e)
+            return None
+        catalog_session(project_id, session_name)
         
         # Create proper return structure with all required fields
         return {
@@ -1162,13 +2248,15 @@ def save_enhanced_shots_to_project(user_id, project_id, session_data, shots_data
             "shots_data": shots_data,
             "created_at": datetime.now().isoformat(),
             "input_file": input_file_path,
-            "shots_file": shots_file_path
+            "shots_file": shots_file_path,
+            "shot_ids": saved["shot_ids"],
+            "version_ids": saved["version_ids"]
         }
         
         return None
         
     except Exception as e:
-        print(f"Error in save_enhanced_shots_to_project: {str(e)}")
+        logger.error("Error in save_enhanced_shots_to_project: %s", e)
         return None
 
 def save_fusion_session_to_project(user_id, project_id, final_prompt, generated_image):
@@ -1178,7 +2266,6 @@ def save_fusion_session_to_project(user_id, project_id, final_prompt, generated_
     try:
         import uuid
         import json
-        import base64
         from datetime import datetime
         
         # Generate a unique session ID
@@ -1211,19 +2298,28 @@ def save_fusion_session_to_project(user_id, project_id, final_prompt, generated_
             json.dump(input_data, f, indent=2)
         
         # Save generated image to file
-        image_filename = f"fusion_image_{timestamp}.png"
+        extension = generated_image.extension if isinstance(generated_image, ImageResult) else "png"
+        image_filename = f"fusion_image_{timestamp}.{extension}"
         image_file_path = os.path.join(images_dir, image_filename)
         
-        # Decode base64 image and save to file
+        # Write the encoded image (or decode a legacy base64 string) to file
         try:
-            image_bytes = base64.b64decode(generated_image)
+            image_bytes = image_result_bytes(generated_image)
             with open(image_file_path, 'wb') as f:
                 f.write(image_bytes)
-            print(f"Fusion image saved to: {image_file_path}")
+            logger.info("Fusion image saved to: %s", image_file_path)
         except Exception as img_error:
-            print(f"Error saving fusion image: {img_error}")
+            logger.error("Error saving fusion image: %s", img_error)
             image_file_path = None
         
+        # Gallery thumbnails; if this fails they are backfilled on first request
+        if image_file_path:
+            try:
+                source_image = generated_image.image if isinstance(generated_image, ImageResult) else None
+                generate_thumbnails(images_dir, image_filename, image=source_image)
+            except Exception as thumb_error:
+                logger.warning("Error generating fusion thumbnails: %s", thumb_error)
+        
         # Save output data to file
         output_data = {
             "type": "image_fusion",
@@ -1262,12 +2358,13 @@ def save_fusion_session_to_project(user_id, project_id, final_prompt, generated_
                 )
                 
                 conn.commit()
-                print(f"Database: Fusion session saved successfully: {session_id}")
+                logger.info("Fusion session saved successfully: %s", session_id)
                 
             except sqlite3.Error as e:
-                print(f"Database: Error saving fusion session: {str(e)}")
+                logger.error("Error saving fusion session: %s", e)
                 conn.rollback()
                 return None
+        catalog_session(project_id, session_name)
           # Return success data
         return {
             "session_id": session_id,
@@ -1282,13 +2379,13 @@ def save_fusion_session_to_project(user_id, project_id, final_prompt, generated_
         }
         
     except Exception as e:
-        print(f"Error in save_fusion_session_to_project: {str(e)}")
+        logger.error("Error in save_fusion_session_to_project: %s", e)
         return None
 
 def get_session_by_id(session_id):
     """Get session data by session ID"""
     try:
-        with get_db_connection() as conn:
+        with get_db_connection(readonly=True) as conn:
             cursor = conn.cursor()
             session = cursor.execute(
                 "SELECT * FROM sessions WHERE id = ?",
@@ -1307,5 +2404,5 @@ def get_session_by_id(session_id):
                 return session_dict
             return None
     except Exception as e:
-        print(f"Error getting session by ID: {e}")
+        logger.error("Error getting session by ID: %s", e)
         return None
@@ -0,0 +1,115 @@
+"""
+Async access to db.py for the FastAPI endpoints.
+
+Each function here has the same name and arguments as its db.py counterpart
+and runs it on a worker thread, so lock waits, commits and directory scans
+never block the event loop. Password hashing goes through password_pool.
+Connection pooling and write batching stay in db.py. Reads and writes use separate executors so writes
+waiting on a commit cannot hold up reads.
+"""
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import db
+import password_pool
+
+DB_ASYNC_READ_WORKERS = int(os.getenv("DB_ASYNC_READ_WORKERS", str(db.DB_READ_POOL_SIZE)))
+DB_ASYNC_WRITE_WORKERS = int(os.getenv("DB_ASYNC_WRITE_WORKERS", "8"))
+
+_read_executor = ThreadPoolExecutor(max_workers=DB_ASYNC_READ_WORKERS, thread_name_prefix="db-read")
+_write_executor = ThreadPoolExecutor(max_workers=DB_ASYNC_WRITE_WORKERS, thread_name_prefix="db-write")
+
+def _run_on(executor, func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+    return wrapper
+
+def _read(func):
+    return _run_on(_read_executor, func)
+
+def _write(func):
+    return _run_on(_write_executor, func)
+
+# Users. bcrypt runs on the bounded password pool, which raises
+# password_pool.PasswordPoolBusy when saturated
+get_user_by_id = _read(db.get_user_by_id)
+get_user_by_username = _read(db.get_user_by_username)
+update_password_hash = _write(db.update_password_hash)
+_create_user_with_hash = _write(db.create_user_with_hash)
+
+async def create_user(username, password):
+    return await _create_user_with_hash(username, await password_pool.hash_password(password))
+
+async def authenticate_user(username, password):
+    user = await get_user_by_username(username)
+    if not user or not await password_pool.verify_password(password, user["password_hash"]):
+        return None
+    if db.password_needs_rehash(user["password_hash"]):
+        try:
+            user["password_hash"] = await password_pool.hash_password(password)
+            await update_password_hash(username, user["password_hash"])
+        except password_pool.PasswordPoolBusy:
+            pass  # Upgraded on a later login instead
+    return user
+
+# Projects
+create_project = _write(db.create_project)
+delete_project = _write(db.delete_project)
+get_project = _read(db.get_project)
+_load_project_owner = _read(db.get_project_owner)
+get_user_projects = _read(db.get_user_projects)
+get_user_projects_page = _read(db.get_user_projects_page)
+
+async def get_project_owner(project_id):
+    # Cache hits skip the executor hop
+    owner = db.cached_project_owner(project_id)
+    if owner is None:
+        owner = await _load_project_owner(project_id)
+    return owner
+
+# Shots and versions
+save_shot = _write(db.save_shot)
+save_shots_bulk = _write(db.save_shots_bulk)
+update_shot_image = _write(db.update_shot_image)
+delete_shot = _write(db.delete_shot)
+save_shot_version = _write(db.save_shot_version)
+save_shot_image = _write(db.save_shot_image)
+get_shot = _read(db.get_shot)
+get_shot_images = _read(db.get_shot_images)
+get_project_shots = _read(db.get_project_shots)
+get_project_shots_page = _read(db.get_project_shots_page)
+get_shot_versions = _read(db.get_shot_versions)
+get_shot_versions_page = _read(db.get_shot_versions_page)
+
+# Sessions
+save_session = _write(db.save_session)
+rename_session = _write(db.rename_session)
+delete_session = _write(db.delete_session)
+save_shots_to_filesystem = _write(db.save_shots_to_filesystem)
+save_enhanced_shots_to_project = _write(db.save_enhanced_shots_to_project)
+save_fusion_session_to_project = _write(db.save_fusion_session_to_project)
+get_session_data = _read(db.get_session_data)
+get_session_by_id = _read(db.get_session_by_id)
+list_user_sessions = _read(db.list_user_sessions)
+list_user_sessions_page = _read(db.list_user_sessions_page)
+list_file_system_sessions = _read(db.list_file_system_sessions)
+get_filesystem_session_data = _read(db.get_filesystem_session_data)
+find_filesystem_session = _read(db.find_filesystem_session)
+list_project_sessions = _write(db.list_project_sessions)  # Reconciles the catalog first
+list_project_sessions_page = _read(db.list_project_sessions_page)
+catalog_session = _write(db.catalog_session)
+reconcile_project_sessions = _write(db.reconcile_project_sessions)
+index_filesystem_session = _write(db.index_filesystem_session)
+
+# Storage usage
+record_session_usage = _write(db.record_session_usage)
+get_storage_usage = _read(db.get_storage_usage)
+
+def shutdown():
+    """Stop the worker threads; calls already running finish first"""
+    _read_executor.shutdown(wait=True)
+    _write_executor.shutdown(wait=True)
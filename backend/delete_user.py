@@ -1,6 +1,8 @@
 import sqlite3
 import os
 
+from auth_cache import invalidate_users
+
 db_path = os.path.join(os.path.dirname(__file__), 'shots_app.db')
 conn = sqlite3.connect(db_path)
 cursor = conn.cursor()
@@ -14,4 +16,7 @@ for username in usernames_to_delete:
     print(f"User '{username}' deleted (if existed).")
 
 conn.commit()
-conn.close()
\ No newline at end of file
+conn.close()
+
+# Running servers drop the deleted users from their authentication cache
+invalidate_users(usernames_to_delete)
@@ -0,0 +1,120 @@
+"""
+In-memory result of an image generation call.
+
+Generators in model.py return an ImageResult that holds the raw PIL image.
+The image is encoded once, in the configured format, the first time bytes are
+needed. The same bytes are then written to disk and base64-encoded for the
+JSON response, so no one has to decode a base64 string again.
+"""
+import asyncio
+import base64
+import hashlib
+import os
+import threading
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+# Output encoding, configurable per deployment. Responses carry the matching
+# image_mime_type; clients must build data: URLs from it, not assume PNG
+IMAGE_OUTPUT_FORMAT = os.getenv("IMAGE_OUTPUT_FORMAT", "png").lower()  # "png", "webp" or "jpeg"
+PNG_COMPRESS_LEVEL = int(os.getenv("IMAGE_PNG_COMPRESS_LEVEL", "6"))  # 0 (fast) - 9 (small)
+JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "95"))
+
+# Content-addressed store for images returned by URL instead of inline base64
+GENERATED_IMAGES_ROOT = os.path.join(os.path.dirname(__file__), "generated_images")
+
+_FORMATS = {
+    # format: (PIL format name, mime type, file extension)
+    "png": ("PNG", "image/png", "png"),
+    "webp": ("WEBP", "image/webp", "webp"),
+    "jpeg": ("JPEG", "image/jpeg", "jpg"),
+}
+
+class ImageResult:
+    """A generated image plus its lazily computed, cached encoding"""
+
+    def __init__(self, image, image_format=None):
+        if isinstance(image, np.ndarray):
+            image = Image.fromarray(image)
+        self.image = image
+        self.format = (image_format or IMAGE_OUTPUT_FORMAT).lower()
+        if self.format == "jpg":
+            self.format = "jpeg"
+        if self.format not in _FORMATS:
+            raise ValueError(f"Unsupported image format: {self.format}")
+        self._encoded = None
+        self._lock = threading.Lock()
+
+    @property
+    def mime_type(self):
+        return _FORMATS[self.format][1]
+
+    @property
+    def extension(self):
+        return _FORMATS[self.format][2]
+
+    def encode(self):
+        """Encode the image once and return the cached bytes"""
+        with self._lock:
+            if self._encoded is None:
+                pil_format = _FORMATS[self.format][0]
+                buffered = BytesIO()
+                if self.format == "png":
+                    self.image.save(buffered, format=pil_format, compress_level=PNG_COMPRESS_LEVEL)
+                elif self.format == "webp":
+                    self.image.save(buffered, format=pil_format, lossless=True)
+                else:
+                    image = self.image if self.image.mode == "RGB" else self.image.convert("RGB")
+                    image.save(buffered, format=pil_format, quality=JPEG_QUALITY, subsampling=0)
+                self._encoded = buffered.getvalue()
+            return self._encoded
+
+    async def encode_async(self):
+        """Encode on a worker thread so the event loop is not blocked"""
+        if self._encoded is not None:
+            return self._encoded
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.encode)
+
+    def to_base64(self):
+        return base64.b64encode(self.encode()).decode()
+
+    def to_data_url(self):
+        return f"data:{self.mime_type};base64,{self.to_base64()}"
+
+    @property
+    def content_hash(self):
+        """SHA-256 of the encoded bytes, used as the immutable file name"""
+        return hashlib.sha256(self.encode()).hexdigest()
+
+    def persist(self, root=GENERATED_IMAGES_ROOT):
+        """
+        Store the encoded bytes under a content-addressed name and return the
+        path relative to root ("ab/abcdef....png"). Identical images share a file.
+        """
+        digest = self.content_hash
+        relative_path = f"{digest[:2]}/{digest}.{self.extension}"
+        file_path = os.path.join(root, relative_path)
+        if not os.path.exists(file_path):
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            self.save(tmp_path)
+            os.replace(tmp_path, file_path)
+        return relative_path
+
+    def save(self, path):
+        """Write the encoded bytes to path and return the number of bytes written"""
+        data = self.encode()
+        with open(path, "wb") as f:
+            f.write(data)
+        return len(data)
+
+def image_result_bytes(image_data):
+    """Return encoded bytes from an ImageResult or a (data URL or plain) base64 string"""
+    if isinstance(image_data, ImageResult):
+        return image_data.encode()
+    if image_data.startswith("data:image"):
+        image_data = image_data.split(",", 1)[1]
+    return base64.b64decode(image_data)
@@ -0,0 +1,93 @@
+"""
+Logging configuration for the backend.
+
+setup_logging() gives the root logger a single QueueHandler. The thread that
+logs only puts the record on a queue, and a QueueListener thread writes it to
+stderr. Levels come from the environment:
+
+    LOG_LEVEL=INFO                              root level
+    LOG_LEVELS=db=DEBUG,model=WARNING,PIL=INFO  per-logger overrides
+
+Records below WARNING are rate-limited per call site. Each logging call emits at
+most LOG_SAMPLE_LIMIT records per LOG_SAMPLE_WINDOW seconds. The first record of
+the next window reports how many were suppressed. LOG_SAMPLE_LIMIT=0 turns
+sampling off.
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "%(asctime)s %(levelname)s %(name)s: %(message)s")
+LOG_SAMPLE_LIMIT = int(os.getenv("LOG_SAMPLE_LIMIT", "50"))
+LOG_SAMPLE_WINDOW = float(os.getenv("LOG_SAMPLE_WINDOW", "10"))
+
+_listener = None
+_setup_lock = threading.Lock()
+
+class SamplingFilter(logging.Filter):
+    """Let at most `limit` records per call site through per `window` seconds, below WARNING"""
+
+    def __init__(self, limit=LOG_SAMPLE_LIMIT, window=LOG_SAMPLE_WINDOW):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self._lock = threading.Lock()
+        self._sites = {}  # (pathname, lineno) -> [window_start, emitted, suppressed]
+
+    def filter(self, record):
+        if self.limit <= 0 or record.levelno >= logging.WARNING:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.window:
+                suppressed = site[2] if site is not None else 0
+                self._sites[key] = [now, 1, 0]
+                if suppressed and isinstance(record.msg, str):
+                    record.msg += f" [{suppressed} similar message(s) suppressed]"
+                return True
+            if site[1] < self.limit:
+                site[1] += 1
+                return True
+            site[2] += 1
+            return False
+
+def _parse_levels(spec):
+    levels = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+def setup_logging():
+    """Install the queue-based handler once per process; later calls do nothing"""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+        log_queue = queue.SimpleQueue()
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        queue_handler.addFilter(SamplingFilter())
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(LOG_LEVEL)
+        for name, level in _parse_levels(LOG_LEVELS).items():
+            logging.getLogger(name).setLevel(level)
+
+        _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        # Flush what is still queued when the process exits
+        atexit.register(_listener.stop)
@@ -1,6 +1,8 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Depends, Request, status, Body
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Depends, Request, status, Body, Query
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, FileResponse, Response
+from starlette.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
@@ -10,24 +12,39 @@ import uvicorn
 import os
 from pathlib import Path
 import logging
+from logging_setup import setup_logging
 import re
-from db import (    init_db, create_user, authenticate_user, get_user_by_username,
-    create_project, get_user_projects, get_project, delete_project,
-    save_shot, get_project_shots, get_shot, delete_shot,
-    save_session, list_user_sessions, get_session_data, rename_session, delete_session,
-    list_file_system_sessions, get_filesystem_session_data, save_shots_to_filesystem,
-    get_db_connection, save_shot_version, get_shot_versions, close_db_connection, 
-    list_project_sessions, SESSIONS_ROOT, save_enhanced_shots_to_project, 
-    PROJECT_IMAGES_ROOT, save_fusion_session_to_project, get_session_by_id
+from db import init_db, close_db_connection, MAX_PAGE_SIZE, PROJECT_IMAGES_ROOT, blob_url
+from db_async import (
+    create_user, authenticate_user, get_user_by_username,
+    create_project, get_project, get_project_owner, delete_project,
+    save_shot, get_shot, delete_shot, update_shot_image, save_shot_version,
+    save_session, get_session_data, rename_session, delete_session,
+    get_user_projects_page, get_project_shots_page, get_shot_versions_page,
+    list_user_sessions_page, list_project_sessions_page, reconcile_project_sessions, catalog_session,
+    get_filesystem_session_data, find_filesystem_session, index_filesystem_session, save_enhanced_shots_to_project,
+    save_fusion_session_to_project, record_session_usage, get_storage_usage, shutdown as shutdown_db_executors
 )
-from model import gemini, generate_shot_image, generate_fusion_image, analyze_reference_images, generate_reference_style_image, generate_identity_preserving_image, generate_pose_transfer_image, generate_multi_view_fusion, extract_detailed_image_description, merge_image_descriptions_with_prompt, generate_enhanced_negative_prompt, generate_image_from_text_prompt
+from blob_store import put_blob, blob_path
+from session_files import record_shot_update, read_shots, update_json_file
+from session_archive import bundle_path, ensure_session_folder, list_members, member_info, read_member
+from storage_gc import start_background_collector, stop_background_collector
+from storage_usage import start_usage_reconciler, stop_usage_reconciler
+from password_pool import PasswordPoolBusy, shutdown as shutdown_password_pool
+from auth_cache import get_token_payload, cache_token_payload, get_cached_user, cache_user, user_cache_generation
+from thumbnails import THUMBNAIL_SIZES, generate_thumbnails, ensure_thumbnail, thumbnail_path, legacy_thumbnail_path
+from model import gemini, generate_shot_image, generate_fusion_image, analyze_reference_images_batch, generate_reference_style_image, generate_identity_preserving_image, generate_pose_transfer_image, generate_multi_view_fusion, extract_detailed_image_description, merge_image_descriptions_with_prompt, generate_enhanced_negative_prompt, generate_image_from_text_prompt
 import json
 from dotenv import load_dotenv
 import sqlite3
 import atexit
 import contextlib
+import functools
 from PIL import Image
 from io import BytesIO
+import stat
+import mimetypes
+from email.utils import formatdate, parsedate_to_datetime
 import torch
 import uuid
 from shutil import rmtree
@@ -37,8 +54,8 @@ try:
 except ImportError:
     Translator = None
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Configure logging (queue-based; levels from LOG_LEVEL / LOG_LEVELS)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # Load environment variables from .env file
@@ -68,6 +85,8 @@ app = FastAPI(
 # Add these at the top after imports and dotenv
 FRONTEND_HOST = os.getenv('FRONTEND_HOST', 'http://localhost:3000')
 BACKEND_HOST = os.getenv('BACKEND_HOST', 'http://localhost:8000')
+# "base64" inlines generated images in JSON (what the frontend expects), "url" persists them and returns a link
+IMAGE_RESPONSE_MODE = os.getenv('IMAGE_RESPONSE_MODE', 'base64')
 
 # Configure CORS
 app.add_middleware(
@@ -76,6 +95,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Add OPTIONS endpoint for CORS preflight
@@ -131,6 +151,8 @@ class ProjectResponse(BaseModel):
     updated_at: datetime
     shot_count: int
     last_shot_date: Optional[datetime]
+    storage_bytes: int = 0
+    storage_files: int = 0
 
 class ShotCreate(BaseModel):
     scene_description: str
@@ -165,6 +187,18 @@ class FusionImageRequest(BaseModel):
     num_inference_steps: int = 50
 
 # Helper functions
+def paginated_response(response: Response, items: list, next_cursor: Optional[str], fields: Optional[str]):
+    """
+    Return a page of list results. The cursor for the next page goes in the
+    X-Next-Cursor header, so the body stays a plain list. Projected rows
+    (fields=...) skip the endpoint's response_model, which expects full rows.
+    """
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    if fields:
+        return JSONResponse(content=jsonable_encoder(items), headers=headers)
+    response.headers.update(headers)
+    return items
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -197,9 +231,13 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        logger.debug(f"Validating token: {token[:10]}...")
-        # Decode the JWT token
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        # Tokens seen before skip signature verification until they expire
+        payload = get_token_payload(token)
+        if payload is None:
+            logger.debug("Validating token: %s...", token[:10])
+            # Decode the JWT token
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            cache_token_payload(token, payload)
         username: str = payload.get("sub")
         if username is None:
             logger.error("Token missing username")
@@ -213,31 +251,55 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
             headers={"WWW-Authenticate": "Bearer"},
         )
     except JWTError as e:
-        logger.error(f"JWT validation error: {str(e)}")
+        logger.error("JWT validation error: %s", e)
         raise credentials_exception
     
-    # Get user from database
-    user = get_user_by_username(username=token_data.username)
+    # Get user from the cache, or from the database on a miss
+    user = get_cached_user(token_data.username)
     if user is None:
-        logger.error(f"User {token_data.username} not found in database")
-        raise credentials_exception
+        generation = user_cache_generation()
+        user = await get_user_by_username(username=token_data.username)
+        if user is None:
+            logger.error("User %s not found in database", token_data.username)
+            raise credentials_exception
+        cache_user(token_data.username, user, generation)
         
-    logger.info(f"Successfully authenticated user {user['username']}")
+    logger.debug("Successfully authenticated user %s", user['username'])
     return user
 
+async def resolve_project_owner(request: Request, project_id: str) -> Optional[str]:
+    """Owner user_id of a project (None if it does not exist), looked up at most once per request"""
+    owners = getattr(request.state, "project_owners", None)
+    if owners is None:
+        owners = request.state.project_owners = {}
+    if project_id not in owners:
+        owners[project_id] = await get_project_owner(project_id)
+    return owners[project_id]
+
 # Root endpoint
 @app.get("/")
 async def root():
     return {"message": "AI Cinematic Shot Suggestor Backend Running"}
 
 # Authentication endpoints
+def password_pool_busy_exception():
+    logger.warning("Password hashing pool saturated, rejecting request")
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many sign-ins in progress. Please try again in a moment.",
+        headers={"Retry-After": "1"},
+    )
+
 @app.post("/token")
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
     """Login endpoint to get access token"""
-    logger.info(f"Login attempt for user {form_data.username}")
-    user = authenticate_user(form_data.username, form_data.password)
+    logger.info("Login attempt for user %s", form_data.username)
+    try:
+        user = await authenticate_user(form_data.username, form_data.password)
+    except PasswordPoolBusy:
+        raise password_pool_busy_exception()
     if not user:
-        logger.warning(f"Failed login attempt for user {form_data.username}")
+        logger.warning("Failed login attempt for user %s", form_data.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -284,10 +346,13 @@ async def register(user: UserCreate):
             )
 
         # Create user
-        user_id = create_user(
-            username=user.username,
-            password=user.password
-        )
+        try:
+            user_id = await create_user(
+                username=user.username,
+                password=user.password
+            )
+        except PasswordPoolBusy:
+            raise password_pool_busy_exception()
         
         if not user_id:
             return JSONResponse(
@@ -300,7 +365,7 @@ async def register(user: UserCreate):
             )
         
         # Get created user
-        created_user = get_user_by_username(username=user.username)
+        created_user = await get_user_by_username(username=user.username)
         if not created_user:
             return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -323,6 +388,8 @@ async def register(user: UserCreate):
                 "Access-Control-Allow-Credentials": "true"
             }
         )
+    except HTTPException:
+        raise
     except Exception as e:
         return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -337,22 +404,27 @@ async def register(user: UserCreate):
 async def read_users_me(current_user: dict = Depends(get_current_user)):
     """Get current user information"""
     try:
-        logger.info(f"User {current_user['username']} requesting their info")
+        logger.info("User %s requesting their info", current_user['username'])
         return current_user
     except Exception as e:
-        logger.error(f"Error getting user info: {str(e)}")
+        logger.error("Error getting user info: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to get user information"
         )
 
+@app.get("/me/usage")
+async def read_storage_usage(current_user: dict = Depends(get_current_user)):
+    """Bytes and files the current user stores, in total and per project, from the usage counters"""
+    return await get_storage_usage(current_user["id"])
+
 # Project endpoints
 @app.post("/projects", response_model=ProjectResponse)
 async def create_new_project(
     project: ProjectCreate,
     current_user: dict = Depends(get_current_user)
 ):
-    project_id = create_project(
+    project_id = await create_project(
         user_id=current_user["id"],
         name=project.name,
         description=project.description,
@@ -363,11 +435,21 @@ async def create_new_project(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Failed to create project"
         )
-    return get_project(project_id)
+    return await get_project(project_id)
 
 @app.get("/projects", response_model=List[ProjectResponse])
-async def list_projects(current_user: dict = Depends(get_current_user)):
-    return get_user_projects(current_user["id"])
+async def list_projects(
+    response: Response,
+    fields: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    try:
+        projects, next_cursor = await get_user_projects_page(current_user["id"], fields=fields, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return paginated_response(response, projects, next_cursor, fields)
 
 @app.get("/projects/{project_id}", response_model=ProjectResponse)
 async def get_project_details(
@@ -376,12 +458,12 @@ async def get_project_details(
     current_user: dict = Depends(get_current_user)
 ):
     try:
-        print(f"Fetching project {project_id} for user {current_user['id']}")  # Debug log
-        project = get_project(project_id)
-        print(f"Project data: {project}")  # Debug log
+        logger.debug("Fetching project %s for user %s", project_id, current_user['id'])
+        project = await get_project(project_id)
+        logger.debug("Project data: %s", project)
         
         if not project:
-            print(f"Project {project_id} not found")  # Debug log
+            logger.warning("Project %s not found", project_id)
             return JSONResponse(
                 status_code=status.HTTP_404_NOT_FOUND,
                 content={"detail": "Project not found"},
@@ -394,7 +476,7 @@ async def get_project_details(
             )
             
         if project["user_id"] != current_user["id"]:
-            print(f"User {current_user['id']} not authorized for project {project_id}")  # Debug log
+            logger.warning("User %s not authorized for project %s", current_user['id'], project_id)
             return JSONResponse(
                 status_code=status.HTTP_403_FORBIDDEN,
                 content={"detail": "Not authorized to access this project"},
@@ -408,7 +490,7 @@ async def get_project_details(
             
         return project
     except Exception as e:
-        print(f"Error fetching project {project_id}: {str(e)}")  # Debug log
+        logger.error("Error fetching project %s: %s", project_id, e)
         return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={"detail": f"Internal server error: {str(e)}"},
@@ -427,7 +509,7 @@ async def remove_project(
     current_user: dict = Depends(get_current_user)
 ):
     try:
-        logger.info(f"Attempting to delete project {project_id} for user {current_user['id']}")
+        logger.info("Attempting to delete project %s for user %s", project_id, current_user['id'])
         
         # Add CORS headers for preflight
         if request.method == "OPTIONS":
@@ -439,12 +521,11 @@ async def remove_project(
                 }
             )
 
-        # Get project details
-        project = get_project(project_id)
-        logger.debug(f"Retrieved project: {project}")
+        # Resolve the owner once; it also tells us whether the project exists
+        owner_id = await resolve_project_owner(request, project_id)
         
-        if not project:
-            logger.warning(f"Project {project_id} not found")
+        if owner_id is None:
+            logger.warning("Project %s not found", project_id)
             return JSONResponse(
                 status_code=status.HTTP_404_NOT_FOUND,
                 content={"detail": "Project not found"},
@@ -454,8 +535,8 @@ async def remove_project(
                 }
             )
             
-        if project["user_id"] != current_user["id"]:
-            logger.warning(f"User {current_user['id']} not authorized to delete project {project_id}")
+        if owner_id != current_user["id"]:
+            logger.warning("User %s not authorized to delete project %s", current_user['id'], project_id)
             return JSONResponse(
                 status_code=status.HTTP_403_FORBIDDEN,
                 content={"detail": "Not authorized to delete this project"},
@@ -466,24 +547,11 @@ async def remove_project(
             )
         
         # Delete the project
-        logger.info(f"Deleting project {project_id}")
+        logger.info("Deleting project %s", project_id)
         try:
-            # First verify the project still exists
-            project_exists = get_project(project_id)
-            if not project_exists:
-                logger.warning(f"Project {project_id} was deleted between verification and deletion")
-                return JSONResponse(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    content={"detail": "Project was already deleted"},
-                    headers={
-                        "Access-Control-Allow-Origin": FRONTEND_HOST,
-                        "Access-Control-Allow-Credentials": "true"
-                    }
-                )
-
             # Delete project and all its shots
-            delete_project(project_id)
-            logger.info(f"Successfully deleted project {project_id}")
+            await delete_project(project_id)
+            logger.info("Successfully deleted project %s", project_id)
             
             return JSONResponse(
                 content={"message": "Project deleted successfully"},
@@ -494,7 +562,7 @@ async def remove_project(
             )
             
         except sqlite3.Error as e:
-            logger.error(f"Database error while deleting project {project_id}: {str(e)}")
+            logger.error("Database error while deleting project %s: %s", project_id, e)
             return JSONResponse(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 content={"detail": f"Database error: {str(e)}"},
@@ -505,7 +573,7 @@ async def remove_project(
             )
             
     except Exception as e:
-        logger.error(f"Unexpected error deleting project {project_id}: {str(e)}", exc_info=True)
+        logger.error("Unexpected error deleting project %s: %s", project_id, e, exc_info=True)
         return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={"detail": f"Error deleting project: {str(e)}"},
@@ -523,7 +591,7 @@ async def suggest_shots(
     current_user: dict = Depends(get_current_user)
 ):
     try:
-        logger.info(f"Generating shot suggestions for user {current_user['username']}, project_id: {project_id}")
+        logger.info("Generating shot suggestions for user %s, project_id: %s", current_user['username'], project_id)
         
         # Generate shot suggestions using the Gemini model
         shot_suggestions = await gemini(
@@ -541,9 +609,9 @@ async def suggest_shots(
         # Add project_id if provided
         if project_id:
             input_data["project_id"] = project_id
-            logger.info(f"Using project_id: {project_id} for session")
+            logger.info("Using project_id: %s for session", project_id)
             # Save to file system and get session info
-            session_info = save_enhanced_shots_to_project(
+            session_info = await save_enhanced_shots_to_project(
                 user_id=current_user["id"],
                 project_id=project_id,
                 session_data=input_data,
@@ -561,7 +629,7 @@ async def suggest_shots(
         return JSONResponse(content=response_data)
         
     except Exception as e:
-        logger.error(f"Error in suggest_shots: {str(e)}")
+        logger.error("Error in suggest_shots: %s", e)
         if "quota" in str(e).lower():
             # Extract retry delay if available
             retry_match = re.search(r'retry_delay\s*{\s*seconds:\s*(\d+)\s*}', str(e))
@@ -578,6 +646,7 @@ async def suggest_shots(
 @app.post("/projects/{project_id}/shots")
 async def create_shot(
     project_id: str,
+    request: Request,
     shot_number: int = Form(...),
     scene_description: str = Form(...),
     shot_description: str = Form(...),
@@ -588,12 +657,7 @@ async def create_shot(
     """Create a new shot in a project"""
     try:
         # Verify project ownership and existence
-        with get_db_connection() as conn:
-            project = conn.execute("SELECT id FROM projects WHERE id = ?", (project_id,)).fetchone()
-            if not project:
-                raise HTTPException(status_code=404, detail="Project not found (or deleted).")
-        project = get_project(project_id)
-        if not project or project["user_id"] != current_user["id"]:
+        if await resolve_project_owner(request, project_id) != current_user["id"]:
             raise HTTPException(status_code=404, detail="Project not found (or deleted).")
 
         # Parse metadata if provided
@@ -617,32 +681,31 @@ async def create_shot(
         try:
             # Save the shot and create initial version
             logger.info("Attempting to save shot to database")
-            with get_db_connection() as conn:
-                shot_id = save_shot(
-                    project_id=project_id,
-                    shot_number=shot_number,
-                    scene_description=scene_description,
-                    shot_description=shot_description,
-                    model_name=model_name,
-                    metadata=metadata_dict,
-                    user_input=user_input
-                )
+            shot_id = await save_shot(
+                project_id=project_id,
+                shot_number=shot_number,
+                scene_description=scene_description,
+                shot_description=shot_description,
+                model_name=model_name,
+                metadata=metadata_dict,
+                user_input=user_input
+            )
 
-                if not shot_id:
-                    logger.error("Failed to save shot - save_shot returned None")
-                    raise HTTPException(status_code=500, detail="Failed to save shot to database")
+            if not shot_id:
+                logger.error("Failed to save shot - save_shot returned None")
+                raise HTTPException(status_code=500, detail="Failed to save shot to database")
 
-                logger.info(f"Successfully created shot {shot_id}")
-                return {"id": shot_id, "message": "Shot created successfully"}
+            logger.info("Successfully created shot %s", shot_id)
+            return {"id": shot_id, "message": "Shot created successfully"}
 
         except sqlite3.Error as db_error:
-            logger.error(f"Database error while saving shot: {str(db_error)}", exc_info=True)
+            logger.error("Database error while saving shot: %s", db_error, exc_info=True)
             raise HTTPException(
                 status_code=500,
                 detail=f"Database error: {str(db_error)}"
             )
         except Exception as db_error:
-            logger.error(f"Unexpected error while saving shot: {str(db_error)}", exc_info=True)
+            logger.error("Unexpected error while saving shot: %s", db_error, exc_info=True)
             raise HTTPException(
                 status_code=500,
                 detail=f"Error saving shot: {str(db_error)}"
@@ -651,7 +714,7 @@ async def create_shot(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error creating shot: {str(e)}", exc_info=True)
+        logger.error("Unexpected error creating shot: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Error creating shot: {str(e)}"
@@ -659,6 +722,7 @@ async def create_shot(
 
 @app.post("/shots/generate-image")
 async def generate_shot_image_endpoint(
+    request: Request,
     shot_description: str = Form(...),
     model_name: str = Form(...),
     shot_id: str = Form(None),
@@ -668,15 +732,26 @@ async def generate_shot_image_endpoint(
     current_user: dict = Depends(get_current_user)
 ):
     try:
-        logger.info(f"Generating image for shot description: '{shot_description}' with model: {model_name}")
-        logger.info(f"Session ID: {session_id}, Project ID: {project_id}, Shot Index: {shot_index}")
+        logger.debug("Generating image for shot description: '%s' with model: %s", shot_description, model_name)
+        logger.info("Session ID: %s, Project ID: %s, Shot Index: %s", session_id, project_id, shot_index)
+
+        # Check the shot before generating or storing anything for it
+        if shot_id:
+            shot = await get_shot(shot_id)
+            if not shot:
+                raise HTTPException(status_code=404, detail="Shot not found")
+            if await resolve_project_owner(request, shot["project_id"]) != current_user["id"]:
+                raise HTTPException(status_code=403, detail="Not authorized to modify this shot")
         
         # Generate the image
-        image_data = generate_shot_image(
+        image_result = generate_shot_image(
             prompt=shot_description,
             model_name=model_name
         )
         
+        # Encode once; the same bytes are returned and written to disk
+        await image_result.encode_async()
+        image_data = image_result.to_data_url()
         logger.info("Image generation successful")
         
         # Prepare response
@@ -688,29 +763,23 @@ async def generate_shot_image_endpoint(
                 if shot_idx is not None:
                     # Create session-specific image save path
                     try:
-                        import base64
-                        import os
-                        from datetime import datetime
-                        
-                        # Create session images directory
+                        # Create session images directory, unpacking the session first if it was archived
+                        await run_in_threadpool(ensure_session_folder, os.path.join(PROJECT_IMAGES_ROOT, project_id, session_id))
                         session_images_dir = os.path.join(PROJECT_IMAGES_ROOT, project_id, session_id, "images")
                         os.makedirs(session_images_dir, exist_ok=True)
                         
                         # Save image file with shot index
                         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        image_filename = f"shot_{shot_idx}_{timestamp}.png"
+                        image_filename = f"shot_{shot_idx}_{timestamp}.{image_result.extension}"
                         image_path = os.path.join(session_images_dir, image_filename)
                         
-                        # Decode and save image
-                        if image_data.startswith('data:image'):
-                            # Remove data URL prefix if present
-                            image_data_clean = image_data.split(',')[1]
-                        else:
-                            image_data_clean = image_data
-                            
-                        image_bytes = base64.b64decode(image_data_clean)
-                        with open(image_path, 'wb') as f:
-                            f.write(image_bytes)
+                        # Write the already-encoded bytes, then the gallery thumbnails
+                        image_result.save(image_path)
+                        try:
+                            await run_in_threadpool(generate_thumbnails, session_images_dir, image_filename, image_result.image)
+                        except Exception as thumb_error:
+                            # The thumbnail route backfills missing thumbnails on first request
+                            logger.warning("Error generating thumbnails for %s: %s", image_filename, thumb_error)
                           # Create relative path for frontend URL
                         relative_image_path = f"/projects/{project_id}/sessions/{session_id}/images/{image_filename}"
                         
@@ -718,61 +787,51 @@ async def generate_shot_image_endpoint(
                         response["image_file_path"] = image_path
                         response["image_filename"] = image_filename
                         response["image_url"] = f"{BACKEND_HOST}{relative_image_path}"  # Update URL to point to saved image
-                        logger.info(f"Shot image saved to session: {image_path}")
+                        logger.info("Shot image saved to session: %s", image_path)
                         
-                        # Update shots.json file with the image information
+                        # Record the image in shots.json through the session's change log
                         try:
-                            shots_file = os.path.join(PROJECT_IMAGES_ROOT, project_id, session_id, "shots.json")
-                            if os.path.exists(shots_file):
-                                with open(shots_file, 'r') as f:
-                                    shots_data = json.load(f)
-                                
-                                # Update the specific shot with image URL
-                                if 'shots' in shots_data and shot_idx < len(shots_data['shots']):
-                                    shots_data['shots'][shot_idx]['image_url'] = relative_image_path
-                                    shots_data['shots'][shot_idx]['image_filename'] = image_filename
-                                    shots_data['shots'][shot_idx]['image_generated_at'] = datetime.now().isoformat()
-                                    
-                                    # Save updated shots.json
-                                    with open(shots_file, 'w') as f:
-                                        json.dump(shots_data, f, indent=2)
-                                    
-                                    logger.info(f"Updated shots.json with image for shot {shot_idx}")
-                                    response["shots_json_updated"] = True
+                            session_folder = os.path.join(PROJECT_IMAGES_ROOT, project_id, session_id)
+                            response["shots_json_updated"] = await run_in_threadpool(
+                                record_shot_update, session_folder, shot_idx, {
+                                    "image_url": relative_image_path,
+                                    "image_filename": image_filename,
+                                    "image_generated_at": datetime.now().isoformat()
+                                }
+                            )
+                            if response["shots_json_updated"]:
+                                logger.info("Updated shots.json with image for shot %s", shot_idx)
                         except Exception as shots_update_error:
-                            logger.error(f"Error updating shots.json: {shots_update_error}")
+                            logger.error("Error updating shots.json: %s", shots_update_error)
                             response["shots_json_updated"] = False
+                        await record_session_usage(project_id, session_id)
                         
                     except Exception as save_error:
-                        logger.error(f"Error saving shot image to session: {save_error}")
+                        logger.error("Error saving shot image to session: %s", save_error)
                         response["saved_to_project"] = False
                 else:
                     logger.error("Failed to save image to project structure - invalid shot index")
                     response["saved_to_project"] = False
                         
             except Exception as project_save_error:
-                logger.error(f"Error saving image to project: {str(project_save_error)}")
+                logger.error("Error saving image to project: %s", project_save_error)
                 response["saved_to_project"] = False
 
         # Handle legacy shot_id updates if provided
         if shot_id:
-            logger.info(f"Updating existing shot {shot_id} with new image")
-            # Get current shot
-            shot = get_shot(shot_id)
-            if not shot:
-                raise HTTPException(status_code=404, detail="Shot not found")
-            if get_project(shot["project_id"])["user_id"] != current_user["id"]:
-                raise HTTPException(status_code=403, detail="Not authorized to modify this shot")
+            logger.info("Updating existing shot %s with new image", shot_id)
+            # The row references the image in the blob store instead of embedding it
+            image_ref = blob_url(await run_in_threadpool(put_blob, image_result.encode()), image_result.extension)
 
             # Create new version
             version_number = shot.get("version_number", 0) + 1
-            version_id = save_shot_version(
+            version_id = await save_shot_version(
                 shot_id=shot_id,
                 version_number=version_number,
                 scene_description=shot["scene_description"],
                 shot_description=shot_description,
                 model_name=model_name,
-                image_url=image_data,
+                image_url=image_ref,
                 metadata=shot.get("metadata"),
                 user_input={
                     "shot_description": shot_description,
@@ -785,18 +844,11 @@ async def generate_shot_image_endpoint(
                 raise HTTPException(status_code=500, detail="Failed to save shot version")
 
             # Update shot with new version
-            conn = get_db_connection()
-            conn.execute(
-                """
-                UPDATE shots 
-                SET version_number = ?, image_url = ?
-                WHERE id = ?
-                """,
-                (version_number, image_data, shot_id)
-            )
-            conn.commit()
-            conn.close()
-            logger.info(f"Shot {shot_id} updated successfully with new image")
+            await update_shot_image(shot_id, image_ref, version_number=version_number)
+            if not response.get("saved_to_project"):
+                # Same relative form as image_url in /projects/{id}/shots and /shots/{id}/versions
+                response["image_url"] = image_ref
+            logger.info("Shot %s updated successfully with new image", shot_id)
         
         # Update legacy filesystem session if session_id is provided (fallback)
         if session_id and shot_index is not None and not project_id:
@@ -804,39 +856,17 @@ async def generate_shot_image_endpoint(
                 # Convert shot_index to integer if it's a string
                 shot_idx = int(shot_index) if shot_index else None
                 
-                logger.info(f"Updating legacy filesystem session {session_id} with image for shot index {shot_idx}")
-                
-                # Get the session data
-                session_data = get_filesystem_session_data(current_user["id"], session_id)
+                logger.info("Updating legacy filesystem session %s with image for shot index %s", session_id, shot_idx)
                 
-                if session_data and "data" in session_data and "shots" in session_data["data"]:
-                    shots = session_data["data"]["shots"]
-                    
-                    # Make sure the shot index is valid
-                    if shot_idx is not None and 0 <= shot_idx < len(shots):
-                        # Update the shot with the image URL
-                        shots[shot_idx]["image_url"] = image_data
-                        logger.info(f"Successfully added image_url to shot at index {shot_idx}")
-                        
-                        # Find the session folder
-                        user_folder = os.path.join(SESSIONS_ROOT, str(current_user["id"]))
-                        
-                        # Search in all project folders for this session
-                        for project_dir in os.listdir(user_folder):
-                            project_path = os.path.join(user_folder, project_dir)
-                            if os.path.isdir(project_path):
-                                session_path = os.path.join(project_path, session_id)
-                                
-                                if os.path.exists(session_path):
-                                    # Update shots.json file
-                                    shots_path = os.path.join(session_path, 'shots.json')
-                                    with open(shots_path, 'w') as f:
-                                        json.dump(shots, f, indent=2)
-                                    
-                                    logger.info(f"Updated legacy session file at {shots_path}")
-                                    break
+                session_path = await find_filesystem_session(current_user["id"], session_id)
+                if session_path and shot_idx is not None:
+                    image_ref = blob_url(await run_in_threadpool(put_blob, image_result.encode()), image_result.extension)
+                    # Out-of-range indices are dropped when the change log is compacted
+                    if await run_in_threadpool(record_shot_update, session_path, shot_idx, {"image_url": image_ref}):
+                        logger.info("Updated legacy session file at %s", session_path)
+                        await index_filesystem_session(current_user["id"], session_id, os.path.basename(os.path.dirname(session_path)))
             except Exception as sess_error:
-                logger.error(f"Error updating legacy session file: {str(sess_error)}")
+                logger.error("Error updating legacy session file: %s", sess_error)
                 # Non-critical error, don't raise HTTP exception
         
         return response
@@ -846,46 +876,62 @@ async def generate_shot_image_endpoint(
     except Exception as e:
         import traceback
         error_trace = traceback.format_exc()
-        logger.error(f"Error generating image: {str(e)}\nTraceback: {error_trace}")
+        logger.error("Error generating image: %s\nTraceback: %s", e, error_trace)
         raise HTTPException(status_code=500, detail=f"Image generation failed: {str(e)}")
 
 @app.get("/shots/{shot_id}/versions")
 async def get_shot_versions(
     shot_id: str,
+    request: Request,
+    response: Response,
+    fields: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
     try:
         # Verify shot exists and user has access
-        shot = get_shot(shot_id)
+        shot = await get_shot(shot_id)
         if not shot:
             raise HTTPException(status_code=404, detail="Shot not found")
-        if get_project(shot["project_id"])["user_id"] != current_user["id"]:
+        if await resolve_project_owner(request, shot["project_id"]) != current_user["id"]:
             raise HTTPException(status_code=403, detail="Not authorized to view this shot")
 
-        # Get all versions
-        versions = get_shot_versions(shot_id)
-        return versions
+        # Get one page of versions (all of them without limit)
+        try:
+            versions, next_cursor = await get_shot_versions_page(shot_id, fields=fields, limit=limit, cursor=cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return paginated_response(response, versions, next_cursor, fields)
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error getting shot versions: {str(e)}")
+        logger.error("Error getting shot versions: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 # Shot management endpoints
 @app.get("/projects/{project_id}/shots", response_model=List[ShotResponse])
 async def list_project_shots(
     project_id: str,
+    request: Request,
+    response: Response,
+    fields: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
     # Verify project ownership
-    project = get_project(project_id)
-    if not project or project["user_id"] != current_user["id"]:
+    if await resolve_project_owner(request, project_id) != current_user["id"]:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Project not found"
         )
-    return get_project_shots(project_id)
+    try:
+        shots, next_cursor = await get_project_shots_page(project_id, fields=fields, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return paginated_response(response, shots, next_cursor, fields)
 
 @app.delete("/shots/{shot_id}")
 async def remove_shot(
@@ -894,7 +940,7 @@ async def remove_shot(
     current_user: dict = Depends(get_current_user)
 ):
     try:
-        logger.info(f"Attempting to delete shot {shot_id} for user {current_user['id']}")
+        logger.info("Attempting to delete shot %s for user %s", shot_id, current_user['id'])
         
         # Add CORS headers for preflight
         if request.method == "OPTIONS":
@@ -907,11 +953,11 @@ async def remove_shot(
             )
 
         # Get shot details
-        shot = get_shot(shot_id)
-        logger.debug(f"Retrieved shot: {shot}")
+        shot = await get_shot(shot_id)
+        logger.debug("Retrieved shot: %s", shot)
         
         if not shot:
-            logger.warning(f"Shot {shot_id} not found")
+            logger.warning("Shot %s not found", shot_id)
             return JSONResponse(
                 status_code=status.HTTP_404_NOT_FOUND,
                 content={"detail": "Shot not found"},
@@ -922,11 +968,10 @@ async def remove_shot(
             )
         
         # Verify project ownership
-        project = get_project(shot["project_id"])
-        logger.debug(f"Retrieved project: {project}")
+        owner_id = await resolve_project_owner(request, shot["project_id"])
         
-        if not project:
-            logger.warning(f"Project {shot['project_id']} not found for shot {shot_id}")
+        if owner_id is None:
+            logger.warning("Project %s not found for shot %s", shot['project_id'], shot_id)
             return JSONResponse(
                 status_code=status.HTTP_404_NOT_FOUND,
                 content={"detail": "Project not found"},
@@ -936,8 +981,8 @@ async def remove_shot(
                 }
             )
             
-        if project["user_id"] != current_user["id"]:
-            logger.warning(f"User {current_user['id']} not authorized to delete shot {shot_id} from project {project['id']}")
+        if owner_id != current_user["id"]:
+            logger.warning("User %s not authorized to delete shot %s from project %s", current_user['id'], shot_id, shot['project_id'])
             return JSONResponse(
                 status_code=status.HTTP_403_FORBIDDEN,
                 content={"detail": "Not authorized to delete this shot"},
@@ -948,12 +993,12 @@ async def remove_shot(
             )
         
         # Delete the shot
-        logger.info(f"Deleting shot {shot_id} from project {project['id']}")
+        logger.info("Deleting shot %s from project %s", shot_id, shot['project_id'])
         try:
             # First verify the shot still exists
-            shot_exists = get_shot(shot_id)
+            shot_exists = await get_shot(shot_id)
             if not shot_exists:
-                logger.warning(f"Shot {shot_id} was deleted between verification and deletion")
+                logger.warning("Shot %s was deleted between verification and deletion", shot_id)
                 return JSONResponse(
                     status_code=status.HTTP_404_NOT_FOUND,
                     content={"detail": "Shot was already deleted"},
@@ -964,9 +1009,9 @@ async def remove_shot(
                 )
 
             # Attempt deletion
-            success = delete_shot(shot_id)
+            success = await delete_shot(shot_id)
             if success:
-                logger.info(f"Successfully deleted shot {shot_id}")
+                logger.info("Successfully deleted shot %s", shot_id)
                 return JSONResponse(
                     content={"message": "Shot deleted successfully"},
                     headers={
@@ -975,7 +1020,7 @@ async def remove_shot(
                     }
                 )
             else:
-                logger.error(f"Failed to delete shot {shot_id} - delete_shot returned False")
+                logger.error("Failed to delete shot %s - delete_shot returned False", shot_id)
                 return JSONResponse(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     content={"detail": "Failed to delete shot from database"},
@@ -985,7 +1030,7 @@ async def remove_shot(
                     }
                 )
         except sqlite3.Error as e:
-            logger.error(f"Database error while deleting shot {shot_id}: {str(e)}")
+            logger.error("Database error while deleting shot %s: %s", shot_id, e)
             return JSONResponse(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 content={"detail": f"Database error: {str(e)}"},
@@ -996,7 +1041,7 @@ async def remove_shot(
             )
             
     except Exception as e:
-        logger.error(f"Unexpected error deleting shot {shot_id}: {str(e)}", exc_info=True)
+        logger.error("Unexpected error deleting shot %s: %s", shot_id, e, exc_info=True)
         return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={"detail": f"Error deleting shot: {str(e)}"},
@@ -1011,20 +1056,20 @@ async def update_shot(
     project_id: str,
     shot_id: str,
     shot_update: dict,
+    request: Request,
     current_user: dict = Depends(get_current_user)
 ):
     """Update a shot in a project"""
     try:
         # Verify project ownership
-        project = get_project(project_id)
-        if not project or project["user_id"] != current_user["id"]:
+        if await resolve_project_owner(request, project_id) != current_user["id"]:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Project not found"
             )
         
         # Get the shot to verify it exists
-        shot = get_shot(shot_id)
+        shot = await get_shot(shot_id)
         if not shot:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -1032,22 +1077,13 @@ async def update_shot(
             )
             
         # Update shot in database
-        conn = get_db_connection()
         try:
             # Only update image_url if provided
             if "image_url" in shot_update:
-                conn.execute(
-                    """
-                    UPDATE shots 
-                    SET image_url = ? 
-                    WHERE id = ? AND project_id = ?
-                    """,
-                    (shot_update["image_url"], shot_id, project_id)
-                )
-                conn.commit()
+                await update_shot_image(shot_id, shot_update["image_url"], project_id=project_id)
             
             # Get and return the updated shot
-            updated_shot = get_shot(shot_id)
+            updated_shot = await get_shot(shot_id)
             if not updated_shot:
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1060,13 +1096,11 @@ async def update_shot(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Database error: {str(e)}"
             )
-        finally:
-            conn.close()
             
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error updating shot: {str(e)}")
+        logger.error("Error updating shot: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error updating shot: {str(e)}"
@@ -1078,7 +1112,7 @@ async def create_new_session(
     session: SessionCreate,
     current_user: dict = Depends(get_current_user)
 ):
-    session_id = save_session(
+    session_id = await save_session(
         user_id=current_user["id"],
         name=session.name,
         data=session.data
@@ -1088,18 +1122,36 @@ async def create_new_session(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Failed to save session"
         )
-    return get_session_data(current_user["id"], session.name)
+    return await get_session_data(current_user["id"], session.name)
 
 @app.get("/sessions", response_model=List[dict])
-async def list_sessions(current_user: dict = Depends(get_current_user)):
-    # Only get sessions from database (filesystem sessions are now in projects)
-    db_sessions = list_user_sessions(current_user["id"])
+async def list_sessions(
+    response: Response,
+    fields: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    # Only get sessions from database (filesystem sessions are now in projects).
+    # Already ordered by updated_at DESC in SQL.
+    # type is not a column; it is added below, and only if it was asked for
+    requested = [field.strip() for field in fields.split(",") if field.strip()] if fields else []
+    columns = [field for field in requested if field != "type"]
+    try:
+        db_sessions, next_cursor = await list_user_sessions_page(
+            current_user["id"], fields=",".join(columns or ["id"]) if requested else None, limit=limit, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     
     # Add source type to database sessions
     for session in db_sessions:
-        session["type"] = "database"
+        if requested and not columns:
+            session.clear()  # fields=type: id was only selected to have a column
+        if not requested or "type" in requested:
+            session["type"] = "database"
     
-    return sorted(db_sessions, key=lambda x: x.get('updated_at', ''), reverse=True)
+    return paginated_response(response, db_sessions, next_cursor, fields)
 
 @app.get("/sessions/{session_identifier}")
 async def get_session(
@@ -1109,10 +1161,10 @@ async def get_session(
 ):
     if session_type == "filesystem":
         # Get from filesystem
-        session = get_filesystem_session_data(current_user["id"], session_identifier)
+        session = await get_filesystem_session_data(current_user["id"], session_identifier)
     else:
         # Get from database
-        session = get_session_data(current_user["id"], session_identifier)
+        session = await get_session_data(current_user["id"], session_identifier)
     
     if not session:
         raise HTTPException(
@@ -1127,7 +1179,7 @@ async def update_session(
     new_name: str = Form(...),
     current_user: dict = Depends(get_current_user)
 ):
-    if rename_session(current_user["id"], session_name, new_name):
+    if await rename_session(current_user["id"], session_name, new_name):
         return {"message": "Session renamed successfully"}
     raise HTTPException(
         status_code=status.HTTP_400_BAD_REQUEST,
@@ -1139,7 +1191,7 @@ async def remove_session(
     session_name: str,
     current_user: dict = Depends(get_current_user)
 ):
-    if delete_session(current_user["id"], session_name):
+    if await delete_session(current_user["id"], session_name):
         return {"message": "Session deleted successfully"}
     raise HTTPException(
         status_code=status.HTTP_400_BAD_REQUEST,
@@ -1149,14 +1201,61 @@ async def remove_session(
 @app.get("/projects/{project_id}/sessions", response_model=List[dict])
 async def list_project_sessions_api(
     project_id: str,
+    response: Response,
+    fields: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
-    """List all sessions for a specific project"""    # Get sessions for this project from filesystem
-    sessions = list_project_sessions(current_user["id"], project_id)
-    if not sessions:
-        return []
-    
-    return sorted(sessions, key=lambda x: x.get('created_at', ''), reverse=True)
+    """List sessions for a specific project, newest first, optionally one page at a time"""
+    # Catch the catalog up with the project folder on the write executor; the page is then a plain read
+    try:
+        await reconcile_project_sessions(project_id)
+    except (sqlite3.Error, OSError) as e:
+        logger.error("Error reconciling sessions of project %s: %s", project_id, e)
+    try:
+        sessions, next_cursor = await list_project_sessions_page(
+            current_user["id"], project_id, fields=fields, limit=limit, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return paginated_response(response, sessions, next_cursor, fields)
+
+SESSION_IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+
+def load_session_files(session_folder: str):
+    """
+    (input, shots, output, image filenames, archived) for a project session, read
+    from its folder or, for an archived session, from members of its bundle.
+    None if the session does not exist.
+    """
+    if os.path.isdir(session_folder):
+        def load(name):
+            path = os.path.join(session_folder, name)
+            if not os.path.exists(path):
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        images_dir = os.path.join(session_folder, "images")
+        image_names = []
+        if os.path.isdir(images_dir):
+            with os.scandir(images_dir) as entries:
+                image_names = [entry.name for entry in entries if entry.name.lower().endswith(SESSION_IMAGE_EXTENSIONS)]
+        # Pending shot updates are applied by read_shots
+        return load("input.json"), read_shots(session_folder), load("output.json"), image_names, False
+
+    members = list_members(session_folder)
+    if members is None:
+        return None
+    def load_member(name):
+        data = read_member(session_folder, name)
+        return json.loads(data) if data is not None else None
+    image_names = [
+        member[len("images/"):] for member in members
+        if member.startswith("images/") and "/" not in member[len("images/"):]
+        and member.lower().endswith(SESSION_IMAGE_EXTENSIONS)
+    ]
+    return load_member("input.json"), load_member("shots.json"), load_member("output.json"), image_names, True
 
 @app.get("/projects/{project_id}/sessions/{session_id}/details")
 async def get_project_session_details(
@@ -1170,42 +1269,27 @@ async def get_project_session_details(
     import os
     try:
         from db import PROJECT_IMAGES_ROOT, get_session_by_id
-        logger.info(f"Getting session details for project {project_id}, session {session_id}")
+        logger.info("Getting session details for project %s, session %s", project_id, session_id)
         # Try to find session folder
         project_dir = os.path.join(PROJECT_IMAGES_ROOT, project_id)
         session_folder = os.path.join(project_dir, session_id)
-        if not os.path.exists(session_folder):
+        loaded = await run_in_threadpool(load_session_files, session_folder)
+        if loaded is None:
             return JSONResponse(status_code=404, content={"detail": "Session folder not found"})
-        # Load input.json
-        input_data = None
-        input_file = os.path.join(session_folder, "input.json")
-        if os.path.exists(input_file):
-            with open(input_file, "r", encoding="utf-8") as f:
-                input_data = json.load(f)
-        # Load shots.json (for shot suggestion sessions)
-        shots_data = None
-        shots_file = os.path.join(session_folder, "shots.json")
-        if os.path.exists(shots_file):
-            with open(shots_file, "r", encoding="utf-8") as f:
-                shots_data = json.load(f)
-        # Load output.json
-        output_data = None
-        output_file = os.path.join(session_folder, "output.json")
-        if os.path.exists(output_file):
-            with open(output_file, "r", encoding="utf-8") as f:
-                output_data = json.load(f)
+        input_data, shots_data, output_data, image_names, archived = loaded
         # List generated images
-        images_dir = os.path.join(session_folder, "images")
         image_files = []
-        if os.path.exists(images_dir):
-            for fname in os.listdir(images_dir):
-                if fname.lower().endswith(('.png', '.jpg', '.jpeg', '.webp')):
-                    image_files.append({
-                        "filename": fname,
-                        "url": f"/projects/{project_id}/sessions/{session_id}/images/{fname}"
-                    })
+        for fname in image_names:
+            image_files.append({
+                "filename": fname,
+                "url": f"/projects/{project_id}/sessions/{session_id}/images/{fname}",
+                "thumbnails": {
+                    str(size): f"/projects/{project_id}/sessions/{session_id}/thumbnails/{size}/{fname}"
+                    for size in THUMBNAIL_SIZES
+                }
+            })
         return {
-            "session": {"id": session_id, "project_id": project_id},
+            "session": {"id": session_id, "project_id": project_id, "archived": archived},
             "session_folder": session_folder,
             "input_data": input_data,
             "shots_data": shots_data,
@@ -1219,7 +1303,7 @@ async def get_project_session_details(
             }
         }
     except Exception as e:
-        logger.error(f"Error loading session details: {str(e)}")
+        logger.error("Error loading session details: %s", e)
         return JSONResponse(status_code=500, content={"detail": f"Failed to load session details: {str(e)}"})
 
 def translate_to_english(text):
@@ -1240,8 +1324,8 @@ async def fusion_generate_image_with_final_prompt(
     the analysis of reference images + user's desired angle.
     """
     try:
-        logger.info(f"Fusion generate-image from user {current_user['username']}")
-        logger.info(f"Final prompt: {final_prompt[:200]}...")
+        logger.info("Fusion generate-image from user %s", current_user['username'])
+        logger.debug("Final prompt: %s...", final_prompt[:200])
         if not final_prompt.strip():
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -1262,13 +1346,14 @@ async def fusion_generate_image_with_final_prompt(
             num_inference_steps=30,  # Optimized for better speed/quality balance
             guidance_scale=8.0       # Better prompt following
         )
+        await generated_image.encode_async()
         logger.info("Image generation completed successfully")
         # Save the fusion session data to project if project_id is provided
         saved_data = None
         if project_id:
             try:
                 # Save fusion data to project structure
-                saved_data = save_fusion_session_to_project(
+                saved_data = await save_fusion_session_to_project(
                     user_id=current_user["id"],
                     project_id=project_id,
                     final_prompt=final_prompt,
@@ -1276,15 +1361,16 @@ async def fusion_generate_image_with_final_prompt(
                 )
                 
                 if saved_data:
-                    logger.info(f"Fusion session saved to project {project_id}")
+                    logger.info("Fusion session saved to project %s", project_id)
                 else:
                     logger.warning("Failed to save fusion session to project")                    
             except Exception as save_error:
-                logger.error(f"Error saving fusion session: {str(save_error)}")
+                logger.error("Error saving fusion session: %s", save_error)
         
         response_data = {
             "success": True,
-            "image_data": generated_image,
+            "image_data": generated_image.to_base64(),
+            "image_mime_type": generated_image.mime_type,
             "prompt_used": final_prompt,
             "message": "Image generated successfully using final prompt"
         }
@@ -1301,7 +1387,7 @@ async def fusion_generate_image_with_final_prompt(
         return response_data
         
     except Exception as e:
-        logger.error(f"Error in fusion generate-image: {str(e)}")
+        logger.error("Error in fusion generate-image: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to generate image: {str(e)}"
@@ -1315,6 +1401,7 @@ async def generate_fusion_image_endpoint(
     guidance_scale: float = Form(10.0),  # Increased from 8.5 for better prompt following
     num_inference_steps: int = Form(60),  # Increased from 50 for better quality
     reference_images: List[UploadFile] = File(...),
+    response_mode: str = Form(IMAGE_RESPONSE_MODE),  # "base64" or "url"
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -1333,9 +1420,9 @@ async def generate_fusion_image_endpoint(
         Base64 encoded generated image
     """
     try:
-        logger.info(f"Fusion image generation request from user {current_user['username']}")
-        logger.info(f"Prompt: {prompt}")
-        logger.info(f"Number of reference images: {len(reference_images)}")
+        logger.info("Fusion image generation request from user %s", current_user['username'])
+        logger.debug("Prompt: %s", prompt)
+        logger.info("Number of reference images: %s", len(reference_images))
         
         # Validate inputs
         if len(reference_images) < 1:
@@ -1379,10 +1466,10 @@ async def generate_fusion_image_endpoint(
                     )
                 
                 processed_images.append(image)
-                logger.info(f"Processed reference image {i+1}: {uploaded_file.filename}")
+                logger.info("Processed reference image %s: %s", i+1, uploaded_file.filename)
                 
             except Exception as e:
-                logger.error(f"Error processing image {uploaded_file.filename}: {str(e)}")
+                logger.error("Error processing image %s: %s", uploaded_file.filename, e)
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail=f"Error processing image {uploaded_file.filename}: {str(e)}"
@@ -1390,8 +1477,8 @@ async def generate_fusion_image_endpoint(
         
         # Analyze reference images for better prompt enhancement
         try:
-            analysis = analyze_reference_images(processed_images)
-            logger.info(f"Image analysis: {analysis}")
+            analysis = analyze_reference_images_batch(processed_images)
+            logger.info("Image analysis: %s", analysis)
             
             # Enhance prompt based on analysis to preserve complete themes
             enhanced_prompt = prompt
@@ -1425,7 +1512,7 @@ async def generate_fusion_image_endpoint(
                 enhanced_prompt += f", preserve: {dominant_elements}"
             
         except Exception as e:
-            logger.warning(f"Image analysis failed, using original prompt: {str(e)}")
+            logger.warning("Image analysis failed, using original prompt: %s", e)
             enhanced_prompt = prompt
         
         # Generate the fused image
@@ -1439,10 +1526,11 @@ async def generate_fusion_image_endpoint(
             num_inference_steps=num_inference_steps
         )
         
+        image_payload = await build_image_payload(generated_image, "image_url", response_mode)
         logger.info("Fusion image generation completed successfully")
         
         return {
-            "image_url": generated_image,
+            **image_payload,
             "prompt_used": enhanced_prompt,
             "analysis": analysis if 'analysis' in locals() else None,
             "processing_info": {
@@ -1457,7 +1545,7 @@ async def generate_fusion_image_endpoint(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error in fusion image generation: {str(e)}", exc_info=True)
+        logger.error("Error in fusion image generation: %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to generate fusion image: {str(e)}"
@@ -1467,6 +1555,7 @@ async def generate_fusion_image_endpoint(
 async def fuse_reference(
     prompt: str = Form(...),
     files: list[UploadFile] = File(...),
+    response_mode: str = Form(IMAGE_RESPONSE_MODE),  # "base64" or "url"
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -1482,8 +1571,8 @@ async def fuse_reference(
             tmp.write(contents)
             tmp.flush()
             reference_images.append(tmp.name)
-    img_str = generate_reference_style_image(prompt, reference_images)
-    return {"image": img_str}
+    image_result = generate_reference_style_image(prompt, reference_images)
+    return await build_image_payload(image_result, "image", response_mode)
 
 @app.post("/api/identity-preserve")
 async def identity_preserve(
@@ -1492,6 +1581,7 @@ async def identity_preserve(
     ip_adapter_scale: float = Form(0.8),
     guidance_scale: float = Form(7.5),
     num_inference_steps: int = Form(30),
+    response_mode: str = Form(IMAGE_RESPONSE_MODE),  # "base64" or "url"
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -1508,14 +1598,14 @@ async def identity_preserve(
             tmp.write(contents)
             tmp.flush()
             reference_images.append(tmp.name)
-    img_str = generate_identity_preserving_image(
+    image_result = generate_identity_preserving_image(
         prompt, 
         reference_images, 
         ip_adapter_scale=ip_adapter_scale,
         guidance_scale=guidance_scale,
         num_inference_steps=num_inference_steps
     )
-    return {"image": img_str}
+    return await build_image_payload(image_result, "image", response_mode)
 
 @app.post("/api/pose-transfer")
 async def pose_transfer(
@@ -1524,6 +1614,7 @@ async def pose_transfer(
     strength: float = Form(0.8),
     guidance_scale: float = Form(7.5),
     num_inference_steps: int = Form(30),
+    response_mode: str = Form(IMAGE_RESPONSE_MODE),  # "base64" or "url"
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -1539,14 +1630,14 @@ async def pose_transfer(
             tmp.write(contents)
             tmp.flush()
             reference_images.append(tmp.name)
-    img_str = generate_pose_transfer_image(
+    image_result = generate_pose_transfer_image(
         prompt, 
         reference_images, 
         strength=strength,
         guidance_scale=guidance_scale,
         num_inference_steps=num_inference_steps
     )
-    return {"image": img_str}
+    return await build_image_payload(image_result, "image", response_mode)
 
 @app.post("/api/theme-preserve")
 async def theme_preserve(
@@ -1555,6 +1646,7 @@ async def theme_preserve(
     strength: float = Form(0.6),  # Balanced for theme preservation and prompt following
     guidance_scale: float = Form(15.0),  # Higher for stronger theme following
     num_inference_steps: int = Form(100),  # More steps for better quality
+    response_mode: str = Form(IMAGE_RESPONSE_MODE),  # "base64" or "url"
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -1563,9 +1655,9 @@ async def theme_preserve(
     Optimized for "same world, new angle" generation.
     """
     try:
-        logger.info(f"Theme preservation request from user {current_user['username']}")
-        logger.info(f"Prompt: {prompt}")
-        logger.info(f"Number of reference images: {len(files)}")
+        logger.info("Theme preservation request from user %s", current_user['username'])
+        logger.debug("Prompt: %s", prompt)
+        logger.info("Number of reference images: %s", len(files))
         
         # Validate inputs
         if len(files) < 1:
@@ -1624,10 +1716,10 @@ async def theme_preserve(
                     )
                 
                 processed_images.append(image)
-                logger.info(f"Processed reference image {i+1}: {uploaded_file.filename}")
+                logger.info("Processed reference image %s: %s", i+1, uploaded_file.filename)
                 
             except Exception as e:
-                logger.error(f"Error processing image {uploaded_file.filename}: {str(e)}")
+                logger.error("Error processing image %s: %s", uploaded_file.filename, e)
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail=f"Error processing image {uploaded_file.filename}: {str(e)}"
@@ -1647,10 +1739,11 @@ async def theme_preserve(
             num_inference_steps=num_inference_steps
         )
         
+        image_payload = await build_image_payload(generated_image, "image", response_mode)
         logger.info("Theme-preserving image generation completed successfully")
         
         return {
-            "image": generated_image,
+            **image_payload,
             "message": "Theme-preserving image generated successfully",
             "processing_info": {
                 "device": "cuda" if torch.cuda.is_available() else "cpu",
@@ -1664,7 +1757,7 @@ async def theme_preserve(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error in theme preservation: {str(e)}", exc_info=True)
+        logger.error("Error in theme preservation: %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to generate theme-preserving image: {str(e)}"
@@ -1678,23 +1771,24 @@ async def test_image_generation(
 ):
     """Simple test endpoint to verify image generation is working"""
     try:
-        logger.info(f"Test image generation for prompt: '{prompt}'")
+        logger.debug("Test image generation for prompt: '%s'", prompt)
         
         # Generate a simple image without reference
-        image_data = generate_shot_image(
+        image_result = generate_shot_image(
             prompt=prompt,
             model_name="runwayml/stable-diffusion-v1-5"
         )
+        await image_result.encode_async()
         
         return {
             "success": True,
-            "image_url": image_data,
+            "image_url": image_result.to_data_url(),
             "prompt_used": prompt,
             "message": "Test image generation successful"
         }
         
     except Exception as e:
-        logger.error(f"Test image generation failed: {str(e)}")
+        logger.error("Test image generation failed: %s", e)
         return {
             "success": False,
             "error": str(e),
@@ -1709,6 +1803,7 @@ async def advanced_reference_matching(
     strength: float = Form(0.6),  # Even lower for better preservation
     guidance_scale: float = Form(12.0),  # Higher for better prompt following
     num_inference_steps: int = Form(80),  # More steps for better quality
+    response_mode: str = Form(IMAGE_RESPONSE_MODE),  # "base64" or "url"
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -1727,9 +1822,9 @@ async def advanced_reference_matching(
         Base64 encoded generated image
     """
     try:
-        logger.info(f"Advanced reference matching request from user {current_user['username']}")
-        logger.info(f"Matching type: {matching_type}")
-        logger.info(f"Number of reference images: {len(reference_images)}")
+        logger.info("Advanced reference matching request from user %s", current_user['username'])
+        logger.info("Matching type: %s", matching_type)
+        logger.info("Number of reference images: %s", len(reference_images))
         
         # Validate inputs
         if len(reference_images) < 1:
@@ -1764,10 +1859,10 @@ async def advanced_reference_matching(
                     )
                 
                 processed_images.append(image)
-                logger.info(f"Processed image {i+1}: {uploaded_file.filename}")
+                logger.info("Processed image %s: %s", i+1, uploaded_file.filename)
                 
             except Exception as e:
-                logger.error(f"Error processing image {uploaded_file.filename}: {str(e)}")
+                logger.error("Error processing image %s: %s", uploaded_file.filename, e)
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail=f"Error processing image {uploaded_file.filename}: {str(e)}"
@@ -1810,10 +1905,11 @@ async def advanced_reference_matching(
                 num_inference_steps=num_inference_steps
             )
         
-        logger.info(f"Advanced {matching_type} matching completed successfully")
+        image_payload = await build_image_payload(generated_image, "image_url", response_mode)
+        logger.info("Advanced %s matching completed successfully", matching_type)
         
         return {
-            "image_url": generated_image,
+            **image_payload,
             "matching_type": matching_type,
             "prompt_used": prompt,
             "processing_info": {
@@ -1827,7 +1923,7 @@ async def advanced_reference_matching(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error in advanced reference matching: {str(e)}", exc_info=True)
+        logger.error("Error in advanced reference matching: %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to generate advanced reference matching: {str(e)}"
@@ -1840,6 +1936,7 @@ async def multi_view_fusion(
     strength: float = Form(0.55),  # Balanced for consistency and prompt following
     guidance_scale: float = Form(16.0),  # Strong guidance
     num_inference_steps: int = Form(80),  # Good quality
+    response_mode: str = Form(IMAGE_RESPONSE_MODE),  # "base64" or "url"
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -1853,9 +1950,9 @@ async def multi_view_fusion(
     Works best with 2-4 reference images showing different angles of the same subject.
     """
     try:
-        logger.info(f"Multi-view fusion request from user {current_user['username']}")
-        logger.info(f"Prompt: {prompt}")
-        logger.info(f"Number of reference images: {len(files)}")
+        logger.info("Multi-view fusion request from user %s", current_user['username'])
+        logger.debug("Prompt: %s", prompt)
+        logger.info("Number of reference images: %s", len(files))
         
         # Validate inputs
         if len(files) < 1:
@@ -1899,10 +1996,10 @@ async def multi_view_fusion(
                     )
                 
                 processed_images.append(image)
-                logger.info(f"Processed reference image {i+1}: {uploaded_file.filename}")
+                logger.info("Processed reference image %s: %s", i+1, uploaded_file.filename)
                 
             except Exception as e:
-                logger.error(f"Error processing image {uploaded_file.filename}: {str(e)}")
+                logger.error("Error processing image %s: %s", uploaded_file.filename, e)
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail=f"Error processing image {uploaded_file.filename}: {str(e)}"
@@ -1919,10 +2016,11 @@ async def multi_view_fusion(
             num_inference_steps=num_inference_steps
         )
         
+        image_payload = await build_image_payload(generated_image, "image", response_mode)
         logger.info("Multi-view fusion generation completed successfully")
         
         return {
-            "image": generated_image,
+            **image_payload,
             "message": "Multi-view fusion generated successfully",
             "processing_info": {
                 "device": "cuda" if torch.cuda.is_available() else "cpu",
@@ -1937,7 +2035,7 @@ async def multi_view_fusion(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error in multi-view fusion: {str(e)}", exc_info=True)
+        logger.error("Error in multi-view fusion: %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to generate multi-view fusion: {str(e)}"
@@ -1950,6 +2048,7 @@ async def enhanced_fusion(
     strength: float = Form(0.55),
     guidance_scale: float = Form(12.0),
     num_inference_steps: int = Form(70),
+    response_mode: str = Form(IMAGE_RESPONSE_MODE),  # "base64" or "url"
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -1963,9 +2062,9 @@ async def enhanced_fusion(
     This approach significantly improves theme and character consistency compared to traditional methods.
     """
     try:
-        logger.info(f"Enhanced fusion request from user {current_user['username']}")
-        logger.info(f"Prompt: {prompt}")
-        logger.info(f"Number of reference images: {len(files)}")
+        logger.info("Enhanced fusion request from user %s", current_user['username'])
+        logger.debug("Prompt: %s", prompt)
+        logger.info("Number of reference images: %s", len(files))
         
         # Validate inputs
         if len(files) < 1:
@@ -2024,10 +2123,10 @@ async def enhanced_fusion(
                     )
                 
                 processed_images.append(image)
-                logger.info(f"Processed reference image {i+1}: {uploaded_file.filename}")
+                logger.info("Processed reference image %s: %s", i+1, uploaded_file.filename)
                 
             except Exception as e:
-                logger.error(f"Error processing image {uploaded_file.filename}: {str(e)}")
+                logger.error("Error processing image %s: %s", uploaded_file.filename, e)
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail=f"Error processing image {uploaded_file.filename}: {str(e)}"
@@ -2044,10 +2143,11 @@ async def enhanced_fusion(
             num_inference_steps=num_inference_steps
         )
         
+        image_payload = await build_image_payload(generated_image, "image", response_mode)
         logger.info("Enhanced fusion generation completed successfully")
         
         return {
-            "image": generated_image,
+            **image_payload,
             "message": "Enhanced fusion generated successfully using image-to-text-to-image approach",
             "processing_info": {
                 "device": "cuda" if torch.cuda.is_available() else "cpu",
@@ -2063,7 +2163,7 @@ async def enhanced_fusion(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error in enhanced fusion: {str(e)}", exc_info=True)
+        logger.error("Error in enhanced fusion: %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to generate enhanced fusion: {str(e)}"
@@ -2081,8 +2181,8 @@ async def analyze_images(
     Also stores reference image metadata and analysis in input.json if project_id and session_id are provided.
     """
     try:
-        logger.info(f"Image analysis request from user {current_user['username']}")
-        logger.info(f"Number of images to analyze: {len(files)}")
+        logger.info("Image analysis request from user %s", current_user['username'])
+        logger.info("Number of images to analyze: %s", len(files))
         # Validate inputs
         if len(files) < 1:
             raise HTTPException(
@@ -2136,10 +2236,10 @@ async def analyze_images(
                     })
                     continue
                 # Extract detailed description using AI vision
-                logger.info(f"Analyzing image {i+1}: {uploaded_file.filename}")
+                logger.info("Analyzing image %s: %s", i+1, uploaded_file.filename)
                 description = extract_detailed_image_description(image)
                 # Also get basic technical analysis
-                basic_analysis = analyze_reference_images([image])
+                basic_analysis = analyze_reference_images_batch([image])
                 image_analyses.append({
                     "filename": uploaded_file.filename,
                     "status": "success",
@@ -2159,9 +2259,9 @@ async def analyze_images(
                     "content_type": uploaded_file.content_type,
                     # Optionally, save a base64 preview or a relative URL if saved to disk
                 })
-                logger.info(f"Successfully analyzed image {i+1}: {uploaded_file.filename}")
+                logger.info("Successfully analyzed image %s: %s", i+1, uploaded_file.filename)
             except Exception as e:
-                logger.error(f"Error analyzing image {uploaded_file.filename}: {str(e)}")
+                logger.error("Error analyzing image %s: %s", uploaded_file.filename, e)
                 image_analyses.append({
                     "filename": uploaded_file.filename,
                     "status": "error",
@@ -2172,26 +2272,23 @@ async def analyze_images(
         if project_id and session_id:
             try:
                 from db import PROJECT_IMAGES_ROOT
-                session_folder = os.path.join(PROJECT_IMAGES_ROOT, project_id, session_id)
-                input_file = os.path.join(session_folder, "input.json")
-                # Load existing input.json if present
-                input_data = {}
-                if os.path.exists(input_file):
-                    with open(input_file, "r", encoding="utf-8") as f:
-                        input_data = json.load(f)
-                # Store reference images and analyses
-                input_data["reference_images"] = reference_images_metadata
-                input_data["reference_image_analyses"] = image_analyses
-                with open(input_file, "w", encoding="utf-8") as f:
-                    json.dump(input_data, f, indent=2)
-                logger.info(f"Saved reference image metadata and analyses to {input_file}")
+                session_folder = await run_in_threadpool(
+                    ensure_session_folder, os.path.join(PROJECT_IMAGES_ROOT, project_id, session_id)
+                )
+                # Store reference images and analyses, keeping whatever else input.json holds
+                await run_in_threadpool(update_json_file, session_folder, "input.json", lambda input_data: input_data.update({
+                    "reference_images": reference_images_metadata,
+                    "reference_image_analyses": image_analyses
+                }))
+                logger.info("Saved reference image metadata and analyses to %s", session_folder)
+                await catalog_session(project_id, session_id)
             except Exception as e:
-                logger.error(f"Failed to save reference image metadata/analyses to input.json: {e}")
+                logger.error("Failed to save reference image metadata/analyses to input.json: %s", e)
                 # Don't fail the whole endpoint, but log
 
         # Count successful analyses
         successful_analyses = len([a for a in image_analyses if a["status"] == "success"])
-        logger.info(f"Image analysis completed: {successful_analyses}/{len(files)} successful")
+        logger.info("Image analysis completed: %s/%s successful", successful_analyses, len(files))
         return {
             "analyses": image_analyses,
             "summary": {
@@ -2204,7 +2301,7 @@ async def analyze_images(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error in image analysis: {str(e)}", exc_info=True)
+        logger.error("Error in image analysis: %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to analyze images: {str(e)}"
@@ -2246,33 +2343,236 @@ def cleanup():
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on FastAPI shutdown"""
+    stop_background_collector()
+    stop_usage_reconciler()
+    shutdown_db_executors()
+    shutdown_password_pool()
     close_db_connection()
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize database on startup"""
     init_db()
+    # Reclaims orphaned files and rows when STORAGE_GC_INTERVAL is set
+    start_background_collector()
+    start_usage_reconciler()
+
+# Content-addressed files never change; everything else is revalidated with its ETag
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+CONTENT_ADDRESSED_NAME = re.compile(r"^[0-9a-f]{64}\.(png|webp|jpg)$")
+
+async def build_image_payload(image_result, base64_key: str, response_mode: str) -> dict:
+    """
+    Response fields for a generated image: inline base64 under base64_key, or with
+    response_mode="url" a link to the persisted, content-addressed file.
+    """
+    await image_result.encode_async()
+    if response_mode == "url":
+        relative_path = await run_in_threadpool(image_result.persist)
+        return {
+            "image_url": f"{BACKEND_HOST}/generated-images/{relative_path}",
+            "image_mime_type": image_result.mime_type
+        }
+    return {base64_key: image_result.to_base64(), "image_mime_type": image_result.mime_type}
+
+def _parse_byte_range(range_header: str, file_size: int):
+    """
+    Parse a single "bytes=start-end" range. Returns (start, end) inclusive, None to
+    ignore the header (malformed, start > end, or multi-range) or False if it cannot
+    be satisfied (starts at or past the end of the file).
+    """
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+    start_text, _, end_text = ranges.strip().partition("-")
+    try:
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) if end_text else file_size - 1
+            if end_text and end < start:
+                return None  # Invalid per RFC 9110, so the header is ignored and the whole file is sent
+        else:
+            # Suffix range: the last N bytes
+            suffix_length = int(end_text)
+            if suffix_length == 0:
+                return False
+            start = max(file_size - suffix_length, 0)
+            end = file_size - 1
+    except ValueError:
+        return None
+    if start >= file_size:
+        return False
+    return start, min(end, file_size - 1)
+
+def _read_byte_range(file_path: str, start: int, end: int) -> bytes:
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start + 1)
+
+async def _serve_content(request: Request, etag: str, mtime: float, size: int, media_type: str,
+                         immutable: bool, read_range, full_response):
+    """
+    ETag/Last-Modified validation, Cache-Control and single Range requests for
+    content of a known size. read_range(start, end) returns those bytes and
+    full_response(headers) builds the 200 response.
+    """
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(mtime, usegmt=True),
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+        "Accept-Ranges": "bytes"
+    }
+
+    # Conditional GET: If-None-Match takes precedence over If-Modified-Since
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+    elif request.headers.get("if-modified-since"):
+        try:
+            if int(mtime) <= parsedate_to_datetime(request.headers["if-modified-since"]).timestamp():
+                return Response(status_code=304, headers=headers)
+        except (TypeError, ValueError):
+            pass
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == etag):
+        byte_range = _parse_byte_range(range_header, size)
+        if byte_range is False:
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+        if byte_range is not None:
+            start, end = byte_range
+            content = await run_in_threadpool(read_range, start, end)
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            return Response(content=content, status_code=206, headers=headers, media_type=media_type)
+
+    return await full_response(headers)
+
+async def serve_image_file(request: Request, file_path: str, immutable: bool = False, media_type: str = None):
+    """
+    Serve a file with ETag/Last-Modified validation, Cache-Control and single Range
+    requests. Returns None if the file does not exist.
+    """
+    media_type = media_type or mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+    try:
+        stat_result = await run_in_threadpool(os.stat, file_path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    if not stat.S_ISREG(stat_result.st_mode):
+        return None
+
+    if immutable:
+        etag = f'"{os.path.splitext(os.path.basename(file_path))[0]}"'
+    else:
+        etag = f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+
+    async def full_response(headers):
+        return FileResponse(file_path, headers=headers, stat_result=stat_result, media_type=media_type)
+
+    return await _serve_content(
+        request, etag, stat_result.st_mtime, stat_result.st_size, media_type, immutable,
+        functools.partial(_read_byte_range, file_path), full_response
+    )
+
+async def serve_archived_file(request: Request, session_folder: str, member_name: str):
+    """
+    Serve one file of an archived session straight from its bundle, with the
+    same caching and Range support. Returns None if it is not in a bundle.
+    """
+    member = await run_in_threadpool(member_info, session_folder, member_name)
+    if member is None:
+        return None
+    media_type = mimetypes.guess_type(member_name)[0] or "application/octet-stream"
+    bundle_mtime = (await run_in_threadpool(os.stat, bundle_path(session_folder))).st_mtime
+    # The CRC identifies the content across re-archiving, unlike the bundle mtime
+    etag = f'"{member.size:x}-{member.crc:x}"'
+
+    async def full_response(headers):
+        content = await run_in_threadpool(read_member, session_folder, member_name)
+        return Response(content=content, headers=headers, media_type=media_type)
+
+    return await _serve_content(
+        request, etag, bundle_mtime, member.size, media_type, False,
+        functools.partial(read_member, session_folder, member_name), full_response
+    )
+
+@app.get("/generated-images/{shard}/{filename}")
+async def get_generated_image(shard: str, filename: str, request: Request):
+    """Serve a content-addressed generated image; these never change, so cache forever."""
+    from image_result import GENERATED_IMAGES_ROOT
+    if not CONTENT_ADDRESSED_NAME.match(filename) or filename[:2] != shard:
+        return JSONResponse(status_code=404, content={"detail": f"Image not found: {filename}"})
+    response = await serve_image_file(request, os.path.join(GENERATED_IMAGES_ROOT, shard, filename), immutable=True)
+    if response is None:
+        return JSONResponse(status_code=404, content={"detail": f"Image not found: {filename}"})
+    return response
+
+@app.get("/blobs/{name}")
+async def get_blob_image(name: str, request: Request):
+    """Serve a blob-store image referenced by shots.image_url or shot_versions.image_url."""
+    match = CONTENT_ADDRESSED_NAME.match(name)
+    if not match:
+        return JSONResponse(status_code=404, content={"detail": f"Image not found: {name}"})
+    digest = name.split(".")[0]
+    media_type = mimetypes.guess_type(name)[0]
+    response = await serve_image_file(request, blob_path(digest), immutable=True, media_type=media_type)
+    if response is None:
+        return JSONResponse(status_code=404, content={"detail": f"Image not found: {name}"})
+    return response
 
 @app.get("/projects/{project_id}/sessions/{session_id}/images/{filename}")
-async def get_session_image(project_id: str, session_id: str, filename: str):
+async def get_session_image(project_id: str, session_id: str, filename: str, request: Request):
     """
-    Serve an image file from the session's images directory with error logging.
+    Serve an image file from the session's images directory with caching headers.
     """
-    import os
-    from fastapi.responses import FileResponse
     from db import PROJECT_IMAGES_ROOT
-    images_dir = os.path.join(PROJECT_IMAGES_ROOT, project_id, session_id, "images")
-    file_path = os.path.join(images_dir, filename)
-    logger.info(f"Image requested: {file_path}")
-    if not os.path.exists(file_path):
-        logger.warning(f"Image not found: {file_path}")
-        return JSONResponse(status_code=404, content={"detail": f"Image not found: {filename}"})
+    session_folder = os.path.join(PROJECT_IMAGES_ROOT, project_id, session_id)
+    file_path = os.path.join(session_folder, "images", filename)
     try:
-        return FileResponse(file_path)
+        response = await serve_image_file(request, file_path)
+        if response is None and "/" not in filename:
+            # Archived sessions are served from their bundle without unpacking it
+            response = await serve_archived_file(request, session_folder, f"images/{filename}")
     except Exception as e:
-        logger.error(f"Failed to serve image {file_path}: {str(e)}")
+        logger.error("Failed to serve image %s: %s", file_path, e)
         return JSONResponse(status_code=500, content={"detail": f"Failed to serve image: {str(e)}"})
+    if response is None:
+        logger.warning("Image not found: %s", file_path)
+        return JSONResponse(status_code=404, content={"detail": f"Image not found: {filename}"})
+    return response
     
+@app.get("/projects/{project_id}/sessions/{session_id}/thumbnails/{size}/{filename}")
+async def get_session_thumbnail(project_id: str, session_id: str, size: int, filename: str, request: Request):
+    """
+    Serve a WebP thumbnail of a session image, generating the pyramid on first
+    request for images saved before thumbnails existed.
+    """
+    from db import PROJECT_IMAGES_ROOT
+    if size not in THUMBNAIL_SIZES:
+        return JSONResponse(status_code=404, content={"detail": f"Unsupported thumbnail size: {size}"})
+    session_folder = os.path.join(PROJECT_IMAGES_ROOT, project_id, session_id)
+    images_dir = os.path.join(session_folder, "images")
+    try:
+        thumb_path = await run_in_threadpool(ensure_thumbnail, images_dir, filename, size)
+        response = await serve_image_file(request, thumb_path) if thumb_path else None
+        source_member = f"images/{filename}"
+        if response is None and "/" not in filename and await run_in_threadpool(member_info, session_folder, source_member):
+            # Bundles carry the thumbnail pyramid, generated before archiving; older ones under the legacy name
+            for member_path in (thumbnail_path, legacy_thumbnail_path):
+                thumb_member = os.path.relpath(member_path(images_dir, filename, size), session_folder).replace(os.sep, "/")
+                response = await serve_archived_file(request, session_folder, thumb_member)
+                if response is not None:
+                    break
+    except Exception as e:
+        logger.error("Failed to serve thumbnail for %s: %s", filename, e)
+        return JSONResponse(status_code=500, content={"detail": f"Failed to serve thumbnail: {str(e)}"})
+    if response is None:
+        return JSONResponse(status_code=404, content={"detail": f"Image not found: {filename}"})
+    return response
+
 @app.post("/projects/{project_id}/fusion/start-session")
 async def start_fusion_session(project_id: str, current_user: dict = Depends(get_current_user)):
     """
@@ -2300,7 +2600,8 @@ async def start_fusion_session(project_id: str, current_user: dict = Depends(get
         }
         with open(input_file, "w", encoding="utf-8") as f:
             json.dump(input_data, f, indent=2)
-        logger.info(f"Created new fusion session: {session_id} for project {project_id}")
+        await record_session_usage(project_id, session_id)
+        logger.info("Created new fusion session: %s for project %s", session_id, project_id)
         return {
             "session_id": session_id,
             "session_folder": session_folder,
@@ -2309,5 +2610,5 @@ async def start_fusion_session(project_id: str, current_user: dict = Depends(get
             "input_data": input_data
         }
     except Exception as e:
-        logger.error(f"Failed to create fusion session: {str(e)}")
+        logger.error("Failed to create fusion session: %s", e)
         return JSONResponse(status_code=500, content={"detail": f"Failed to create fusion session: {str(e)}"})
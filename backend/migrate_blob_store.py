@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Move base64 shot_images.image_data and data-URL shots/shot_versions.image_url
+values into the content-addressed blob store.
+Safe to run while the server is up and safe to interrupt and rerun.
+
+Usage: python migrate_blob_store.py [batch_size]
+"""
+import sys
+
+from db import migrate_shot_images_to_blob_store, migrate_inline_image_urls, get_db_connection
+
+if __name__ == "__main__":
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    moved = migrate_shot_images_to_blob_store(batch_size=batch_size)
+    moved_urls = migrate_inline_image_urls(batch_size=batch_size)
+    with get_db_connection() as conn:
+        remaining = conn.execute("SELECT COUNT(*) FROM shot_images WHERE blob_hash IS NULL").fetchone()[0]
+        remaining += conn.execute("SELECT COUNT(*) FROM shots WHERE image_url LIKE 'data:image%'").fetchone()[0]
+        remaining += conn.execute("SELECT COUNT(*) FROM shot_versions WHERE image_url LIKE 'data:image%'").fetchone()[0]
+    print(f"✅ Moved {moved} shot_images row(s) to the blob store")
+    print(f"✅ Moved inline image URLs: {moved_urls['shots']} shot(s), {moved_urls['shot_versions']} version(s)")
+    print(f"📊 {remaining} row(s) still hold inline image data")
+    if remaining == 0:
+        print("📊 Run VACUUM during a quiet period to return the freed pages to the filesystem")
@@ -12,11 +12,12 @@ import os
 import json
 import base64
 from io import BytesIO
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import requests
 from fastapi import HTTPException
 from dotenv import load_dotenv
 import logging
+from logging_setup import setup_logging
 import time
 import backoff
 from collections import deque
@@ -27,6 +28,7 @@ from datetime import datetime, timedelta
 import aiosqlite
 import colorsys
 from transformers import AutoTokenizer
+from image_result import ImageResult
 try:
     import cv2
 except ImportError:
@@ -52,8 +54,8 @@ except ImportError:
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Configure logging (queue-based; levels from LOG_LEVEL / LOG_LEVELS)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # Add this helper at the top if not already present
@@ -71,7 +73,7 @@ def translate_to_english(text):
         result = translator.translate(text, src='te', dest='en')
         return result.text
     except Exception as e:
-        logger.warning(f"Translation failed: {e}")
+        logger.warning("Translation failed: %s", e)
         return text
 
 class RateLimiter:
@@ -108,7 +110,7 @@ class RateLimiter:
                 """)
                 conn.commit()
         except Exception as e:
-            logger.error(f"Error initializing cache database: {e}")
+            logger.error("Error initializing cache database: %s", e)
 
     async def _get_cache_key(self, scene_description: str, num_shots: int) -> str:
         """Generate a cache key for the request"""
@@ -128,7 +130,7 @@ class RateLimiter:
                         logger.debug("Cache hit")
                         return json.loads(row[0])
         except Exception as e:
-            logger.error(f"Error checking cache: {e}")
+            logger.error("Error checking cache: %s", e)
         return None
 
     async def _update_cache(self, cache_key: str, result: List[Dict[str, Any]]):
@@ -141,7 +143,7 @@ class RateLimiter:
                 )
                 await db.commit()
         except Exception as e:
-            logger.error(f"Error updating cache: {e}")
+            logger.error("Error updating cache: %s", e)
 
     def _wait_if_needed(self):
         """Check rate limits and wait if necessary"""
@@ -158,14 +160,14 @@ class RateLimiter:
             if len(self.minute_requests) >= self.requests_per_minute * 0.8:  # 80% threshold
                 wait_time = 60 - (now - self.minute_requests[0])
                 if wait_time > 0:
-                    logger.warning(f"Approaching minute rate limit. Waiting {wait_time:.2f} seconds")
+                    logger.warning("Approaching minute rate limit. Waiting %.2f seconds", wait_time)
                     time.sleep(wait_time)
 
             # Check daily limit with buffer
             if len(self.daily_requests) >= self.requests_per_day * 0.8:  # 80% threshold
                 wait_time = 86400 - (now - self.daily_requests[0])
                 if wait_time > 0:
-                    logger.warning(f"Approaching daily rate limit. Waiting {wait_time:.2f} seconds")
+                    logger.warning("Approaching daily rate limit. Waiting %.2f seconds", wait_time)
                     time.sleep(wait_time)
 
             # Add current request
@@ -197,7 +199,7 @@ class RateLimiter:
                     if "quota" in str(e).lower():
                         retry_match = re.search(r'retry_delay\s*{\s*seconds:\s*(\d+)\s*}', str(e))
                         retry_seconds = int(retry_match.group(1)) if retry_match else retry_delay
-                        logger.warning(f"Rate limit hit (attempt {attempt + 1}/{max_retries}). Waiting {retry_seconds} seconds")
+                        logger.warning("Rate limit hit (attempt %s/%s). Waiting %s seconds", attempt + 1, max_retries, retry_seconds)
                         time.sleep(retry_seconds)
                         retry_delay *= 2  # Exponential backoff
                         if attempt == max_retries - 1: 
@@ -306,7 +308,7 @@ def initialize_models():
         logger.info("All models initialized successfully.")
         return True
     except Exception as e:
-        logger.error(f"Error initializing models: {str(e)}", exc_info=True)
+        logger.error("Error initializing models: %s", e, exc_info=True)
         return False
 
 def detect_language(text: str) -> str:
@@ -416,7 +418,7 @@ async def gemini(scene_description: str, num_shots: int = 5) -> List[Dict[str, A
         return shots
 
     except Exception as e:
-        logger.error(f"Error in gemini shot generation: {str(e)}")
+        logger.error("Error in gemini shot generation: %s", e)
         if "quota" in str(e).lower():
             raise HTTPException(
                 status_code=429,
@@ -536,12 +538,12 @@ def generate_shot_image(
     negative_prompt: str = "blurry, low quality, distorted, deformed",
     num_inference_steps: int = 30,
     guidance_scale: float = 7.5
-) -> str:
+) -> ImageResult:
     """Generate an image based on the shot description"""
     try:
         # Clean the prompt to remove 'camera' mentions
         prompt = clean_shot_description(prompt)
-        logger.info(f"Starting image generation for prompt: '{prompt}' with model: {model_name}")
+        logger.debug("Starting image generation for prompt: '%s' with model: %s", prompt, model_name)
         
         # Check if model is initialized
         if pipe is None:
@@ -554,7 +556,7 @@ def generate_shot_image(
         
         # Prepare the prompt
         full_prompt = f"cinematic shot, professional photography, {prompt}"
-        logger.info(f"Using full prompt: '{full_prompt}'")
+        logger.debug("Using full prompt: '%s'", full_prompt)
         
         if reference_image:
             logger.info("Using reference image with ControlNet")
@@ -589,7 +591,7 @@ def generate_shot_image(
                     guidance_scale=guidance_scale
                 ).images[0]
             except Exception as img_error:
-                logger.error(f"Error processing reference image: {str(img_error)}")
+                logger.error("Error processing reference image: %s", img_error)
                 raise
         else:
             # Generate image without reference
@@ -603,27 +605,16 @@ def generate_shot_image(
                 ).images[0]
                 logger.info("Image generation successful")
             except Exception as pipe_error:
-                logger.error(f"Error in diffusion pipeline: {str(pipe_error)}")
+                logger.error("Error in diffusion pipeline: %s", pipe_error)
                 raise
         
-        # Convert image to base64
-        try:
-            logger.info("Converting image to base64")
-            buffered = BytesIO()
-            image.save(buffered, format="PNG")
-            img_str = base64.b64encode(buffered.getvalue()).decode()
-            logger.info("Image conversion successful")
-            
-            # Return the base64 string
-            return f"data:image/png;base64,{img_str}"
-        except Exception as conv_error:
-            logger.error(f"Error converting image to base64: {str(conv_error)}")
-            raise
+        # Encoding is deferred to the caller, which writes and returns the same bytes
+        return ImageResult(image)
     
     except Exception as e:
         import traceback
         error_trace = traceback.format_exc()
-        logger.error(f"Error generating image: {str(e)}\nTraceback: {error_trace}")
+        logger.error("Error generating image: %s\nTraceback: %s", e, error_trace)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to generate image: {str(e)}"
@@ -681,7 +672,7 @@ def smart_parameter_tuning(
     """
     try:
         # Analyze reference images
-        analysis = analyze_reference_images(reference_images)
+        analysis = analyze_reference_images_batch(reference_images)
         
         # Start with base parameters
         strength = base_strength
@@ -731,7 +722,7 @@ def smart_parameter_tuning(
                 # Bright images can use lower guidance
                 guidance_scale = max(guidance_scale - 0.5, 8.0)
         
-        logger.info(f"Smart parameter tuning: strength={strength:.2f}, guidance={guidance_scale:.2f}, steps={num_inference_steps}")
+        logger.info("Smart parameter tuning: strength=%.2f, guidance=%.2f, steps=%s", strength, guidance_scale, num_inference_steps)
         
         return {
             "strength": strength,
@@ -740,7 +731,7 @@ def smart_parameter_tuning(
         }
         
     except Exception as e:
-        logger.warning(f"Smart parameter tuning failed, using defaults: {str(e)}")
+        logger.warning("Smart parameter tuning failed, using defaults: %s", e)
         return {
             "strength": base_strength,
             "guidance_scale": base_guidance,
@@ -755,7 +746,7 @@ def generate_fusion_image(
     num_inference_steps: int = 50,
     guidance_scale: float = 8.5,
     strength: float = 0.8
-) -> str:
+) -> ImageResult:
     """
     Generate a single image that fuses multiple reference images with a user prompt,
     preserving the complete theme, props, and visual elements while generating new angles.
@@ -770,14 +761,14 @@ def generate_fusion_image(
         strength: How much to blend the reference images (0.0-1.0)
     
     Returns:
-        Base64 encoded image string
+        ImageResult holding the generated image; encode() gives the file bytes
     """
     try:
-        logger.info(f"Starting enhanced fusion image generation with {len(reference_images)} reference images")
+        logger.info("Starting enhanced fusion image generation with %s reference images", len(reference_images))
         
         # Check for GPU availability
         device = "cuda" if torch.cuda.is_available() else "cpu"
-        logger.info(f"Using device: {device}")
+        logger.info("Using device: %s", device)
         
         # Initialize the pipeline
         if device == "cuda":
@@ -792,59 +783,14 @@ def generate_fusion_image(
                 torch_dtype=torch.float32
             ).to(device)
         
-        # Process reference images
-        processed_images = []
-        for i, img in enumerate(reference_images):
-            # Convert to RGB if necessary
-            if img.mode != "RGB":
-                img = img.convert("RGB")
-            
-            # Resize to a consistent size (512x512 for processing)
-            img = img.resize((512, 512), Image.Resampling.LANCZOS)
-            processed_images.append(img)
+        # Resize all references to 512x512 and stack them for the compositor
+        reference_stack = _stack_images(reference_images, COMPOSITE_RESOLUTION, Image.Resampling.LANCZOS)
+        processed_images = [Image.fromarray(img) for img in reference_stack]
         
-        # Create a better blended reference image that preserves more detail
+        # Use the first image as the primary base and blend in structurally similar references
+        primary_reference, composite_info = composite_references(reference_stack, mode="edge_gated")
         if len(processed_images) > 1:
-            # Use the first image as the primary base and selectively blend others
-            primary_reference = processed_images[0]
-            
-            # For multiple images, create a composite that preserves the primary theme
-            # but incorporates elements from other images
-            for i, img in enumerate(processed_images[1:], 1):
-                try:
-                    # Use a lower weight for additional images to avoid theme dilution
-                    weight = 0.3 / i  # Decreasing weight for each additional image
-                    
-                    # Convert to arrays for blending
-                    primary_array = np.array(primary_reference, dtype=np.float32)
-                    blend_array = np.array(img, dtype=np.float32)
-                    
-                    # Blend only if the images are similar in structure (edge-based similarity)
-                    primary_gray = np.array(primary_reference.convert('L'), dtype=np.uint8)
-                    blend_gray = np.array(img.convert('L'), dtype=np.uint8)
-                    
-                    primary_edges = cv2.Canny(primary_gray, 50, 150)
-                    blend_edges = cv2.Canny(blend_gray, 50, 150)
-                    
-                    # Calculate edge similarity - ensure both arrays are boolean or uint8
-                    primary_edges_bool = primary_edges > 0
-                    blend_edges_bool = blend_edges > 0
-                    
-                    # Calculate edge similarity using proper boolean operations
-                    intersection = np.sum(primary_edges_bool & blend_edges_bool)
-                    union = np.sum(primary_edges_bool | blend_edges_bool)
-                    edge_similarity = intersection / (union + 1e-6)
-                    
-                    # Only blend if images are structurally similar
-                    if edge_similarity > 0.1:
-                        blended_array = primary_array * (1 - weight) + blend_array * weight
-                        primary_reference = Image.fromarray(np.clip(blended_array, 0, 255).astype(np.uint8))
-                    
-                except Exception as blend_error:
-                    logger.warning(f"Failed to blend image {i+1}: {str(blend_error)}, skipping blend")
-                    continue
-        else:
-            primary_reference = processed_images[0]
+            logger.info("Reference edge IoU: %s, blended: %s", composite_info['edge_iou'], composite_info['blended'])
         
         # NEW APPROACH: Extract detailed text descriptions from all reference images
         logger.info("Extracting detailed descriptions from reference images...")
@@ -853,9 +799,9 @@ def generate_fusion_image(
             try:
                 description = extract_detailed_image_description(img)
                 image_descriptions.append(description)
-                logger.info(f"Extracted description for image {i+1}: {description[:100]}...")
+                logger.debug("Extracted description for image %s: %s...", i+1, description[:100])
             except Exception as e:
-                logger.warning(f"Failed to extract description for image {i+1}: {str(e)}")
+                logger.warning("Failed to extract description for image %s: %s", i+1, e)
                 # Fallback to traditional analysis for this image
                 fallback_desc = _fallback_image_analysis(img)
                 image_descriptions.append(fallback_desc)
@@ -867,11 +813,11 @@ def generate_fusion_image(
         # Generate enhanced negative prompt based on descriptions
         enhanced_negative_prompt = generate_enhanced_negative_prompt(image_descriptions, negative_prompt)
         
-        logger.info(f"Enhanced prompt: {enhanced_prompt[:200]}...")
-        logger.info(f"Enhanced negative: {enhanced_negative_prompt[:200]}...")
+        logger.debug("Enhanced prompt: %s...", enhanced_prompt[:200])
+        logger.debug("Enhanced negative: %s...", enhanced_negative_prompt[:200])
         
         # Also run traditional analysis as backup for parameter optimization
-        analysis = analyze_reference_images(processed_images)
+        analysis = analyze_reference_images_batch(processed_images)
         
         # The enhanced_prompt was already created by merge_image_descriptions_with_prompt above
         # No need for additional prompt enhancement since the detailed descriptions already contain
@@ -887,15 +833,15 @@ def generate_fusion_image(
         
         # Log any warnings or adjustments
         for warning in validation["warnings"]:
-            logger.warning(f"Parameter adjustment: {warning}")
+            logger.warning("Parameter adjustment: %s", warning)
         
         # Ensure strength is within reasonable bounds
         optimal_strength = max(min(optimal_strength, 0.8), 0.45)  # Allow sufficient variation for prompt following
         
         # Generate the fused image with optimized parameters
-        logger.info(f"Generating fused image with enhanced theme preservation... (strength: {optimal_strength}, guidance: {optimal_guidance}, steps: {optimal_steps})")
+        logger.info("Generating fused image with enhanced theme preservation... (strength: %s, guidance: %s, steps: %s)", optimal_strength, optimal_guidance, optimal_steps)
         # --- Telugu-to-English translation for enhanced_prompt ---
-        logger.info(f"Prompt before translation: {enhanced_prompt}")
+        logger.debug("Prompt before translation: %s", enhanced_prompt)
         try:
             lang = detect(enhanced_prompt)
         except Exception:
@@ -903,7 +849,7 @@ def generate_fusion_image(
         if lang == "te":
             logger.info("Translating Telugu prompt to English for fusion image generation.")
             enhanced_prompt = translate_to_english(enhanced_prompt)
-        logger.info(f"Prompt after translation: {enhanced_prompt}")
+        logger.debug("Prompt after translation: %s", enhanced_prompt)
         # --- End translation logic ---
         result = pipe(
             prompt=enhanced_prompt,
@@ -918,16 +864,13 @@ def generate_fusion_image(
         # Get the generated image
         generated_image = result.images[0]
         
-        # Convert to base64
-        buffered = BytesIO()
-        generated_image.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
+        image_result = ImageResult(generated_image)
         
         logger.info("Enhanced fusion image generation completed successfully")
-        return img_str
+        return image_result
         
     except Exception as e:
-        logger.error(f"Error in enhanced fusion image generation: {str(e)}")
+        logger.error("Error in enhanced fusion image generation: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to generate fusion image: {str(e)}"
@@ -1040,7 +983,7 @@ def analyze_reference_images(images: List[Image.Image]) -> Dict[str, Any]:
         return analysis
     
     except Exception as e:
-        logger.error(f"Error analyzing reference images: {str(e)}")
+        logger.error("Error analyzing reference images: %s", e)
         # Return default analysis on error
         return {
             "color_palettes": ["balanced"],
@@ -1054,6 +997,173 @@ def analyze_reference_images(images: List[Image.Image]) -> Dict[str, Any]:
             "visual_style": "balanced"
         }
 
+# Side length of the square grid used by the batched analysis. Canny and the
+# brightness mean run at this size, so cost no longer grows with upload size.
+ANALYSIS_RESOLUTION = 256
+# Matches the 50x50 thumbnail the per-image analysis uses for colour counting
+COLOR_SAMPLE_SIZE = 50
+
+def _stack_images(
+    images: List[Image.Image],
+    size: int,
+    resample: Image.Resampling = Image.Resampling.BILINEAR
+) -> np.ndarray:
+    """Resize every image to size x size RGB and stack them into one (N, size, size, 3) uint8 array"""
+    stack = np.empty((len(images), size, size, 3), dtype=np.uint8)
+    for i, img in enumerate(images):
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        if img.size != (size, size):
+            # reducing_gap lets PIL shrink large uploads with a cheap box reduce first
+            img = img.resize((size, size), resample, reducing_gap=2.0)
+        stack[i] = np.asarray(img)
+    return stack
+
+def _rgb_to_hsv_array(rgb: np.ndarray) -> np.ndarray:
+    """
+    Vectorized colorsys.rgb_to_hsv for an (..., 3) array of 0-255 values.
+    Returns hue in degrees and saturation/value in percent, like the per-colour loop did.
+    """
+    rgb = rgb.astype(np.float32) / 255.0
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    maxc = rgb.max(axis=-1)
+    minc = rgb.min(axis=-1)
+    delta = maxc - minc
+    safe_delta = np.where(delta == 0, 1.0, delta)
+    s = np.where(maxc == 0, 0.0, delta / np.where(maxc == 0, 1.0, maxc))
+    rc = (maxc - r) / safe_delta
+    gc = (maxc - g) / safe_delta
+    bc = (maxc - b) / safe_delta
+    h = np.where(r == maxc, bc - gc, np.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    h = np.where(delta == 0, 0.0, (h / 6.0) % 1.0)
+    return np.stack([h * 360, s * 100, maxc * 100], axis=-1)
+
+def _top_colors_per_image(color_stack: np.ndarray, top_k: int = 5) -> List[List[tuple]]:
+    """
+    Return the top_k most frequent exact colours of every image in an (N, H, W, 3) stack.
+    Each pixel is packed into a 24-bit integer and offset by its image index, so a
+    single np.unique call produces the histogram for the whole batch.
+    """
+    n = color_stack.shape[0]
+    flat = color_stack.reshape(n, -1, 3).astype(np.int64)
+    packed = (flat[..., 0] << 16) | (flat[..., 1] << 8) | flat[..., 2]
+    packed += (np.arange(n, dtype=np.int64) << 24)[:, None]
+    keys, counts = np.unique(packed, return_counts=True)
+    image_idx = keys >> 24
+    # Group by image, most frequent first
+    order = np.lexsort((-counts, image_idx))
+    keys, image_idx = keys[order], image_idx[order]
+    starts = np.searchsorted(image_idx, np.arange(n))
+    ends = np.searchsorted(image_idx, np.arange(n), side="right")
+    result = []
+    for start, end in zip(starts, ends):
+        top = keys[start:min(end, start + top_k)] & 0xFFFFFF
+        result.append([(int(c >> 16), int((c >> 8) & 0xFF), int(c & 0xFF)) for c in top])
+    return result
+
+def analyze_reference_images_batch(
+    images: List[Image.Image],
+    analysis_resolution: int = ANALYSIS_RESOLUTION
+) -> Dict[str, Any]:
+    """
+    Batched version of analyze_reference_images.
+
+    All images are downsampled and stacked into one NumPy array, so brightness,
+    the dominant-colour histogram and the HSV conversion each run as a few array
+    operations over the whole batch. Canny runs at analysis_resolution instead of
+    the full upload size. The result has the same keys as analyze_reference_images.
+
+    Args:
+        images: List of PIL Image objects
+        analysis_resolution: Side length images are resized to for brightness and edge analysis
+
+    Returns:
+        Dictionary containing analysis results
+    """
+    try:
+        analysis = {
+            "color_palettes": [],
+            "composition_styles": [],
+            "lighting_conditions": [],
+            "dominant_elements": [],
+            "theme_elements": [],
+            "prop_elements": [],
+            "setting_elements": [],
+            "overall_mood": "balanced",
+            "visual_style": "balanced"
+        }
+        if not images:
+            raise ValueError("No images to analyze")
+
+        analysis_stack = _stack_images(images, analysis_resolution)
+        color_stack = _stack_images(images, COLOR_SAMPLE_SIZE)
+
+        # Same ITU-R 601-2 luma transform PIL uses for convert('L')
+        gray_stack = (
+            analysis_stack[..., 0] * 0.299 +
+            analysis_stack[..., 1] * 0.587 +
+            analysis_stack[..., 2] * 0.114
+        ).round().astype(np.uint8)
+        brightness_levels = gray_stack.reshape(len(images), -1).mean(axis=1)
+
+        # Canny has no batch API, but at a bounded resolution each call is cheap
+        edge_counts = np.array([
+            np.count_nonzero(cv2.Canny(gray, 50, 150)) for gray in gray_stack
+        ], dtype=np.float64)
+        # Edges are thin lines, so their pixel count scales with the side length
+        # rather than the area. Rescale to what Canny would have found at the
+        # original size so the 0.1 threshold keeps its meaning.
+        original_sides = np.array([np.sqrt(img.width * img.height) for img in images])
+        edge_density = edge_counts / (analysis_resolution * original_sides)
+        analysis["composition_styles"] = ["detailed" if d > 0.1 else "simple" for d in edge_density]
+
+        # Determine overall lighting
+        avg_brightness = float(brightness_levels.mean())
+        if avg_brightness > 150:
+            analysis["lighting_conditions"].append("bright")
+        elif avg_brightness < 80:
+            analysis["lighting_conditions"].append("dark")
+        else:
+            analysis["lighting_conditions"].append("balanced")
+
+        # Analyze color harmony on the top 10 dominant colours, as the per-image version does
+        dominant_colors = [color for colors in _top_colors_per_image(color_stack) for color in colors]
+        if dominant_colors:
+            hsv_colors = _rgb_to_hsv_array(np.array(dominant_colors[:10], dtype=np.uint8))
+            hues = hsv_colors[hsv_colors[:, 1] > 20, 0]  # Only saturated colors
+            if hues.size:
+                hue_range = hues.max() - hues.min()
+                if hue_range < 30:
+                    analysis["theme_elements"].append("monochromatic")
+                elif hue_range < 60:
+                    analysis["theme_elements"].append("analogous colors")
+                else:
+                    analysis["theme_elements"].append("diverse colors")
+
+        # Set overall mood based on brightness and colors
+        if avg_brightness > 150:
+            analysis["overall_mood"] = "bright and airy"
+        elif avg_brightness < 80:
+            analysis["overall_mood"] = "moody and dramatic"
+        else:
+            analysis["overall_mood"] = "balanced and natural"
+
+        # Determine visual style
+        complexity = float(np.mean(edge_density > 0.1))
+        if complexity > 0.7:
+            analysis["visual_style"] = "detailed and complex"
+        elif complexity < 0.3:
+            analysis["visual_style"] = "clean and minimal"
+        else:
+            analysis["visual_style"] = "balanced composition"
+
+        return analysis
+
+    except Exception as e:
+        logger.error("Error analyzing reference images in batch: %s", e)
+        # Fall back to the per-image implementation, which has its own default on error
+        return analyze_reference_images(images)
+
 # Initialize models on import
 try:
     initialize_models()
@@ -1073,15 +1183,13 @@ def generate_reference_style_image(
     model_name: str = "lllyasviel/sd-controlnet-reference",
     num_inference_steps: int = 30,
     guidance_scale: float = 7.5
-) -> str:
+) -> ImageResult:
     """
     Generate an image using reference images for style/theme and a prompt for content/angle.
     Uses ControlNet Reference Adapter if available, otherwise falls back to regular fusion.
     """
     import torch
     from PIL import Image
-    from io import BytesIO
-    import base64
 
     # Check if ControlNet Reference is available
     if not CONTROLNET_REFERENCE_AVAILABLE:
@@ -1103,36 +1211,12 @@ def generate_reference_style_image(
         ).to(device)
 
         # Process multiple reference images
-        processed_references = []
-        for img in reference_images:
-            if not isinstance(img, Image.Image):
-                img = Image.open(img)
-            
-            # Convert to RGB and resize
-            if img.mode != "RGB":
-                img = img.convert("RGB")
-            img = img.resize((512, 512), Image.Resampling.LANCZOS)
-            processed_references.append(img)
+        pil_references = [img if isinstance(img, Image.Image) else Image.open(img) for img in reference_images]
+        reference_stack = _stack_images(pil_references, COMPOSITE_RESOLUTION, Image.Resampling.LANCZOS)
 
         # If multiple reference images, blend them for better style preservation
-        if len(processed_references) > 1:
-            # Create a blended reference image
-            blended_image = Image.new('RGB', (512, 512), (0, 0, 0))
-            total_weight = 0
-            
-            for i, img in enumerate(processed_references):
-                img_array = np.array(img, dtype=np.float32)
-                weight = 1.0 / (i + 1)  # Weight decreases for subsequent images
-                blended_image = np.array(blended_image, dtype=np.float32)
-                blended_image += img_array * weight
-                total_weight += weight
-            
-            # Normalize the blended image
-            blended_image = blended_image / total_weight
-            blended_image = np.clip(blended_image, 0, 255).astype(np.uint8)
-            reference_image = Image.fromarray(blended_image)
-        else:
-            reference_image = processed_references[0]
+        # (weight decreases for subsequent images)
+        reference_image, _ = composite_references(reference_stack, mode="weighted_mean")
 
         # Enhance prompt for better style preservation
         enhanced_prompt = f"{prompt}, same style, same theme, same visual elements, cohesive composition, professional photography"
@@ -1140,7 +1224,7 @@ def generate_reference_style_image(
 
         # Use optimized parameters for better reference matching
         # --- Telugu-to-English translation for enhanced_prompt ---
-        logger.info(f"Prompt before translation: {enhanced_prompt}")
+        logger.debug("Prompt before translation: %s", enhanced_prompt)
         try:
             lang = detect(enhanced_prompt)
         except Exception:
@@ -1148,7 +1232,7 @@ def generate_reference_style_image(
         if lang == "te":
             logger.info("Translating Telugu prompt to English for reference style image.")
             enhanced_prompt = translate_to_english(enhanced_prompt)
-        logger.info(f"Prompt after translation: {enhanced_prompt}")
+        logger.debug("Prompt after translation: %s", enhanced_prompt)
         # --- End translation logic ---
         result = pipe(
             prompt=enhanced_prompt,
@@ -1158,12 +1242,9 @@ def generate_reference_style_image(
             guidance_scale=max(guidance_scale, 9.0),  # Higher guidance for better prompt following
         )
         generated_image = result.images[0]
-        buffered = BytesIO()
-        generated_image.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
-        return img_str
+        return ImageResult(generated_image)
     except Exception as e:
-        logger.error(f"Error with ControlNet Reference: {e}")
+        logger.error("Error with ControlNet Reference: %s", e)
         logger.info("Falling back to regular fusion method")
         # Fall back to regular fusion
         pil_images = []
@@ -1181,7 +1262,7 @@ def generate_identity_preserving_image(
     num_inference_steps: int = 30,
     guidance_scale: float = 7.5,
     ip_adapter_scale: float = 0.8
-) -> str:
+) -> ImageResult:
     """
     Generate an image that preserves the identity of a person from reference images
     while allowing pose/scenario changes as specified in the prompt.
@@ -1190,8 +1271,6 @@ def generate_identity_preserving_image(
     """
     import torch
     from PIL import Image
-    from io import BytesIO
-    import base64
 
     # Check if IP-Adapter is available
     if not IP_ADAPTER_AVAILABLE:
@@ -1224,7 +1303,7 @@ def generate_identity_preserving_image(
         
         # Generate image with identity preservation
         # --- Telugu-to-English translation for prompt ---
-        logger.info(f"Prompt before translation: {prompt}")
+        logger.debug("Prompt before translation: %s", prompt)
         try:
             lang = detect(prompt)
         except Exception:
@@ -1232,7 +1311,7 @@ def generate_identity_preserving_image(
         if lang == "te":
             logger.info("Translating Telugu prompt to English for identity preserving image.")
             prompt = translate_to_english(prompt)
-        logger.info(f"Prompt after translation: {prompt}")
+        logger.debug("Prompt after translation: %s", prompt)
         # --- End translation logic ---
         result = pipe(
             prompt=prompt,
@@ -1243,13 +1322,10 @@ def generate_identity_preserving_image(
         )
         
         generated_image = result.images[0]
-        buffered = BytesIO()
-        generated_image.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
-        return img_str
+        return ImageResult(generated_image)
         
     except Exception as e:
-        logger.error(f"Error with IP-Adapter: {e}")
+        logger.error("Error with IP-Adapter: %s", e)
         logger.info("Falling back to reference style method")
         return generate_reference_style_image(prompt, reference_images)
 
@@ -1260,7 +1336,7 @@ def generate_pose_transfer_image(
     num_inference_steps: int = 30,
     guidance_scale: float = 7.5,
     strength: float = 0.8
-) -> str:
+) -> ImageResult:
     """
     Generate an image that transfers the pose/style from reference images
     while maintaining identity and applying the new scenario from prompt.
@@ -1269,8 +1345,6 @@ def generate_pose_transfer_image(
     """
     import torch
     from PIL import Image
-    from io import BytesIO
-    import base64
 
     try:
         device = "cuda" if torch.cuda.is_available() else "cpu"
@@ -1297,7 +1371,7 @@ def generate_pose_transfer_image(
         
         # Generate with lower strength to preserve identity
         # --- Telugu-to-English translation for enhanced_prompt ---
-        logger.info(f"Prompt before translation: {enhanced_prompt}")
+        logger.debug("Prompt before translation: %s", enhanced_prompt)
         try:
             lang = detect(enhanced_prompt)
         except Exception:
@@ -1305,7 +1379,7 @@ def generate_pose_transfer_image(
         if lang == "te":
             logger.info("Translating Telugu prompt to English for pose transfer image.")
             enhanced_prompt = translate_to_english(enhanced_prompt)
-        logger.info(f"Prompt after translation: {enhanced_prompt}")
+        logger.debug("Prompt after translation: %s", enhanced_prompt)
         # --- End translation logic ---
         result = pipe(
             prompt=enhanced_prompt,
@@ -1317,13 +1391,10 @@ def generate_pose_transfer_image(
         )
         
         generated_image = result.images[0]
-        buffered = BytesIO()
-        generated_image.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
-        return img_str
+        return ImageResult(generated_image)
         
     except Exception as e:
-        logger.error(f"Error in pose transfer: {e}")
+        logger.error("Error in pose transfer: %s", e)
         return generate_fusion_image(prompt, reference_images)
 
 def generate_multi_view_fusion(
@@ -1334,7 +1405,7 @@ def generate_multi_view_fusion(
     num_inference_steps: int = 80,
     guidance_scale: float = 16.0,
     strength: float = 0.35
-) -> str:
+) -> ImageResult:
     """
     Generate new viewpoints from multiple reference images with enhanced consistency.
     Optimized for scenarios like: front view car → side view car
@@ -1349,10 +1420,10 @@ def generate_multi_view_fusion(
         strength: How much to modify from reference (lower = more faithful)
     
     Returns:
-        Base64 encoded image string
+        ImageResult holding the generated image; encode() gives the file bytes
     """
     try:
-        logger.info(f"Starting multi-view fusion with {len(reference_images)} reference images")
+        logger.info("Starting multi-view fusion with %s reference images", len(reference_images))
         
         # Check for GPU availability
         device = "cuda" if torch.cuda.is_available() else "cpu"
@@ -1385,9 +1456,9 @@ def generate_multi_view_fusion(
             try:
                 description = extract_detailed_image_description(img)
                 image_descriptions.append(description)
-                logger.info(f"Multi-view: Extracted description for image {i+1}: {description[:100]}...")
+                logger.debug("Multi-view: Extracted description for image %s: %s...", i+1, description[:100])
             except Exception as e:
-                logger.warning(f"Failed to extract description for image {i+1}: {str(e)}")
+                logger.warning("Failed to extract description for image %s: %s", i+1, e)
                 # Fallback to traditional analysis for this image
                 fallback_desc = _fallback_image_analysis(img)
                 image_descriptions.append(fallback_desc)
@@ -1399,11 +1470,11 @@ def generate_multi_view_fusion(
         # Generate enhanced negative prompt based on descriptions
         enhanced_negative_prompt = generate_enhanced_negative_prompt(image_descriptions, negative_prompt)
         
-        logger.info(f"Multi-view enhanced prompt: {enhanced_prompt[:200]}...")
-        logger.info(f"Multi-view enhanced negative: {enhanced_negative_prompt[:200]}...")
+        logger.debug("Multi-view enhanced prompt: %s...", enhanced_prompt[:200])
+        logger.debug("Multi-view enhanced negative: %s...", enhanced_negative_prompt[:200])
         
         # Also run traditional analysis as backup for composite creation
-        analysis = analyze_reference_images(processed_images)
+        analysis = analyze_reference_images_batch(processed_images)
         
         # Create a composite reference that captures the most consistent elements
         primary_reference = create_optimal_composite(processed_images, analysis)
@@ -1418,16 +1489,16 @@ def generate_multi_view_fusion(
         
         # Log any warnings or adjustments
         for warning in validation["warnings"]:
-            logger.warning(f"Parameter adjustment: {warning}")
+            logger.warning("Parameter adjustment: %s", warning)
         
         # Ensure strength is within reasonable bounds for prompt following
         optimal_strength = max(min(optimal_strength, 0.8), 0.45)  # Allow good variation for prompt following
         
-        logger.info(f"Generating multi-view fusion (strength: {optimal_strength}, guidance: {optimal_guidance})")
+        logger.info("Generating multi-view fusion (strength: %s, guidance: %s)", optimal_strength, optimal_guidance)
         
         # Generate with enhanced parameters
         # --- Telugu-to-English translation for enhanced_prompt ---
-        logger.info(f"Prompt before translation: {enhanced_prompt}")
+        logger.debug("Prompt before translation: %s", enhanced_prompt)
         try:
             lang = detect(enhanced_prompt)
         except Exception:
@@ -1435,7 +1506,7 @@ def generate_multi_view_fusion(
         if lang == "te":
             logger.info("Translating Telugu prompt to English for multi-view fusion.")
             enhanced_prompt = translate_to_english(enhanced_prompt)
-        logger.info(f"Prompt after translation: {enhanced_prompt}")
+        logger.debug("Prompt after translation: %s", enhanced_prompt)
         # --- End translation logic ---
         result = pipe(
             prompt=enhanced_prompt,
@@ -1447,22 +1518,110 @@ def generate_multi_view_fusion(
             num_images_per_prompt=1
         )
         
-        # Convert to base64
         generated_image = result.images[0]
-        buffered = BytesIO()
-        generated_image.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
+        image_result = ImageResult(generated_image)
         
         logger.info("Multi-view fusion completed successfully")
-        return img_str
+        return image_result
         
     except Exception as e:
-        logger.error(f"Error in multi-view fusion: {str(e)}")
+        logger.error("Error in multi-view fusion: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to generate multi-view fusion: {str(e)}"
         )
 
+# Reference images are composited at the resolution the SD 1.5 pipelines expect
+COMPOSITE_RESOLUTION = 512
+
+def composite_references(
+    stack: np.ndarray,
+    mode: str = "edge_gated",
+    weights: Optional[List[float]] = None,
+    edge_threshold: float = 0.1,
+    similarity_threshold: int = 50
+) -> Tuple[Image.Image, Dict[str, Any]]:
+    """
+    Blend a stack of reference images into a single composite, using the first image as the primary.
+
+    The same compositor backs every fusion path:
+    - "edge_gated": blend each reference over the whole frame, but only if its
+      Canny edge IoU with the primary exceeds edge_threshold (generate_fusion_image).
+    - "similarity": blend each reference only where its grayscale differs from the
+      primary by less than similarity_threshold (create_optimal_composite).
+    - "weighted_mean": normalized weighted average of all references
+      (generate_reference_style_image).
+
+    Grayscale, Canny edges, edge IoU and similarity masks are computed once for the
+    whole stack, always against the original primary. Blending happens in place in
+    one preallocated float32 buffer and the result is converted to PIL once.
+
+    Args:
+        stack: (N, H, W, 3) uint8 array of references, primary first
+        mode: "edge_gated", "similarity" or "weighted_mean"
+        weights: Per-reference blend weights. Defaults to the schedule each call site used.
+        edge_threshold: Minimum edge IoU for a reference to be blended in "edge_gated" mode
+        similarity_threshold: Maximum per-pixel gray difference counted as similar in "similarity" mode
+
+    Returns:
+        Tuple of (composite PIL image, diagnostics dictionary)
+    """
+    n = stack.shape[0]
+    diagnostics = {"mode": mode, "num_references": n, "weights": [], "edge_iou": [], "similarity_coverage": [], "blended": []}
+    if n == 1:
+        return Image.fromarray(stack[0]), diagnostics
+
+    if weights is None:
+        if mode == "edge_gated":
+            weights = [1.0] + [0.3 / i for i in range(1, n)]
+        elif mode == "similarity":
+            weights = [1.0] + [0.3 / (i + 1) for i in range(1, n)]
+        elif mode == "weighted_mean":
+            weights = [1.0 / (i + 1) for i in range(n)]
+        else:
+            raise ValueError(f"Unknown composite mode: {mode}")
+    diagnostics["weights"] = [float(w) for w in weights]
+
+    # Every mode is a chain of in-place running blends: out = (1 - a) * out + a * ref,
+    # optionally restricted to a mask. cv2.accumulateWeighted does exactly that
+    # without allocating temporaries.
+    out = stack[0].astype(np.float32)
+
+    if mode == "weighted_mean":
+        # A normalized weighted mean is a running blend with a_i = w_i / (w_0 + ... + w_i)
+        total = weights[0]
+        for i in range(1, n):
+            total += weights[i]
+            cv2.accumulateWeighted(stack[i], out, weights[i] / total)
+        diagnostics["blended"] = [True] * (n - 1)
+    else:
+        # Grayscale for the whole stack in one cvtColor call on a (N*H, W, 3) view
+        h, w = stack.shape[1:3]
+        gray = cv2.cvtColor(stack.reshape(n * h, w, 3), cv2.COLOR_RGB2GRAY).reshape(n, h, w)
+
+        if mode == "edge_gated":
+            edges = np.stack([cv2.Canny(g, 50, 150) for g in gray]) > 0
+            intersection = np.count_nonzero(edges[1:] & edges[0], axis=(1, 2))
+            union = np.count_nonzero(edges[1:] | edges[0], axis=(1, 2))
+            edge_iou = intersection / (union + 1e-6)
+            diagnostics["edge_iou"] = [float(v) for v in edge_iou]
+            for i in range(1, n):
+                blend = bool(edge_iou[i - 1] > edge_threshold)
+                diagnostics["blended"].append(blend)
+                if blend:
+                    cv2.accumulateWeighted(stack[i], out, weights[i])
+        elif mode == "similarity":
+            masks = (cv2.absdiff(gray[1:], np.broadcast_to(gray[0], gray[1:].shape)) < similarity_threshold).view(np.uint8)
+            diagnostics["similarity_coverage"] = [float(v) for v in masks.mean(axis=(1, 2))]
+            for i in range(1, n):
+                cv2.accumulateWeighted(stack[i], out, weights[i], mask=masks[i - 1])
+            diagnostics["blended"] = [bool(m.any()) for m in masks]
+        else:
+            raise ValueError(f"Unknown composite mode: {mode}")
+
+    np.clip(out, 0, 255, out=out)
+    return Image.fromarray(out.astype(np.uint8)), diagnostics
+
 def create_optimal_composite(images: List[Image.Image], analysis: Dict[str, Any]) -> Image.Image:
     """
     Create an optimal composite image that preserves the most consistent elements
@@ -1471,33 +1630,12 @@ def create_optimal_composite(images: List[Image.Image], analysis: Dict[str, Any]
     if len(images) == 1:
         return images[0]
     
-    # Use the first image as base
-    primary = images[0]
-    primary_array = np.array(primary, dtype=np.float32)
-    
-    # For each additional image, blend only consistent regions
-    for i, img in enumerate(images[1:], 1):
-        img_array = np.array(img, dtype=np.float32)
-        
-        # Calculate similarity map using edge comparison
-        primary_gray = cv2.cvtColor(primary_array.astype(np.uint8), cv2.COLOR_RGB2GRAY)
-        img_gray = cv2.cvtColor(img_array.astype(np.uint8), cv2.COLOR_RGB2GRAY)
-        
-        # Find similar regions
-        diff = cv2.absdiff(primary_gray, img_gray)
-        similarity_mask = (diff < 50).astype(np.float32)  # Threshold for similarity
-        
-        # Expand mask to 3 channels
-        similarity_mask_3ch = np.stack([similarity_mask] * 3, axis=-1)
-        
-        # Blend only similar regions with decreasing weight
-        weight = 0.3 / (i + 1)  # Decreasing weight for later images
-        blend_mask = similarity_mask_3ch * weight
-        
-        primary_array = primary_array * (1 - blend_mask) + img_array * blend_mask
-    
-    # Convert back to PIL Image
-    composite = Image.fromarray(np.clip(primary_array, 0, 255).astype(np.uint8))
+    # Blend only the regions of each view that match the first image
+    composite, diagnostics = composite_references(
+        _stack_images(images, COMPOSITE_RESOLUTION, Image.Resampling.LANCZOS),
+        mode="similarity"
+    )
+    logger.info("Composite similarity coverage: %s", diagnostics['similarity_coverage'])
     return composite
 
 def build_viewpoint_prompt(prompt: str, analysis: Dict[str, Any], num_references: int) -> str:
@@ -1678,53 +1816,109 @@ Be specific and detailed but concise. Focus on elements that are most important
                 else:
                     detailed_description = truncated + "..."
             
-            logger.info(f"Successfully extracted image description ({len(detailed_description)} characters)")
+            logger.info("Successfully extracted image description (%s characters)", len(detailed_description))
             return detailed_description
             
         except Exception as gemini_error:
-            logger.warning(f"Gemini vision analysis failed: {gemini_error}, falling back to traditional analysis")
+            logger.warning("Gemini vision analysis failed: %s, falling back to traditional analysis", gemini_error)
             
             # Fallback to traditional analysis if Gemini fails
             return _fallback_image_analysis(image)
             
     except Exception as e:
-        logger.error(f"Error in detailed image description extraction: {str(e)}")
+        logger.error("Error in detailed image description extraction: %s", e)
         return _fallback_image_analysis(image)
 
-def _fallback_image_analysis(image: Image.Image) -> str:
+# Fallback analysis works on a view no larger than this on its longest side
+FALLBACK_ANALYSIS_MAX_SIDE = 256
+# Bits kept per channel when quantizing colours for the histogram (5 -> 32768 bins)
+FALLBACK_COLOR_BITS = 5
+# "histogram" (default) or "kmeans" for a clustered palette
+FALLBACK_PALETTE_MODE = os.getenv("FALLBACK_PALETTE_MODE", "histogram")
+
+def _dominant_colors_histogram(pixels: np.ndarray, top_k: int = 1) -> List[tuple]:
     """
-    Fallback image analysis using traditional computer vision techniques
+    Find the most common colours of an (N, 3) uint8 pixel array with a quantized np.bincount histogram.
+    Each returned colour is the mean of the pixels in its bin, not the bin corner.
+    """
+    shift = 8 - FALLBACK_COLOR_BITS
+    q = (pixels >> shift).astype(np.int32)
+    bins = (q[:, 0] << (2 * FALLBACK_COLOR_BITS)) | (q[:, 1] << FALLBACK_COLOR_BITS) | q[:, 2]
+    num_bins = 1 << (3 * FALLBACK_COLOR_BITS)
+    counts = np.bincount(bins, minlength=num_bins)
+    top_bins = np.argsort(counts)[::-1][:top_k]
+    top_bins = top_bins[counts[top_bins] > 0]
+    channel_sums = np.stack(
+        [np.bincount(bins, weights=pixels[:, c], minlength=num_bins)[top_bins] for c in range(3)],
+        axis=1
+    )
+    means = np.round(channel_sums / counts[top_bins][:, None]).astype(int)
+    return [tuple(int(v) for v in rgb) for rgb in means]
+
+def _dominant_colors_kmeans(pixels: np.ndarray, k: int = 5) -> List[tuple]:
+    """Cluster an (N, 3) uint8 pixel array into k colours with OpenCV k-means, largest cluster first"""
+    k = max(1, min(k, len(pixels)))
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 10, 1.0)
+    _, labels, centers = cv2.kmeans(pixels.astype(np.float32), k, None, criteria, 1, cv2.KMEANS_PP_CENTERS)
+    sizes = np.bincount(labels.ravel(), minlength=k)
+    return [tuple(int(round(v)) for v in centers[i]) for i in np.argsort(sizes)[::-1]]
+
+def _fallback_image_analysis(image: Image.Image, palette_mode: Optional[str] = None) -> str:
+    """
+    Fallback image analysis using traditional computer vision techniques.
+
+    Everything runs on a downsampled view, so time and memory stay bounded
+    whatever the upload size.
+
+    Args:
+        image: PIL Image object
+        palette_mode: "histogram" for the most common quantized colour, or "kmeans"
+            to also describe a clustered palette. Defaults to FALLBACK_PALETTE_MODE.
     """
     try:
-        img_array = np.array(image)
+        palette_mode = palette_mode or FALLBACK_PALETTE_MODE
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        original_side = np.sqrt(image.width * image.height)
+        scale = min(1.0, FALLBACK_ANALYSIS_MAX_SIDE / max(image.width, image.height))
+        if scale < 1.0:
+            size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+            image = image.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+        img_array = np.asarray(image)
         h, w = img_array.shape[:2]
-        
+        pixels = img_array.reshape(-1, 3)
+
         # Color analysis
-        colors = image.getcolors(maxcolors=256*256*256)
+        if palette_mode == "kmeans":
+            colors = _dominant_colors_kmeans(pixels)
+        else:
+            colors = _dominant_colors_histogram(pixels)
         if colors:
-            colors.sort(key=lambda x: x[0], reverse=True)
-            dominant_color = colors[0][1]
-            r, g, b = dominant_color
-            
+            r, g, b = colors[0]
+
         # Brightness analysis
-        gray = image.convert('L')
-        brightness = np.mean(np.array(gray))
-        
-        # Edge analysis for complexity
-        edges = cv2.Canny(np.array(gray), 50, 150)
-        edge_density = np.sum(edges > 0) / edges.size
-        
+        gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
+        brightness = np.mean(gray)
+
+        # Edge analysis for complexity, rescaled to the original resolution
+        # (edge pixel counts grow with side length, not area)
+        edges = cv2.Canny(gray, 50, 150)
+        edge_density = np.count_nonzero(edges) / (np.sqrt(h * w) * original_side)
+
         # Generate basic description
         lighting = "bright" if brightness > 150 else "dark" if brightness < 80 else "balanced"
         complexity = "detailed and complex" if edge_density > 0.1 else "simple and clean"
         color_desc = f"dominated by RGB({r}, {g}, {b})" if colors else "with varied colors"
+        if palette_mode == "kmeans" and len(colors) > 1:
+            accents = ", ".join(f"RGB({cr}, {cg}, {cb})" for cr, cg, cb in colors[1:])
+            color_desc += f" with accents of {accents}"
         
         description = f"An image with {lighting} lighting, {complexity} composition, {color_desc}. The scene appears to have moderate visual complexity with various elements distributed throughout the frame."
         
         return description
         
     except Exception as e:
-        logger.error(f"Error in fallback image analysis: {str(e)}")
+        logger.error("Error in fallback image analysis: %s", e)
         return "A photographic image with balanced lighting and standard composition."
 
 def merge_image_descriptions_with_prompt(image_descriptions: List[str], user_prompt: str) -> str:
@@ -1794,10 +1988,10 @@ Create the optimized prompt now (ONE sentence, strictly under 77 tokens):
                     truncated = truncated[:first_period+1]
                 synthesized_prompt = truncated.strip()
             synthesized_prompt = postprocess_prompt(synthesized_prompt)
-            logger.info(f"AI-synthesized optimized prompt (single sentence, {len(tokens)} tokens): {synthesized_prompt}")
+            logger.debug("AI-synthesized optimized prompt (single sentence, %s tokens): %s", len(tokens), synthesized_prompt)
             return synthesized_prompt
         except Exception as gemini_error:
-            logger.warning(f"Gemini synthesis failed: {gemini_error}, using fallback method")
+            logger.warning("Gemini synthesis failed: %s, using fallback method", gemini_error)
             combined_text = ' '.join(image_descriptions).lower()
             key_elements = []
             if any(word in combined_text for word in ['storm', 'cloud', 'overcast', 'dramatic sky']):
@@ -1843,10 +2037,10 @@ Create the optimized prompt now (ONE sentence, strictly under 77 tokens):
                     truncated = truncated[:first_period+1]
                 fallback_prompt = truncated.strip()
             fallback_prompt = postprocess_prompt(fallback_prompt)
-            logger.info(f"Fallback optimized prompt (single sentence, {len(tokens)} tokens): {fallback_prompt}")
+            logger.debug("Fallback optimized prompt (single sentence, %s tokens): %s", len(tokens), fallback_prompt)
             return fallback_prompt
     except Exception as e:
-        logger.error(f"Error in intelligent prompt merging: {str(e)}")
+        logger.error("Error in intelligent prompt merging: %s", e)
         return f"{user_prompt} in a cinematic style."
 
 def generate_enhanced_negative_prompt(image_descriptions: List[str], base_negative: str) -> str:
@@ -1886,7 +2080,7 @@ def generate_enhanced_negative_prompt(image_descriptions: List[str], base_negati
         return result
         
     except Exception as e:
-        logger.error(f"Error generating enhanced negative prompt: {str(e)}")
+        logger.error("Error generating enhanced negative prompt: %s", e)
         return "blurry, low quality, distorted, deformed, inconsistent style"
 
 def generate_image_from_text_prompt(
@@ -1897,7 +2091,7 @@ def generate_image_from_text_prompt(
     guidance_scale: float = 8.0,    # Slightly higher for better prompt following
     width: int = 512,
     height: int = 512
-) -> str:
+) -> ImageResult:
     """
     Generate image from text prompt only (text-to-image).
     This is used when we already have a comprehensive final prompt.
@@ -1912,14 +2106,14 @@ def generate_image_from_text_prompt(
         height: Output image height
     
     Returns:
-        Base64 encoded image string
+        ImageResult holding the generated image; encode() gives the file bytes
     """
     try:
-        logger.info(f"Starting text-to-image generation with prompt: {prompt[:100]}...")
+        logger.debug("Starting text-to-image generation with prompt: %s...", prompt[:100])
         
         # Check for GPU availability
         device = "cuda" if torch.cuda.is_available() else "cpu"
-        logger.info(f"Using device: {device}")
+        logger.info("Using device: %s", device)
         
         # Import required modules
         from diffusers import StableDiffusionPipeline
@@ -1946,7 +2140,7 @@ def generate_image_from_text_prompt(
         # Generate the image
         logger.info("Generating image...")
         # --- Telugu-to-English translation for prompt ---
-        logger.info(f"Prompt before translation: {prompt}")
+        logger.debug("Prompt before translation: %s", prompt)
         try:
             lang = detect(prompt)
         except Exception:
@@ -1954,7 +2148,7 @@ def generate_image_from_text_prompt(
         if lang == "te":
             logger.info("Translating Telugu prompt to English for text-to-image generation.")
             prompt = translate_to_english(prompt)
-        logger.info(f"Prompt after translation: {prompt}")
+        logger.debug("Prompt after translation: %s", prompt)
         # --- End translation logic ---
         with torch.no_grad():
             result = pipe(
@@ -1970,16 +2164,10 @@ def generate_image_from_text_prompt(
         generated_image = result.images[0]
         logger.info("Image generation completed")
         
-        # Convert to base64
-        buffered = BytesIO()
-        generated_image.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
-        
-        logger.info("Image conversion to base64 completed")
-        return img_str  # Return just the base64 string, not the full data URL
+        return ImageResult(generated_image)
         
     except Exception as e:
-        logger.error(f"Error in text-to-image generation: {str(e)}")
+        logger.error("Error in text-to-image generation: %s", e)
         raise e
     finally:
         # Clean up GPU memory
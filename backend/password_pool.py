@@ -0,0 +1,67 @@
+"""
+Bounded worker pool for bcrypt.
+
+A bcrypt hash or check costs hundreds of milliseconds of CPU by design. The
+pool runs them on PASSWORD_POOL_WORKERS threads (bcrypt releases the GIL
+while hashing) and accepts at most PASSWORD_POOL_MAX_QUEUE more waiting
+behind those. Past that, submissions fail right away with PasswordPoolBusy,
+and the API answers 503. That is better than queueing logins for seconds.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import db
+
+PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", str(os.cpu_count() or 2)))
+PASSWORD_POOL_MAX_QUEUE = int(os.getenv("PASSWORD_POOL_MAX_QUEUE", str(4 * PASSWORD_POOL_WORKERS)))
+
+class PasswordPoolBusy(Exception):
+    """Raised when the pool already has its maximum number of jobs"""
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_POOL_WORKERS, thread_name_prefix="bcrypt")
+_lock = threading.Lock()
+_in_flight = 0
+_stats = {"completed": 0, "rejected": 0, "max_in_flight": 0}
+
+def _release(_future):
+    global _in_flight
+    with _lock:
+        _in_flight -= 1
+        _stats["completed"] += 1
+
+def submit(func, *args):
+    """Queue func(*args) on the pool and return its Future, or raise PasswordPoolBusy"""
+    global _in_flight
+    with _lock:
+        if _in_flight >= PASSWORD_POOL_WORKERS + PASSWORD_POOL_MAX_QUEUE:
+            _stats["rejected"] += 1
+            raise PasswordPoolBusy("Too many password operations in progress")
+        _in_flight += 1
+        _stats["max_in_flight"] = max(_stats["max_in_flight"], _in_flight)
+    try:
+        future = _executor.submit(func, *args)
+    except BaseException:
+        with _lock:
+            _in_flight -= 1
+        raise
+    future.add_done_callback(_release)
+    return future
+
+async def hash_password(password):
+    return await asyncio.wrap_future(submit(db.get_password_hash, password))
+
+async def verify_password(plain_password, hashed_password):
+    return await asyncio.wrap_future(submit(db.verify_password, plain_password, hashed_password))
+
+def get_stats():
+    with _lock:
+        stats = dict(_stats)
+        stats["in_flight"] = _in_flight
+    stats["workers"] = PASSWORD_POOL_WORKERS
+    stats["max_queue"] = PASSWORD_POOL_MAX_QUEUE
+    return stats
+
+def shutdown():
+    _executor.shutdown(wait=True)
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Re-measure every stored folder and rebuild the per-user and per-project
+storage usage counters (see storage_usage.py). The server does this
+periodically; run it by hand after moving or restoring files outside the app.
+Safe to run while the server is up.
+
+Usage: python reconcile_usage.py [--pause SECONDS]
+"""
+import sys
+
+from db import get_db_connection
+from storage_usage import USAGE_RECONCILE_PAUSE, reconcile_storage_usage
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    pause = float(args[args.index("--pause") + 1]) if "--pause" in args else USAGE_RECONCILE_PAUSE
+
+    stats = reconcile_storage_usage(pause=pause)
+    print(f"✅ Measured {stats['measured']} folder(s): {stats['corrected']} corrected, {stats['dropped']} no longer stored")
+    with get_db_connection(readonly=True) as conn:
+        users = conn.execute(
+            """
+            SELECT users.username, storage_usage.bytes, storage_usage.files
+            FROM storage_usage JOIN users ON users.id = storage_usage.owner_id
+            WHERE storage_usage.owner_type = 'user' ORDER BY storage_usage.bytes DESC
+            """
+        ).fetchall()
+    for user in users:
+        print(f"📊 {user['username']}: {user['bytes'] / 1e6:.1f} MB in {user['files']} file(s)")
@@ -0,0 +1,227 @@
+"""
+Archival tier for cold project sessions.
+
+A session folder under PROJECT_IMAGES_ROOT/<project>/ that has not changed for
+SESSION_ARCHIVE_AFTER_DAYS can be packed into one zip bundle next to it,
+<session>.session.zip, and the folder removed. This saves the inodes, backup
+passes and directory scans for thousands of small files. JSON members are
+deflated. Images and thumbnails are already compressed, so they are stored
+as-is and a byte range of an image is a single seek into the bundle.
+
+Reads never extract the bundle. read_member() looks a member up in the cached
+central directory, seeks to its data and reads only that member. A session is
+restored to a folder only when something writes to it again
+(ensure_session_folder). A lock file in the project folder serialises restores
+across worker processes. While both a folder and a bundle exist, for example
+after a crash mid-archive, the folder wins.
+"""
+import os
+import shutil
+import struct
+import threading
+import time
+import zipfile
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from session_files import LOCK_FILE, SHOTS_LOG_FILE, compact_shots, session_lock
+from thumbnails import THUMBNAIL_SIZES, ensure_thumbnail
+
+ARCHIVE_SUFFIX = ".session.zip"
+RESTORING_SUFFIX = ".restoring"  # Temporary folder a bundle is unpacked into
+SESSION_ARCHIVE_AFTER_DAYS = float(os.getenv("SESSION_ARCHIVE_AFTER_DAYS", "90"))
+BUNDLE_INDEX_CACHE_SIZE = int(os.getenv("BUNDLE_INDEX_CACHE_SIZE", "256"))
+STORED_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".gif")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")  # Fixed part of a zip local file header
+
+_indexes = OrderedDict()  # bundle path -> (mtime_ns, {member name: BundleMember})
+_indexes_lock = threading.Lock()
+_restore_thread_lock = threading.Lock()
+
+class BundleMember:
+    """Where one file lives inside a bundle; data_offset is filled in on first read"""
+    __slots__ = ("name", "size", "compressed_size", "compress_type", "header_offset", "crc", "data_offset")
+
+    def __init__(self, info):
+        self.name = info.filename
+        self.size = info.file_size
+        self.compressed_size = info.compress_size
+        self.compress_type = info.compress_type
+        self.header_offset = info.header_offset
+        self.crc = info.CRC
+        self.data_offset = None
+
+def bundle_path(session_folder):
+    return session_folder.rstrip(os.sep) + ARCHIVE_SUFFIX
+
+def _bundle_index(path):
+    """Member table of a bundle, read from its central directory once per bundle version"""
+    mtime_ns = os.stat(path).st_mtime_ns
+    with _indexes_lock:
+        entry = _indexes.get(path)
+        if entry is not None and entry[0] == mtime_ns:
+            _indexes.move_to_end(path)
+            return entry[1]
+    with zipfile.ZipFile(path) as bundle:
+        members = {info.filename: BundleMember(info) for info in bundle.infolist() if not info.is_dir()}
+    with _indexes_lock:
+        _indexes[path] = (mtime_ns, members)
+        _indexes.move_to_end(path)
+        while len(_indexes) > BUNDLE_INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return members
+
+def list_members(session_folder):
+    """Names of the files in a session's bundle, or None if the session is not archived"""
+    try:
+        return list(_bundle_index(bundle_path(session_folder)))
+    except FileNotFoundError:
+        return None
+
+def member_info(session_folder, name):
+    """The BundleMember for name in the session's bundle, or None"""
+    try:
+        return _bundle_index(bundle_path(session_folder)).get(name)
+    except FileNotFoundError:
+        return None
+
+def read_member(session_folder, name, start=0, end=None):
+    """
+    Bytes start..end (inclusive) of one member of the session's bundle, or None
+    if there is no such bundle or member. Stored members are read with a single
+    seek; deflated ones (the small JSON files) are inflated whole.
+    """
+    path = bundle_path(session_folder)
+    try:
+        member = _bundle_index(path).get(name)
+        if member is None:
+            return None
+        with open(path, "rb") as f:
+            if member.data_offset is None:
+                f.seek(member.header_offset)
+                header = _LOCAL_HEADER.unpack(f.read(_LOCAL_HEADER.size))
+                member.data_offset = member.header_offset + _LOCAL_HEADER.size + header[-2] + header[-1]
+            end = member.size - 1 if end is None else end
+            if member.compress_type == zipfile.ZIP_STORED:
+                f.seek(member.data_offset + start)
+                return f.read(end - start + 1)
+            f.seek(member.data_offset)
+            data = zlib.decompressobj(-zlib.MAX_WBITS).decompress(f.read(member.compressed_size))
+            return data[start:end + 1]
+    except FileNotFoundError:
+        return None
+
+def is_archived(session_folder):
+    return not os.path.isdir(session_folder) and os.path.isfile(bundle_path(session_folder))
+
+def last_modified(session_folder):
+    """Newest mtime of the folder or anything in it"""
+    newest = os.stat(session_folder).st_mtime
+    for directory, _, files in os.walk(session_folder):
+        newest = max(newest, os.stat(directory).st_mtime)
+        for name in files:
+            try:
+                newest = max(newest, os.stat(os.path.join(directory, name)).st_mtime)
+            except FileNotFoundError:
+                pass
+    return newest
+
+def archive_session(session_folder):
+    """
+    Pack a session folder into its bundle and remove the folder.
+    Returns the bundle size in bytes.
+    """
+    images_dir = os.path.join(session_folder, "images")
+    with session_lock(session_folder):
+        # Bundles are read-only, so fold pending shot updates in and fill in
+        # missing thumbnails before packing
+        compact_shots(session_folder)
+        if os.path.isdir(images_dir):
+            for entry in os.scandir(images_dir):
+                if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    for size in THUMBNAIL_SIZES:
+                        ensure_thumbnail(images_dir, entry.name, size)
+
+        path = bundle_path(session_folder)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with zipfile.ZipFile(tmp_path, "w") as bundle:
+            for directory, _, files in os.walk(session_folder):
+                for name in sorted(files):
+                    if name in (LOCK_FILE, SHOTS_LOG_FILE) or name.endswith(".tmp"):
+                        continue
+                    file_path = os.path.join(directory, name)
+                    arcname = os.path.relpath(file_path, session_folder).replace(os.sep, "/")
+                    compression = zipfile.ZIP_STORED if name.lower().endswith(STORED_EXTENSIONS) else zipfile.ZIP_DEFLATED
+                    bundle.write(file_path, arcname, compress_type=compression)
+        with zipfile.ZipFile(tmp_path) as bundle:
+            bad_member = bundle.testzip()
+        if bad_member is not None:
+            os.remove(tmp_path)
+            raise IOError(f"Bundle check failed for {bad_member} in {session_folder}")
+        os.replace(tmp_path, path)
+        shutil.rmtree(session_folder)
+    return os.path.getsize(path)
+
+@contextmanager
+def _restore_lock(session_folder):
+    """Hold the restore lock of the session's project folder, against other threads and processes"""
+    with _restore_thread_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(os.path.dirname(session_folder.rstrip(os.sep)), LOCK_FILE), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def restore_session(session_folder):
+    """Unpack a session's bundle back into its folder and remove the bundle"""
+    path = bundle_path(session_folder)
+    with _restore_lock(session_folder):
+        if os.path.isdir(session_folder):
+            return session_folder
+        tmp_folder = f"{session_folder}.{os.getpid()}.{threading.get_ident()}{RESTORING_SUFFIX}"
+        try:
+            with zipfile.ZipFile(path) as bundle:
+                bundle.extractall(tmp_folder)
+            os.replace(tmp_folder, session_folder)
+        except Exception:
+            shutil.rmtree(tmp_folder, ignore_errors=True)
+            # Someone else restored it first (or the rename raced a new folder): that is what we wanted
+            if os.path.isdir(session_folder):
+                return session_folder
+            raise
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    return session_folder
+
+def ensure_session_folder(session_folder):
+    """Call before writing into a session: restores it first if it was archived"""
+    if is_archived(session_folder):
+        restore_session(session_folder)
+    return session_folder
+
+def cold_sessions(project_folder, older_than_days=SESSION_ARCHIVE_AFTER_DAYS, is_session=None):
+    """Yield the session folders in a project folder untouched for older_than_days"""
+    cutoff = time.time() - older_than_days * 86400
+    with os.scandir(project_folder) as entries:
+        folders = [entry.path for entry in entries
+                   if entry.is_dir() and (is_session is None or is_session(entry.name))]
+    for folder in folders:
+        try:
+            if last_modified(folder) < cutoff:
+                yield folder
+        except FileNotFoundError:
+            continue
@@ -0,0 +1,153 @@
+"""
+Concurrency-safe updates to the JSON files in a session folder.
+
+Recording a generated image used to read, modify and rewrite the whole
+shots.json. Two renders in the same session could then overwrite each other's
+update. Now record_shot_update() appends one line to shots.changes.jsonl next to
+shots.json. read_shots() returns shots.json with the pending changes applied and
+compacts them into a new shots.json. A writer also compacts once the log grows
+past SHOTS_LOG_COMPACT_BYTES. Changes only set fields, so applying one twice is
+harmless and a crash between the rename and the log removal loses nothing.
+
+update_json_file() does a locked read-modify-write for files that are rewritten
+whole (input.json). All writes go to a temporary file that is renamed over the
+original, so readers never see a partial file. A per-session lock serialises
+writers. Where fcntl is available, a lock file in the session folder does the
+same across worker processes.
+"""
+import json
+import logging
+import os
+import threading
+import weakref
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SHOTS_FILE = "shots.json"
+SHOTS_LOG_FILE = "shots.changes.jsonl"
+LOCK_FILE = ".session.lock"
+SHOTS_LOG_COMPACT_BYTES = int(os.getenv("SHOTS_LOG_COMPACT_BYTES", str(64 * 1024)))
+
+_locks = weakref.WeakValueDictionary()  # session folder -> threading.Lock
+_locks_guard = threading.Lock()
+
+def _thread_lock(session_folder):
+    key = os.path.realpath(session_folder)
+    with _locks_guard:
+        lock = _locks.get(key)
+        if lock is None:
+            lock = threading.Lock()
+            _locks[key] = lock
+        return lock
+
+@contextmanager
+def session_lock(session_folder):
+    """Hold the session's lock, against other threads and (with fcntl) other processes"""
+    with _thread_lock(session_folder):
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(session_folder, LOCK_FILE), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def write_json_atomic(path, data):
+    """Write JSON to a temporary file and rename it over path"""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+def _read_json(path, default=None):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+def update_json_file(session_folder, filename, update):
+    """
+    Read filename in the session folder ({} if missing), let update(data) change
+    it in place, and write it back atomically, all under the session lock.
+    Returns the written data.
+    """
+    path = os.path.join(session_folder, filename)
+    with session_lock(session_folder):
+        data = _read_json(path, {})
+        update(data)
+        write_json_atomic(path, data)
+    return data
+
+def _read_changes(session_folder):
+    changes = []
+    try:
+        with open(os.path.join(session_folder, SHOTS_LOG_FILE), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    changes.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A line cut short by a crash; everything before it is intact
+                    logger.warning("Skipping unreadable change in %s", session_folder)
+    except FileNotFoundError:
+        pass
+    return changes
+
+def _apply_changes(shots_data, changes):
+    # Enhanced sessions store {"shots": [...], ...}; legacy sessions a bare list
+    shots = shots_data.get("shots") if isinstance(shots_data, dict) else shots_data
+    if not isinstance(shots, list):
+        return shots_data
+    for change in changes:
+        index = change.get("shot")
+        if isinstance(index, int) and 0 <= index < len(shots) and isinstance(shots[index], dict):
+            shots[index].update(change.get("fields", {}))
+    return shots_data
+
+def _compact(session_folder, changes):
+    shots_path = os.path.join(session_folder, SHOTS_FILE)
+    shots_data = _apply_changes(_read_json(shots_path), changes)
+    if shots_data is not None:
+        write_json_atomic(shots_path, shots_data)
+    os.remove(os.path.join(session_folder, SHOTS_LOG_FILE))
+    return shots_data
+
+def compact_shots(session_folder):
+    """Fold pending changes into shots.json. The caller holds session_lock()."""
+    if os.path.exists(os.path.join(session_folder, SHOTS_LOG_FILE)):
+        return _compact(session_folder, _read_changes(session_folder))
+    return _read_json(os.path.join(session_folder, SHOTS_FILE))
+
+def record_shot_update(session_folder, shot_index, fields):
+    """
+    Set fields on one shot of the session's shots.json by appending to the
+    change log. Returns False if the session has no shots.json.
+    """
+    if not os.path.exists(os.path.join(session_folder, SHOTS_FILE)):
+        return False
+    line = json.dumps({"shot": shot_index, "fields": fields}) + "\n"
+    with session_lock(session_folder):
+        log_path = os.path.join(session_folder, SHOTS_LOG_FILE)
+        with open(log_path, "a", encoding="utf-8") as f:
+            f.write(line)
+            pending = f.tell()
+        if pending > SHOTS_LOG_COMPACT_BYTES:
+            _compact(session_folder, _read_changes(session_folder))
+    return True
+
+def read_shots(session_folder):
+    """The session's shots.json with pending changes applied, or None if it has none"""
+    shots_path = os.path.join(session_folder, SHOTS_FILE)
+    if not os.path.exists(os.path.join(session_folder, SHOTS_LOG_FILE)):
+        return _read_json(shots_path)
+    with session_lock(session_folder):
+        # Another reader may have compacted while we waited for the lock
+        return compact_shots(session_folder)
@@ -0,0 +1,281 @@
+"""
+Parallel integrity audit of the stored project and session files.
+
+The storage roots are walked with os.scandir on a thread pool. Every directory
+listing is a task and files are checked in batches of CHECK_BATCH, so slow
+disks and network mounts are read with many requests in flight. Each file is
+hashed (SHA-256).
+JSON files must parse, images must decode (PIL verify), and session bundles
+must have a readable zip central directory.
+
+Checksums go into a SQLite manifest. On the next run a file whose size and
+mtime are unchanged is not read again: its recorded checksum and result are
+reused, so repeat audits only read what changed. full=True re-reads
+everything. It also reports files whose content changed while size and mtime
+did not (bit rot, or edits that kept the mtime).
+
+audit_storage() returns a report dict that the caller can write out as JSON.
+"""
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+from PIL import Image
+
+from session_archive import ARCHIVE_SUFFIX
+from session_files import LOCK_FILE
+
+AUDIT_WORKERS = int(os.getenv("AUDIT_WORKERS", "16"))
+STORAGE_MANIFEST = os.getenv("STORAGE_MANIFEST", os.path.join(os.path.dirname(__file__), "storage_manifest.db"))
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".gif")
+JSON_EXTENSIONS = (".json", ".jsonl")
+MAX_IN_MEMORY_BYTES = 64 * 1024 * 1024  # Larger files are hashed in chunks and not image-checked in memory
+HASH_CHUNK = 1024 * 1024
+CHECK_BATCH = 32  # Files per pool task; one task per file costs more than checking a small file
+MANIFEST_COMMIT_EVERY = 1000
+
+def _file_type(name):
+    lower = name.lower()
+    if lower.endswith(JSON_EXTENSIONS):
+        return "json"
+    if lower.endswith(IMAGE_EXTENSIONS):
+        return "image"
+    if lower.endswith(ARCHIVE_SUFFIX):
+        return "archive"
+    return "other"
+
+def _list_dir(path):
+    """
+    (subdirectories, [(path, size, mtime_ns)]) of one directory. Entries removed
+    while it is listed (compacted change logs, renamed temporary files, folders
+    the GC or a restore moved) are skipped; they are normal app activity.
+    """
+    directories, files = [], []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        directories.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        # Lock files and in-progress writes are not stored data
+                        if entry.name == LOCK_FILE or entry.name.endswith(".tmp"):
+                            continue
+                        stat = entry.stat(follow_symlinks=False)
+                        files.append((entry.path, stat.st_size, stat.st_mtime_ns))
+                except FileNotFoundError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return directories, files
+
+def _check_json(data, name):
+    if name.lower().endswith(".jsonl"):
+        # Only complete lines: a writer may be appending the last one right now
+        for number, line in enumerate(data.split(b"\n")[:-1], 1):
+            if line.strip():
+                try:
+                    json.loads(line)
+                except ValueError as e:
+                    return f"line {number}: {e}"
+        return None
+    try:
+        json.loads(data)
+    except ValueError as e:
+        return str(e)
+    return None
+
+def _check_image(data):
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.verify()
+    except Exception as e:
+        return str(e) or type(e).__name__
+    return None
+
+def _check_file(path, size):
+    """
+    (sha256, problem or None) for one file; problem is (kind, detail).
+    None if the file was removed after it was listed.
+    """
+    file_type = _file_type(path)
+    digest = hashlib.sha256()
+    try:
+        if size <= MAX_IN_MEMORY_BYTES and file_type in ("json", "image"):
+            with open(path, "rb") as f:
+                data = f.read()
+            digest.update(data)
+            error = _check_json(data, path) if file_type == "json" else _check_image(data)
+            return digest.hexdigest(), (f"invalid_{file_type}", error) if error else None
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+                digest.update(chunk)
+        if file_type == "archive":
+            try:
+                with zipfile.ZipFile(path) as bundle:
+                    bundle.infolist()
+            except zipfile.BadZipFile as e:
+                return digest.hexdigest(), ("invalid_archive", str(e))
+        return digest.hexdigest(), None
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        return None, ("unreadable", str(e))
+
+def _check_files(files):
+    """_check_file for a batch of (path, size); returns results in the same order"""
+    return [_check_file(path, size) for path, size in files]
+
+def open_manifest(path=STORAGE_MANIFEST):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS files (
+        path TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        sha256 TEXT,
+        problem TEXT,
+        detail TEXT,
+        checked_at REAL NOT NULL,
+        seen_run INTEGER NOT NULL
+    )''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS runs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        started_at REAL NOT NULL,
+        finished_at REAL
+    )''')
+    return conn
+
+def audit_storage(roots, manifest_path=STORAGE_MANIFEST, workers=AUDIT_WORKERS, full=False):
+    """
+    Audit every file under roots ({label: path}) and return the report.
+    Files are keyed in the manifest and the report as <label>/<relative path>.
+    """
+    roots = {label: root.rstrip(os.sep) for label, root in roots.items()}
+    started = time.time()
+    manifest = open_manifest(manifest_path)
+    run_id = manifest.execute("INSERT INTO runs (started_at) VALUES (?)", (started,)).lastrowid
+    manifest.commit()
+
+    totals = {"files": 0, "bytes": 0, "hashed": 0, "hashed_bytes": 0, "reused": 0}
+    by_type = {}
+    issues = []
+    pending_rows = []
+
+    def record(key, size, mtime_ns, sha256, problem, previous):
+        file_type = _file_type(key)
+        totals["files"] += 1
+        totals["bytes"] += size
+        by_type[file_type] = by_type.get(file_type, 0) + 1
+        if problem is not None:
+            issues.append({"path": key, "problem": problem[0], "detail": problem[1]})
+        elif full and previous is not None and previous[3] and sha256 and sha256 != previous[3] \
+                and previous[0] == size and previous[1] == mtime_ns:
+            issues.append({"path": key, "problem": "checksum_changed",
+                           "detail": f"was {previous[3]}, size and mtime unchanged"})
+        pending_rows.append((key, size, mtime_ns, sha256, problem[0] if problem else None,
+                             problem[1] if problem else None, time.time(), run_id))
+        if len(pending_rows) >= MANIFEST_COMMIT_EVERY:
+            flush()
+
+    def flush():
+        manifest.executemany(
+            "INSERT OR REPLACE INTO files (path, size, mtime_ns, sha256, problem, detail, checked_at, seen_run) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            pending_rows
+        )
+        manifest.commit()
+        pending_rows.clear()
+
+    def previous_entries(keys):
+        """Manifest rows for keys: path -> (size, mtime_ns, problem, sha256, detail)"""
+        entries = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            entries.update(
+                (row[0], row[1:]) for row in manifest.execute(
+                    f"SELECT path, size, mtime_ns, problem, sha256, detail FROM files WHERE path IN ({', '.join('?' * len(chunk))})",
+                    chunk
+                )
+            )
+        return entries
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="audit") as pool:
+        pending = {}  # future -> ("dir", label, root) or ("files", [(key, size, mtime_ns, previous)])
+        to_check = deque()
+        for label, root in roots.items():
+            if os.path.isdir(root):
+                pending[pool.submit(_list_dir, root)] = ("dir", label, root)
+            else:
+                issues.append({"path": label, "problem": "missing_root", "detail": root})
+
+        while pending or to_check:
+            # Keep the pool busy without queueing every file of a huge directory at once
+            while to_check and len(pending) < workers * 4:
+                batch = [to_check.popleft() for _ in range(min(CHECK_BATCH, len(to_check)))]
+                future = pool.submit(_check_files, [(path, size) for path, _, size, _, _ in batch])
+                pending[future] = ("files", [item[1:] for item in batch])
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = pending.pop(future)
+                if task[0] == "files":
+                    for (key, size, mtime_ns, previous), result in zip(task[1], future.result()):
+                        if result is None:
+                            continue  # Removed since it was listed; its manifest row goes with the others
+                        totals["hashed"] += 1
+                        totals["hashed_bytes"] += size
+                        record(key, size, mtime_ns, *result, previous)
+                    continue
+                _, label, root = task
+                try:
+                    directories, files = future.result()
+                except OSError as e:
+                    issues.append({"path": label, "problem": "unreadable", "detail": str(e)})
+                    continue
+                for directory in directories:
+                    pending[pool.submit(_list_dir, directory)] = ("dir", label, root)
+                keys = [label + path[len(root):].replace(os.sep, "/") for path, _, _ in files]
+                previous = previous_entries(keys) if keys else {}
+                for key, (path, size, mtime_ns) in zip(keys, files):
+                    entry = previous.get(key)
+                    if not full and entry is not None and entry[0] == size and entry[1] == mtime_ns:
+                        totals["reused"] += 1
+                        record(key, size, mtime_ns, entry[3], (entry[2], entry[4]) if entry[2] else None, None)
+                    else:
+                        to_check.append((path, key, size, mtime_ns, entry))
+    flush()
+
+    # Files in the manifest that this run did not see were deleted or moved
+    removed = manifest.execute("SELECT COUNT(*) FROM files WHERE seen_run <> ?", (run_id,)).fetchone()[0]
+    manifest.execute("DELETE FROM files WHERE seen_run <> ?", (run_id,))
+    finished = time.time()
+    manifest.execute("UPDATE runs SET finished_at = ? WHERE id = ?", (finished, run_id))
+    manifest.commit()
+    manifest.close()
+
+    issues.sort(key=lambda issue: issue["path"])
+    return {
+        "started_at": datetime.fromtimestamp(started).isoformat(),
+        "finished_at": datetime.fromtimestamp(finished).isoformat(),
+        "duration_seconds": round(finished - started, 3),
+        "roots": roots,
+        "manifest": manifest_path,
+        "full": full,
+        "workers": workers,
+        **totals,
+        "files_by_type": by_type,
+        "removed_since_last_run": removed,
+        "issue_count": len(issues),
+        "issues": issues,
+        "ok": not issues,
+    }
@@ -0,0 +1,434 @@
+"""
+Incremental garbage collector for storage that nothing owns any more.
+
+delete_project and delete_shot remove rows but leave files behind, and files
+removed by hand leave rows behind. A collection pass works through four phases:
+
+- project_images: PROJECT_IMAGES_ROOT/<id> folders whose id is neither a
+  project (session folders) nor a shot (save_shot_image copies)
+- user_sessions: SESSIONS_ROOT/<user_id> folders of deleted users, and
+  <user_id>/<project_id> folders of deleted projects
+- rows: shot_images rows whose shot or blob is gone, session catalog rows of
+  deleted projects and filesystem_sessions rows whose folder is gone
+- blobs: blob_store files referenced by no row and no legacy shots.json
+
+Blobs go last so that the images of rows and folders reclaimed earlier in the
+same pass are freed too. Before the blob phase the collector marks every digest
+still referenced. It then deletes only blobs that are unreferenced and whose
+mtime is older than the mark minus GC_GRACE_SECONDS. put_blob touches a blob it
+stores again, so a blob being reused is never taken. Folders are likewise only
+reclaimed once nothing in them has changed for GC_GRACE_SECONDS.
+
+Work is done in batches of GC_BATCH_SIZE entries with a GC_PAUSE sleep between
+them, so a pass never causes an I/O burst. Without reclaim the collector only
+reports what it would remove. A reclaiming collector saves its phase and cursor
+to the storage_gc_checkpoint table after every batch and resumes from there.
+The server runs one on a background thread when STORAGE_GC_INTERVAL is set.
+"""
+import bisect
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+import blob_store
+import db
+from session_archive import last_modified
+from session_files import SHOTS_FILE, SHOTS_LOG_FILE
+
+logger = logging.getLogger(__name__)
+
+GC_BATCH_SIZE = int(os.getenv("GC_BATCH_SIZE", "100"))
+GC_PAUSE = float(os.getenv("GC_PAUSE", "1.0"))  # Seconds between batches
+GC_GRACE_SECONDS = float(os.getenv("GC_GRACE_SECONDS", str(24 * 3600)))
+STORAGE_GC_INTERVAL = float(os.getenv("STORAGE_GC_INTERVAL", "0"))  # Seconds between background passes; 0 is off
+
+PHASES = ("project_images", "user_sessions", "rows", "blobs")
+ROW_TABLES = ("shot_images", "filesystem_sessions", "project_sessions", "project_session_scans")
+STAT_KEYS = ("project_folders", "session_folders", "rows", "blobs", "bytes", "failed")
+
+BLOB_REFERENCE = re.compile(re.escape(db.BLOB_URL_PREFIX) + r"([0-9a-f]{64})")
+_HEX_PAIR = re.compile(r"^[0-9a-f]{2}$")
+
+_ROW_QUERIES = {
+    "shot_images": """
+        SELECT shot_images.rowid AS rowid, shot_images.blob_hash, shots.id IS NULL AS orphaned
+        FROM shot_images LEFT JOIN shots ON shots.id = shot_images.shot_id
+        WHERE shot_images.rowid > ? ORDER BY shot_images.rowid LIMIT ?""",
+    "filesystem_sessions": """
+        SELECT rowid, user_id, session_id, project_dir, 0 AS orphaned
+        FROM filesystem_sessions WHERE rowid > ? ORDER BY rowid LIMIT ?""",
+    "project_sessions": """
+        SELECT project_sessions.rowid AS rowid, projects.id IS NULL AS orphaned
+        FROM project_sessions LEFT JOIN projects ON projects.id = project_sessions.project_id
+        WHERE project_sessions.rowid > ? ORDER BY project_sessions.rowid LIMIT ?""",
+    "project_session_scans": """
+        SELECT project_session_scans.rowid AS rowid, projects.id IS NULL AS orphaned
+        FROM project_session_scans LEFT JOIN projects ON projects.id = project_session_scans.project_id
+        WHERE project_session_scans.rowid > ? ORDER BY project_session_scans.rowid LIMIT ?""",
+}
+
+def _empty_stats():
+    return dict.fromkeys(STAT_KEYS, 0)
+
+def _list_dirs(folder):
+    """Sorted names of the folders in folder; empty if it does not exist"""
+    try:
+        with os.scandir(folder) as entries:
+            return sorted(entry.name for entry in entries if entry.is_dir())
+    except FileNotFoundError:
+        return []
+
+def _list_blob_prefixes(root):
+    """Sorted aa/bb folder names of the blob store"""
+    prefixes = []
+    for outer in _list_dirs(root):
+        if _HEX_PAIR.match(outer):
+            prefixes.extend(f"{outer}/{inner}" for inner in _list_dirs(os.path.join(root, outer)) if _HEX_PAIR.match(inner))
+    return prefixes
+
+def _after(keys, cursor, limit):
+    start = bisect.bisect_right(keys, cursor) if cursor is not None else 0
+    return keys[start:start + limit]
+
+def _tree_size(folder):
+    return sum(
+        os.path.getsize(os.path.join(directory, name))
+        for directory, _, files in os.walk(folder) for name in files
+    )
+
+def _existing_ids(conn, table, ids):
+    if not ids:
+        return set()
+    placeholders = ", ".join("?" * len(ids))
+    return {row[0] for row in conn.execute(f"SELECT id FROM {table} WHERE id IN ({placeholders})", list(ids))}
+
+def _delete_rows(conn, table, rowids):
+    conn.executemany(f"DELETE FROM {table} WHERE rowid = ?", [(rowid,) for rowid in rowids])
+
+def _delete_session_locations(conn, user_id, project_dir=None):
+    if project_dir is None:
+        conn.execute("DELETE FROM filesystem_sessions WHERE user_id = ?", (user_id,))
+    else:
+        conn.execute("DELETE FROM filesystem_sessions WHERE user_id = ? AND project_dir = ?", (user_id, project_dir))
+
+def _write_checkpoint(conn, phase, cursor, pass_started_at, stats, last_pass_stats=None):
+    now = time.time()
+    conn.execute(
+        """
+        INSERT INTO storage_gc_checkpoint
+            (id, phase, cursor, pass_started_at, stats, updated_at, last_pass_finished_at, last_pass_stats)
+        VALUES (1, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET
+            phase = excluded.phase, cursor = excluded.cursor,
+            pass_started_at = excluded.pass_started_at, stats = excluded.stats,
+            updated_at = excluded.updated_at,
+            last_pass_finished_at = COALESCE(excluded.last_pass_finished_at, last_pass_finished_at),
+            last_pass_stats = COALESCE(excluded.last_pass_stats, last_pass_stats)
+        """,
+        (phase, cursor, pass_started_at, json.dumps(stats), now,
+         now if last_pass_stats is not None else None,
+         json.dumps(last_pass_stats) if last_pass_stats is not None else None)
+    )
+
+def get_gc_status():
+    """The saved checkpoint: phase, cursor, totals of the pass in progress and of the last one"""
+    with db.get_db_connection(readonly=True) as conn:
+        row = conn.execute("SELECT * FROM storage_gc_checkpoint WHERE id = 1").fetchone()
+    if row is None:
+        return None
+    status = dict(row)
+    status["stats"] = json.loads(status["stats"])
+    status["last_pass_stats"] = json.loads(status["last_pass_stats"]) if status["last_pass_stats"] else None
+    return status
+
+class StorageCollector:
+    """
+    One collector walks storage a batch at a time. It keeps directory listings
+    and the set of referenced blobs between batches; the checkpoint keeps its
+    position between processes. report(kind, target, size) is called for every
+    orphan found, reclaimed or not.
+    """
+
+    def __init__(self, reclaim=False, checkpoint=None, batch_size=GC_BATCH_SIZE, pause=GC_PAUSE,
+                 grace_seconds=GC_GRACE_SECONDS, report=None, stop_event=None):
+        self.reclaim = reclaim
+        self.checkpoint = reclaim if checkpoint is None else checkpoint
+        self.batch_size = batch_size
+        self.pause = pause
+        self.grace_seconds = grace_seconds
+        self.report = report
+        self._stop = stop_event or threading.Event()
+        self.phase = PHASES[0]
+        self.cursor = None
+        self.pass_started_at = time.time()
+        self.stats = _empty_stats()
+        self.last_pass_stats = None
+        self._listing = None
+        self._referenced = None
+        self._mark_started_at = None
+        if self.checkpoint:
+            self._load_checkpoint()
+
+    def run(self, max_batches=None):
+        """
+        Process up to max_batches batches, or until the pass in progress ends.
+        Returns the totals of this run, with pass_complete set if the pass ended.
+        """
+        run_stats = _empty_stats()
+        self._run_stats = run_stats
+        run_stats["pass_complete"] = False
+        batches = 0
+        while (max_batches is None or batches < max_batches) and not self._stop.is_set():
+            if batches:
+                self._stop.wait(self.pause)
+            batches += 1
+            if self._step():
+                run_stats["pass_complete"] = True
+                break
+        return run_stats
+
+    def _step(self):
+        self.cursor = getattr(self, f"_collect_{self.phase}")(self.cursor)
+        if self.cursor is None:
+            self._listing = None
+            next_phase = PHASES.index(self.phase) + 1
+            if next_phase == len(PHASES):
+                self._finish_pass()
+                return True
+            self.phase = PHASES[next_phase]
+        self._save_checkpoint()
+        return False
+
+    def _finish_pass(self):
+        logger.info(
+            "Storage GC pass %s: %s project folder(s), %s session folder(s), %s row(s), %s blob(s), %.1f MB",
+            "reclaimed" if self.reclaim else "found", self.stats["project_folders"], self.stats["session_folders"],
+            self.stats["rows"], self.stats["blobs"], self.stats["bytes"] / 1e6
+        )
+        self.last_pass_stats = self.stats
+        self.phase = PHASES[0]
+        self.cursor = None
+        self.pass_started_at = time.time()
+        self.stats = _empty_stats()
+        self._referenced = None
+        self._save_checkpoint(self.last_pass_stats)
+
+    def _load_checkpoint(self):
+        status = get_gc_status()
+        if status is None or status["phase"] not in PHASES:
+            return
+        self.phase = status["phase"]
+        self.cursor = status["cursor"]
+        self.pass_started_at = status["pass_started_at"]
+        self.stats.update({key: status["stats"].get(key, 0) for key in STAT_KEYS})
+        logger.info("Storage GC resuming in phase %s after %s", self.phase, self.cursor)
+
+    def _save_checkpoint(self, last_pass_stats=None):
+        if self.checkpoint:
+            db.run_write(_write_checkpoint, self.phase, self.cursor, self.pass_started_at, self.stats, last_pass_stats)
+
+    def _listed(self, list_keys):
+        if self._listing is None:
+            self._listing = list_keys()
+        return self._listing
+
+    def _next_cursor(self, batch):
+        return batch[-1] if len(batch) == self.batch_size else None
+
+    def _found(self, kind, target, size, remove):
+        if self.reclaim:
+            try:
+                if remove() is False:
+                    return  # In use again since it was checked
+            except (OSError, sqlite3.Error) as e:
+                logger.warning("Storage GC could not remove %s: %s", target, e)
+                self.stats["failed"] += 1
+                self._run_stats["failed"] += 1
+                return
+        for stats in (self.stats, self._run_stats):
+            stats[kind] += 1
+            stats["bytes"] += size
+        if self.report is not None:
+            self.report(kind, target, size)
+
+    def _collect_folder(self, kind, folder, forget=None):
+        try:
+            if last_modified(folder) >= time.time() - self.grace_seconds:
+                return
+            size = _tree_size(folder)
+        except FileNotFoundError:
+            return
+        def remove():
+            shutil.rmtree(folder)
+            db.forget_folder_usage(folder)
+            if forget is not None:
+                forget()
+        self._found(kind, folder, size, remove)
+
+    def _collect_project_images(self, cursor):
+        names = self._listed(lambda: _list_dirs(db.PROJECT_IMAGES_ROOT))
+        batch = _after(names, cursor, self.batch_size)
+        if batch:
+            # Folders are named after a project (sessions) or a shot (save_shot_image)
+            with db.get_db_connection(readonly=True) as conn:
+                owned = _existing_ids(conn, "projects", batch) | _existing_ids(conn, "shots", batch)
+            for name in batch:
+                if name not in owned:
+                    self._collect_folder("project_folders", os.path.join(db.PROJECT_IMAGES_ROOT, name))
+        return self._next_cursor(batch)
+
+    def _collect_user_sessions(self, cursor):
+        users = self._listed(lambda: _list_dirs(db.SESSIONS_ROOT))
+        batch = _after(users, cursor, self.batch_size)
+        if not batch:
+            return None
+        with db.get_db_connection(readonly=True) as conn:
+            known_users = _existing_ids(conn, "users", batch)
+        for user_id in batch:
+            user_folder = os.path.join(db.SESSIONS_ROOT, user_id)
+            if user_id not in known_users:
+                self._collect_folder("session_folders", user_folder,
+                                     lambda user_id=user_id: db.run_write(_delete_session_locations, user_id))
+                continue
+            project_dirs = [name for name in _list_dirs(user_folder) if not name.startswith(db.DEFAULT_PROJECT_DIR_PREFIX)]
+            with db.get_db_connection(readonly=True) as conn:
+                known_projects = _existing_ids(conn, "projects", project_dirs)
+            for project_dir in project_dirs:
+                if project_dir not in known_projects:
+                    self._collect_folder(
+                        "session_folders", os.path.join(user_folder, project_dir),
+                        lambda user_id=user_id, project_dir=project_dir: db.run_write(_delete_session_locations, user_id, project_dir)
+                    )
+        return self._next_cursor(batch)
+
+    def _row_is_orphaned(self, table, row):
+        if row["orphaned"]:
+            return True
+        if table == "shot_images":
+            return bool(row["blob_hash"]) and not os.path.exists(blob_store.blob_path(row["blob_hash"]))
+        if table == "filesystem_sessions":
+            return not os.path.isdir(os.path.join(db.SESSIONS_ROOT, row["user_id"], row["project_dir"], row["session_id"]))
+        return False
+
+    def _collect_rows(self, cursor):
+        table, _, last_rowid = (cursor or f"{ROW_TABLES[0]}:0").partition(":")
+        with db.get_db_connection(readonly=True) as conn:
+            rows = conn.execute(_ROW_QUERIES[table], (int(last_rowid), self.batch_size)).fetchall()
+        doomed = []
+        for row in rows:
+            if self._row_is_orphaned(table, row):
+                self._found("rows", f"{table}:{row['rowid']}", 0, lambda rowid=row["rowid"]: doomed.append(rowid))
+        if doomed:
+            db.run_write(_delete_rows, table, doomed)
+        if len(rows) == self.batch_size:
+            return f"{table}:{rows[-1]['rowid']}"
+        next_table = ROW_TABLES.index(table) + 1
+        return f"{ROW_TABLES[next_table]}:0" if next_table < len(ROW_TABLES) else None
+
+    def _mark_blobs(self):
+        """Collect every digest referenced by a row or a legacy session's shots file"""
+        self._mark_started_at = time.time()
+        referenced = set()
+        with db.get_db_connection(readonly=True) as conn:
+            referenced.update(row[0] for row in conn.execute("SELECT blob_hash FROM shot_images WHERE blob_hash IS NOT NULL"))
+            for table, column in (("shots", "image_url"), ("shot_versions", "image_url"), ("sessions", "data")):
+                for (value,) in conn.execute(f"SELECT {column} FROM {table} WHERE {column} LIKE ?", (f"%{db.BLOB_URL_PREFIX}%",)):
+                    referenced.update(BLOB_REFERENCE.findall(value))
+        files_read = 0
+        for user_id in _list_dirs(db.SESSIONS_ROOT):
+            for _, entry in db._scan_user_session_folders(user_id):
+                for name in (SHOTS_FILE, SHOTS_LOG_FILE):
+                    try:
+                        with open(os.path.join(entry.path, name), "r", encoding="utf-8") as f:
+                            referenced.update(BLOB_REFERENCE.findall(f.read()))
+                    except FileNotFoundError:
+                        continue
+                    files_read += 1
+                    if files_read % self.batch_size == 0:
+                        self._stop.wait(self.pause)
+        self._referenced = referenced
+        logger.debug("Storage GC marked %s referenced blob(s)", len(referenced))
+
+    def _collect_blobs(self, cursor):
+        if self._referenced is None:
+            self._mark_blobs()
+        root = blob_store.BLOB_STORE_ROOT
+        prefixes = self._listed(lambda: _list_blob_prefixes(root))
+        batch = _after(prefixes, cursor, self.batch_size)
+        cutoff = self._mark_started_at - self.grace_seconds
+        def remove(path):
+            # Checked again: put_blob touches a blob it reuses
+            if os.stat(path).st_mtime >= cutoff:
+                return False
+            os.remove(path)
+        for prefix in batch:
+            try:
+                with os.scandir(os.path.join(root, prefix)) as entries:
+                    candidates = [entry for entry in entries if entry.is_file() and entry.name not in self._referenced]
+            except FileNotFoundError:
+                continue
+            for entry in candidates:
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                # Leftover .tmp files of interrupted writes are never referenced either
+                if stat.st_mtime < cutoff:
+                    self._found("blobs", entry.path, stat.st_size, lambda path=entry.path: remove(path))
+        return self._next_cursor(batch)
+
+def collect_garbage(reclaim=False, max_batches=None, **options):
+    """Run one collector for up to max_batches batches (a whole pass if None) and return its totals"""
+    return StorageCollector(reclaim=reclaim, **options).run(max_batches)
+
+# Background collection: a reclaiming collector on a daemon thread, one pass
+# every STORAGE_GC_INTERVAL seconds. A lock file next to the database keeps
+# other worker processes from running a second one.
+_background_stop = threading.Event()
+_background_thread = None
+
+def _background_loop(interval):
+    lock_file = None
+    if fcntl is not None:
+        lock_file = open(f"{db.DB_FILE}.gc.lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            logger.info("Storage GC already runs in another process")
+            return
+    try:
+        collector = StorageCollector(reclaim=True, stop_event=_background_stop)
+        while not _background_stop.is_set():
+            try:
+                collector.run()
+            except Exception as e:
+                logger.error("Storage GC batch failed: %s", e)
+            _background_stop.wait(interval)
+    finally:
+        if lock_file is not None:
+            lock_file.close()
+
+def start_background_collector(interval=STORAGE_GC_INTERVAL):
+    """Start reclaiming in the background; does nothing if interval is 0"""
+    global _background_thread
+    if interval <= 0 or (_background_thread is not None and _background_thread.is_alive()):
+        return
+    _background_stop.clear()
+    _background_thread = threading.Thread(target=_background_loop, args=(interval,), name="storage-gc", daemon=True)
+    _background_thread.start()
+
+def stop_background_collector(timeout=5):
+    _background_stop.set()
+    if _background_thread is not None:
+        _background_thread.join(timeout)
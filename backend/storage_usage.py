@@ -0,0 +1,206 @@
+"""
+Reconciliation of the storage usage counters.
+
+Writers keep storage_folders and the per-user and per-project totals current
+(see the storage usage section of db.py). Files changed outside the app, lazily
+created thumbnails and failed updates make them drift. A reconciliation pass
+re-measures every stored folder in batches of USAGE_RECONCILE_BATCH_SIZE with a
+USAGE_RECONCILE_PAUSE sleep between them. It drops rows of folders that are gone
+and then recomputes the totals from the folder rows in one transaction.
+
+Folders of deleted projects, shots and users are not counted; storage_gc
+reclaims them. The server runs a pass every STORAGE_USAGE_RECONCILE_INTERVAL
+seconds on a background thread, the first one right away if the last finished
+pass is older than that.
+"""
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+import db
+from session_archive import ARCHIVE_SUFFIX
+
+logger = logging.getLogger(__name__)
+
+USAGE_RECONCILE_BATCH_SIZE = int(os.getenv("USAGE_RECONCILE_BATCH_SIZE", "200"))
+USAGE_RECONCILE_PAUSE = float(os.getenv("USAGE_RECONCILE_PAUSE", "0.5"))  # Seconds between batches
+STORAGE_USAGE_RECONCILE_INTERVAL = float(os.getenv("STORAGE_USAGE_RECONCILE_INTERVAL", str(24 * 3600)))  # 0 is off
+
+def _list_dirs(folder):
+    try:
+        with os.scandir(folder) as entries:
+            return sorted(entry.name for entry in entries if entry.is_dir())
+    except FileNotFoundError:
+        return []
+
+def _project_sessions(project_folder):
+    """Session folder names in a project folder, including archived ones"""
+    try:
+        with os.scandir(project_folder) as entries:
+            names = {
+                entry.name[:-len(ARCHIVE_SUFFIX)] if entry.name.endswith(ARCHIVE_SUFFIX) else entry.name
+                for entry in entries
+                if entry.is_dir() or entry.name.endswith(ARCHIVE_SUFFIX)
+            }
+    except FileNotFoundError:
+        return []
+    return sorted(names)
+
+def _shot_owners(conn, shot_ids):
+    """shot_id -> (user_id, project_id) for the ids that are shots"""
+    owners = {}
+    for start in range(0, len(shot_ids), 500):
+        chunk = shot_ids[start:start + 500]
+        rows = conn.execute(
+            f"""
+            SELECT shots.id, projects.user_id, projects.id FROM shots JOIN projects ON projects.id = shots.project_id
+            WHERE shots.id IN ({', '.join('?' * len(chunk))})
+            """,
+            chunk
+        ).fetchall()
+        owners.update((row[0], (row[1], row[2])) for row in rows)
+    return owners
+
+def _stored_folders(project_owners, users):
+    """Yield (path, user_id, project_id) for every folder that counts towards someone's usage"""
+    names = _list_dirs(db.PROJECT_IMAGES_ROOT)
+    with db.get_db_connection(readonly=True) as conn:
+        shot_owners = _shot_owners(conn, [name for name in names if name not in project_owners])
+    for name in names:
+        folder = os.path.join(db.PROJECT_IMAGES_ROOT, name)
+        if name in project_owners:
+            for session_name in _project_sessions(folder):
+                yield os.path.join(folder, session_name), project_owners[name], name
+        elif name in shot_owners:
+            yield (folder,) + shot_owners[name]
+
+    for user_id in _list_dirs(db.SESSIONS_ROOT):
+        if user_id not in users:
+            continue
+        user_folder = os.path.join(db.SESSIONS_ROOT, user_id)
+        for project_dir in _list_dirs(user_folder):
+            if project_owners.get(project_dir) == user_id:
+                project_id = project_dir
+            elif project_dir.startswith(db.DEFAULT_PROJECT_DIR_PREFIX):
+                project_id = None
+            else:
+                continue
+            for session_id in _list_dirs(os.path.join(user_folder, project_dir)):
+                yield os.path.join(user_folder, project_dir, session_id), user_id, project_id
+
+def _finish_reconcile(conn, removed):
+    conn.executemany("DELETE FROM storage_folders WHERE folder = ?", [(key,) for key in removed])
+    conn.execute("DELETE FROM storage_usage")
+    for owner_type, column in (("user", "user_id"), ("project", "project_id")):
+        conn.execute(
+            f"""
+            INSERT INTO storage_usage (owner_type, owner_id, bytes, files)
+            SELECT ?, {column}, SUM(bytes), SUM(files) FROM storage_folders
+            WHERE {column} IS NOT NULL GROUP BY {column}
+            """,
+            (owner_type,)
+        )
+    conn.execute("INSERT OR REPLACE INTO storage_usage_scans (id, finished_at) VALUES (1, ?)", (time.time(),))
+
+def reconcile_storage_usage(batch_size=USAGE_RECONCILE_BATCH_SIZE, pause=USAGE_RECONCILE_PAUSE, stop_event=None):
+    """
+    Re-measure every stored folder and rebuild the usage totals.
+    Returns the number of folders measured, corrected and dropped, or None if
+    stop_event was set before the pass finished.
+    """
+    stop_event = stop_event or threading.Event()
+    with db.get_db_connection(readonly=True) as conn:
+        project_owners = dict(conn.execute("SELECT id, user_id FROM projects").fetchall())
+        users = {row[0] for row in conn.execute("SELECT id FROM users")}
+        known = {
+            row["folder"]: (row["user_id"], row["project_id"], row["bytes"], row["files"])
+            for row in conn.execute("SELECT folder, user_id, project_id, bytes, files FROM storage_folders")
+        }
+
+    stats = {"measured": 0, "corrected": 0, "dropped": 0}
+    seen = set()
+    corrections = []
+    for path, user_id, project_id in _stored_folders(project_owners, users):
+        usage = db._folder_usage(path)
+        if usage is None:
+            continue  # Removed while we were walking
+        key = db._usage_key(path)
+        seen.add(key)
+        if known.get(key) != (user_id, project_id) + usage:
+            corrections.append((key, user_id, project_id, usage))
+        stats["measured"] += 1
+        if stats["measured"] % batch_size == 0:
+            if corrections:
+                db.run_write(db._write_folder_usage, corrections)
+                stats["corrected"] += len(corrections)
+                corrections = []
+            if stop_event.wait(pause):
+                return None
+    if corrections:
+        db.run_write(db._write_folder_usage, corrections)
+        stats["corrected"] += len(corrections)
+
+    # Rows written since the pass started are not in known, so they are kept
+    removed = [key for key in known if key not in seen]
+    db.run_write(_finish_reconcile, removed)
+    stats["dropped"] = len(removed)
+    logger.info("Storage usage reconciled: %s folder(s) measured, %s corrected, %s dropped",
+                stats["measured"], stats["corrected"], stats["dropped"])
+    return stats
+
+def last_reconciled_at():
+    """Time of the last finished pass, or None"""
+    with db.get_db_connection(readonly=True) as conn:
+        row = conn.execute("SELECT finished_at FROM storage_usage_scans WHERE id = 1").fetchone()
+    return row["finished_at"] if row else None
+
+# Background reconciliation. A lock file next to the database keeps other
+# worker processes from running a second pass at the same time.
+_background_stop = threading.Event()
+_background_thread = None
+
+def _background_loop(interval):
+    lock_file = None
+    if fcntl is not None:
+        lock_file = open(f"{db.DB_FILE}.usage.lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            logger.info("Storage usage reconciliation already runs in another process")
+            return
+    try:
+        while not _background_stop.is_set():
+            last = last_reconciled_at()
+            wait = 0 if last is None else last + interval - time.time()
+            if wait > 0:
+                _background_stop.wait(wait)
+                continue
+            try:
+                reconcile_storage_usage(stop_event=_background_stop)
+            except Exception as e:
+                logger.error("Storage usage reconciliation failed: %s", e)
+                _background_stop.wait(interval)
+    finally:
+        if lock_file is not None:
+            lock_file.close()
+
+def start_usage_reconciler(interval=STORAGE_USAGE_RECONCILE_INTERVAL):
+    """Reconcile the usage counters in the background; does nothing if interval is 0"""
+    global _background_thread
+    if interval <= 0 or (_background_thread is not None and _background_thread.is_alive()):
+        return
+    _background_stop.clear()
+    _background_thread = threading.Thread(target=_background_loop, args=(interval,), name="storage-usage", daemon=True)
+    _background_thread.start()
+
+def stop_usage_reconciler(timeout=5):
+    _background_stop.set()
+    if _background_thread is not None:
+        _background_thread.join(timeout)
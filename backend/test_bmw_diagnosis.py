@@ -10,7 +10,6 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from model import generate_fusion_image, generate_multi_view_fusion
 from PIL import Image
-import base64
 from io import BytesIO
 import torch
 
@@ -52,7 +51,7 @@ def test_bmw_fusion():
                 num_inference_steps=30
             )
             
-            if result1 and len(result1) > 100:  # Check if we got actual image data
+            if result1 and len(result1.encode()) > 100:  # Check if we got actual image data
                 print("✅ Test 1 SUCCESS - Generated image data")
                 save_test_image(result1, "test1_simple.png")
             else:
@@ -74,7 +73,7 @@ def test_bmw_fusion():
                 num_inference_steps=25
             )
             
-            if result2 and len(result2) > 100:
+            if result2 and len(result2.encode()) > 100:
                 print("✅ Test 2 SUCCESS - Generated image data")
                 save_test_image(result2, "test2_multiview.png")
             else:
@@ -96,7 +95,7 @@ def test_bmw_fusion():
                 num_inference_steps=20
             )
             
-            if result3 and len(result3) > 100:
+            if result3 and len(result3.encode()) > 100:
                 print("✅ Test 3 SUCCESS - Generated image data")
                 save_test_image(result3, "test3_minimal.png")
             else:
@@ -112,12 +111,10 @@ def test_bmw_fusion():
     except Exception as e:
         print(f"❌ Failed to load reference image: {str(e)}")
 
-def save_test_image(base64_data: str, filename: str):
-    """Save base64 image data to file"""
+def save_test_image(image_result, filename: str):
+    """Save the encoded image bytes to file"""
     try:
-        image_data = base64.b64decode(base64_data)
-        with open(filename, 'wb') as f:
-            f.write(image_data)
+        image_result.save(filename)
         print(f"💾 Saved: {filename}")
     except Exception as e:
         print(f"❌ Failed to save {filename}: {str(e)}")
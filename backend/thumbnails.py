@@ -0,0 +1,83 @@
+"""
+Thumbnail pyramid for session images.
+
+Every image saved under a session's images/ folder gets small WebP derivatives in
+images/thumbs/{size}/{filename}.webp. The full filename is kept, so x.png and
+x.webp in one session get separate thumbnails. Galleries load those instead of the full-size
+images. Sessions created before thumbnails existed are backfilled the first time
+a thumbnail is requested.
+"""
+import os
+import stat
+import threading
+
+from PIL import Image
+
+THUMBNAIL_SIZES = tuple(
+    sorted(int(size) for size in os.getenv("THUMBNAIL_SIZES", "64,128,256").split(","))
+)
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "80"))
+THUMBNAILS_DIRNAME = "thumbs"
+
+# Striped locks so concurrent tile requests for one image do not resize it twice
+_locks = [threading.Lock() for _ in range(64)]
+
+def _lock_for(path):
+    return _locks[hash(path) % len(_locks)]
+
+def thumbnail_path(images_dir, filename, size):
+    return os.path.join(images_dir, THUMBNAILS_DIRNAME, str(size), f"{filename}.webp")
+
+def legacy_thumbnail_path(images_dir, filename, size):
+    """Where thumbnails were written before they were keyed on the full filename (still in older bundles)"""
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(images_dir, THUMBNAILS_DIRNAME, str(size), f"{stem}.webp")
+
+def generate_thumbnails(images_dir, filename, image=None, sizes=THUMBNAIL_SIZES):
+    """
+    Write the thumbnail pyramid for images_dir/filename. If the caller already has
+    the decoded image, pass it so the file is not read back from disk.
+    Each level is resized from the next larger one instead of from the original.
+    Returns the paths that were written.
+    """
+    source_path = os.path.join(images_dir, filename)
+    written = []
+    with _lock_for(source_path):
+        if image is None:
+            with Image.open(source_path) as source:
+                source.draft("RGB", (max(sizes), max(sizes)))  # Cheap JPEG downscale on decode
+                current = source.convert("RGBA" if source.mode in ("RGBA", "LA", "P") else "RGB")
+        else:
+            current = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+        for size in sorted(sizes, reverse=True):
+            current.thumbnail((size, size), Image.Resampling.LANCZOS)
+            path = thumbnail_path(images_dir, filename, size)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            current.save(tmp_path, format="WEBP", quality=THUMBNAIL_QUALITY, method=4)
+            os.replace(tmp_path, path)
+            written.append(path)
+    return written
+
+def ensure_thumbnail(images_dir, filename, size):
+    """
+    Return the thumbnail path for one size, generating the whole pyramid if it is
+    missing or older than the source image. Returns None if the source is gone
+    or is not a regular file (a directory such as thumbs/).
+    """
+    source_path = os.path.join(images_dir, filename)
+    path = thumbnail_path(images_dir, filename, size)
+    try:
+        source_stat = os.stat(source_path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    if not stat.S_ISREG(source_stat.st_mode):
+        return None
+    source_mtime = source_stat.st_mtime
+    try:
+        if os.stat(path).st_mtime >= source_mtime:
+            return path
+    except FileNotFoundError:
+        pass
+    generate_thumbnails(images_dir, filename)
+    return path
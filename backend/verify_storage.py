@@ -1,186 +1,68 @@
 #!/usr/bin/env python3
 """
-Verification script to check if shot and image saving is working correctly
+Audit project and session storage (see storage_audit.py): walk project_images
+and user_sessions in parallel, check that every JSON file parses and every
+image decodes, and record checksums in a manifest so the next run only reads
+files whose size or mtime changed. Writes a JSON report and exits with status 1
+if anything failed a check.
+Safe to run while the server is up.
+
+Usage: python verify_storage.py [--full] [--workers N] [--report PATH|-] [--manifest PATH]
+  --full      re-hash every file and report content that changed under an unchanged mtime
+  --report    where to write the JSON report (default storage_audit_report.json, - for stdout)
 """
-import os
 import json
-from datetime import datetime
+import os
+import sys
 
-def check_project_storage():
-    """Check the current state of project storage"""
-    backend_path = os.path.dirname(__file__)
-    project_images_path = os.path.join(backend_path, 'project_images')
-    
-    print("🔍 PROJECT STORAGE VERIFICATION")
-    print("=" * 50)
-    
-    if not os.path.exists(project_images_path):
-        print("❌ Project images directory doesn't exist!")
-        return False
-    
-    print(f"✅ Project images directory exists: {project_images_path}")
-    
-    # Count projects and sessions
-    project_count = 0
-    session_count = 0
-    image_count = 0
-    
-    for item in os.listdir(project_images_path):
-        project_dir = os.path.join(project_images_path, item)
-        if os.path.isdir(project_dir) and not item.startswith('.'):
-            project_count += 1
-            print(f"\n📁 Project: {item}")
-            
-            # Count sessions in this project
-            project_sessions = 0
-            for session_item in os.listdir(project_dir):
-                session_dir = os.path.join(project_dir, session_item)
-                if os.path.isdir(session_dir) and session_item.startswith('session_'):
-                    project_sessions += 1
-                    session_count += 1
-                    
-                    # Check session contents
-                    has_input = os.path.exists(os.path.join(session_dir, 'input.json'))
-                    has_shots = os.path.exists(os.path.join(session_dir, 'shots.json'))
-                    images_dir = os.path.join(session_dir, 'images')
-                    session_images = 0
-                    
-                    if os.path.exists(images_dir):
-                        session_images = len([f for f in os.listdir(images_dir) 
-                                            if f.endswith(('.png', '.jpg', '.jpeg'))])
-                        image_count += session_images
-                    
-                    status_icons = []
-                    if has_input: status_icons.append("📋")
-                    if has_shots: status_icons.append("🎬") 
-                    if session_images > 0: status_icons.append(f"🖼️({session_images})")
-                    
-                    print(f"   └── {session_item} {''.join(status_icons)}")
-            
-            print(f"   Sessions: {project_sessions}")
-    
-    print(f"\n📊 SUMMARY:")
-    print(f"   Projects: {project_count}")
-    print(f"   Sessions: {session_count}")
-    print(f"   Images: {image_count}")
-    
-    # Check a sample session for detailed info
-    if session_count > 0:
-        print(f"\n🔬 SAMPLE SESSION ANALYSIS:")
-        check_sample_session(project_images_path)
-    
-    return True
+from db import PROJECT_IMAGES_ROOT, SESSIONS_ROOT, get_db_connection
+from storage_audit import AUDIT_WORKERS, STORAGE_MANIFEST, audit_storage
 
-def check_sample_session(project_images_path):
-    """Check the contents of a sample session"""
-    for project_dir in os.listdir(project_images_path):
-        project_path = os.path.join(project_images_path, project_dir)
-        if os.path.isdir(project_path) and not project_dir.startswith('.'):
-            for session_dir in os.listdir(project_path):
-                session_path = os.path.join(project_path, session_dir)
-                if os.path.isdir(session_path) and session_dir.startswith('session_'):
-                    print(f"   Examining: {session_dir}")
-                    
-                    # Check input.json
-                    input_file = os.path.join(session_path, 'input.json')
-                    if os.path.exists(input_file):
-                        try:
-                            with open(input_file, 'r') as f:
-                                input_data = json.load(f)
-                            print(f"   ✅ Input data: {input_data.get('scene_description', 'N/A')[:50]}...")
-                        except:
-                            print(f"   ❌ Could not read input.json")
-                    
-                    # Check shots.json
-                    shots_file = os.path.join(session_path, 'shots.json')
-                    if os.path.exists(shots_file):
-                        try:
-                            with open(shots_file, 'r') as f:
-                                shots_data = json.load(f)
-                            if isinstance(shots_data, dict):
-                                shots_count = shots_data.get('num_shots', len(shots_data.get('shots', [])))
-                            else:
-                                shots_count = len(shots_data)
-                            print(f"   ✅ Shots data: {shots_count} shots")
-                        except:
-                            print(f"   ❌ Could not read shots.json")
-                    
-                    # Check images directory
-                    images_dir = os.path.join(session_path, 'images')
-                    if os.path.exists(images_dir):
-                        images = [f for f in os.listdir(images_dir) if f.endswith(('.png', '.jpg', '.jpeg'))]
-                        print(f"   ✅ Images directory: {len(images)} images")
-                        for img in images[:3]:  # Show first 3 images
-                            img_path = os.path.join(images_dir, img)
-                            size = os.path.getsize(img_path)
-                            print(f"      - {img} ({size} bytes)")
-                    
-                    return  # Just check the first session found
+DEFAULT_REPORT = os.path.join(os.path.dirname(__file__), "storage_audit_report.json")
 
-def check_database_integration():
-    """Check if database has shot records"""
-    try:
-        import sqlite3
-        backend_path = os.path.dirname(__file__)
-        db_path = os.path.join(backend_path, 'shots_app.db')
-        
-        print(f"\n🗄️ DATABASE VERIFICATION")
-        print("=" * 50)
-        
-        if not os.path.exists(db_path):
-            print("❌ Database file doesn't exist!")
-            return False
-        
-        print(f"✅ Database exists: {db_path}")
-        
-        conn = sqlite3.connect(db_path)
-        
-        # Check tables
-        cursor = conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = [row[0] for row in cursor.fetchall()]
-        print(f"✅ Tables: {', '.join(tables)}")
-        
-        # Count records
-        if 'projects' in tables:
-            cursor = conn.execute("SELECT COUNT(*) FROM projects")
-            project_count = cursor.fetchone()[0]
-            print(f"✅ Projects in DB: {project_count}")
-        
-        if 'shots' in tables:
-            cursor = conn.execute("SELECT COUNT(*) FROM shots")
-            shot_count = cursor.fetchone()[0]
-            print(f"✅ Shots in DB: {shot_count}")
-        
-        if 'sessions' in tables:
-            cursor = conn.execute("SELECT COUNT(*) FROM sessions")
-            session_count = cursor.fetchone()[0]
-            print(f"✅ Sessions in DB: {session_count}")
-        
-        conn.close()
-        return True
-    
-    except Exception as e:
-        print(f"❌ Database check failed: {e}")
-        return False
+def database_counts():
+    with get_db_connection(readonly=True) as conn:
+        return {
+            table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("projects", "shots", "shot_images", "sessions", "project_sessions")
+        }
 
 if __name__ == "__main__":
-    print("🚀 SHOT SUGGESTOR STORAGE VERIFICATION")
-    print("=" * 60)
-    print(f"Timestamp: {datetime.now()}")
-    
-    fs_ok = check_project_storage()
-    db_ok = check_database_integration()
-    
-    print(f"\n🎯 FINAL RESULT:")
-    if fs_ok and db_ok:
-        print("✅ Storage system is working correctly!")
-        print("   - Projects are being saved to folders")
-        print("   - Sessions are organized with timestamps") 
-        print("   - Database is tracking relationships")
-        print("   - System ready for image generation")
+    args = sys.argv[1:]
+    full = "--full" in args
+    workers = int(args[args.index("--workers") + 1]) if "--workers" in args else AUDIT_WORKERS
+    report_path = args[args.index("--report") + 1] if "--report" in args else DEFAULT_REPORT
+    manifest_path = args[args.index("--manifest") + 1] if "--manifest" in args else STORAGE_MANIFEST
+    # With the report on stdout, the summary goes to stderr so stdout stays valid JSON
+    out = sys.stderr if report_path == "-" else sys.stdout
+
+    print("🔍 STORAGE AUDIT", file=out)
+    print("=" * 60, file=out)
+    report = audit_storage(
+        {"project_images": PROJECT_IMAGES_ROOT, "user_sessions": SESSIONS_ROOT},
+        manifest_path=manifest_path, workers=workers, full=full
+    )
+    report["database"] = database_counts()
+
+    if report_path == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
     else:
-        print("❌ Issues detected in storage system")
-        if not fs_ok:
-            print("   - File system storage has problems")
-        if not db_ok:
-            print("   - Database storage has problems")
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    print(f"📊 {report['files']} file(s), {report['bytes'] / 1e9:.2f} GB in {report['duration_seconds']:.1f}s "
+          f"with {report['workers']} worker(s)", file=out)
+    print(f"📊 Read {report['hashed']} changed file(s) ({report['hashed_bytes'] / 1e6:.1f} MB), "
+          f"reused {report['reused']} checksum(s) from the manifest", file=out)
+    if report["removed_since_last_run"]:
+        print(f"📊 {report['removed_since_last_run']} file(s) gone since the last audit", file=out)
+    for issue in report["issues"][:20]:
+        print(f"❌ {issue['problem']}: {issue['path']} ({issue['detail']})", file=out)
+    if report["issue_count"] > 20:
+        print(f"❌ ... and {report['issue_count'] - 20} more in the report", file=out)
+    if report["ok"]:
+        print("✅ Every file passed its checks", file=out)
+    if report_path != "-":
+        print(f"🔧 Report written to {report_path}", file=out)
+    sys.exit(0 if report["ok"] else 1)
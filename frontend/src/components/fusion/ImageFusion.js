@@ -40,6 +40,10 @@ import Step from '@mui/material/Step';
 import StepLabel from '@mui/material/StepLabel';
 import { BACKEND_HOST } from '../../config';
 
+// Generated images come back as PNG, WebP or JPEG depending on the backend's IMAGE_OUTPUT_FORMAT
+const imageDataUrl = (base64, mimeType) => `data:${mimeType || 'image/png'};base64,${base64}`;
+const imageExtension = (mimeType) => ({ 'image/webp': 'webp', 'image/jpeg': 'jpg' }[mimeType] || 'png');
+
 const ImageFusion = ({ projectId }) => {
   const auth = useAuth();
   const token = auth?.token;
@@ -372,6 +376,7 @@ const ImageFusion = ({ projectId }) => {
         const newImage = {
           id: Date.now(),
           image: data.image_data,
+          mime_type: data.image_mime_type,
           image_url: data.image_url, // Add URL if available for persistence
           prompt: finalPrompt,
           timestamp: new Date().toLocaleString()
@@ -408,6 +413,7 @@ const ImageFusion = ({ projectId }) => {
   const handleDownload = (imageData = null) => {
     const imageToDownload = imageData || currentGeneratedImage?.image;
     const imageUrl = imageData ? null : currentGeneratedImage?.image_url;
+    const mimeType = currentGeneratedImage?.mime_type;
     
     if (imageUrl) {
       // For URL-based images, fetch and download
@@ -417,7 +423,7 @@ const ImageFusion = ({ projectId }) => {
           const url = window.URL.createObjectURL(blob);
           const link = document.createElement('a');
           link.href = url;
-          link.download = `fusion-image-${Date.now()}.png`;
+          link.download = `fusion-image-${Date.now()}.${imageExtension(blob.type)}`;
           link.click();
           window.URL.revokeObjectURL(url);
         })
@@ -428,8 +434,8 @@ const ImageFusion = ({ projectId }) => {
     } else if (imageToDownload) {
       // For base64 images
       const link = document.createElement('a');
-      link.href = `data:image/png;base64,${imageToDownload}`;
-      link.download = `fusion-image-${Date.now()}.png`;
+      link.href = imageDataUrl(imageToDownload, mimeType);
+      link.download = `fusion-image-${Date.now()}.${imageExtension(mimeType)}`;
       link.click();
     }
   };
@@ -1154,7 +1160,7 @@ const ImageFusion = ({ projectId }) => {
                     }
                   }}>                    <CardMedia
                       component="img"
-                      image={imageObj.image_url || `data:image/png;base64,${imageObj.image}`}
+                      image={imageObj.image_url || imageDataUrl(imageObj.image, imageObj.mime_type)}
                       alt={`Generated image ${index + 1}`}
                       sx={{
                         height: 200,
@@ -1163,7 +1169,7 @@ const ImageFusion = ({ projectId }) => {
                       }}
                       onClick={() => {
                         setCurrentGeneratedImage(imageObj);
-                        handlePreviewImage(imageObj.image_url || `data:image/png;base64,${imageObj.image}`);
+                        handlePreviewImage(imageObj.image_url || imageDataUrl(imageObj.image, imageObj.mime_type));
                       }}
                     />
                     <Box sx={{ p: 2 }}>